@@ -1,17 +1,36 @@
+import hashlib
+import json
 import os
-import re
-from flask import Flask, render_template, request, redirect, url_for, session, send_from_directory, jsonify
+import time
+from datetime import datetime
+from functools import wraps
+from urllib.parse import quote
+import click
+from flask import (Flask, Response, render_template, request, redirect, url_for, session, jsonify, g, make_response,
+                   stream_with_context)
+from markupsafe import Markup, escape
 from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
-from flask_mail import Mail, Message
-from modelos.modelos import db, Utilizador, Vaga, Candidatura, Favorito, Publicacao, Comentario
-
-
-# RSS / HTTP / Scheduler
-import requests
-from requests.adapters import HTTPAdapter, Retry
-import feedparser
-from apscheduler.schedulers.background import BackgroundScheduler
+from flask_mail import Mail
+from flask_migrate import Migrate
+from modelos.modelos import db, Utilizador, Vaga, Candidatura, Favorito, Publicacao, Comentario, EstadoTarefa, FonteFeed
+
+
+# RSS / Scheduler
+from servicos.feeds import importar_vagas_externas, garantir_fontes
+from servicos.agendador import Agendador
+from servicos.pesquisa import filtrar_por_texto
+from servicos.paginacao import pagina_keyset
+from servicos.cache import (CacheTTL, Etiquetas, criar_backend, versao, incrementar_versao,
+                            VERSAO_VAGAS, VERSAO_EMPRESAS)
+from servicos import basedados, correio, estatisticas, exportacao, metricas
+from servicos.armazenamento import armazenamento, e_chave, e_chave_imagem
+from servicos import imagens
+from servicos.instrumentacao import InstrumentacaoSQL
+from servicos.empresas import garantir_indice, marcar_empresa_alterada, empresa_alterada
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import aliased, contains_eager, joinedload
 
 app = Flask(__name__)
 app.secret_key = "segredo_adluc"
@@ -21,24 +40,116 @@ BASE_DIR = os.path.dirname(__file__)
 os.makedirs(os.path.join(BASE_DIR, "baseDados"), exist_ok=True)
 os.makedirs(os.path.join(BASE_DIR, "uploads"), exist_ok=True)
 
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(BASE_DIR,'baseDados','adluc.db')}"
+# DATABASE_URL=postgresql://... troca para Postgres; sem ela fica o SQLite local (ver servicos/basedados.py)
+basedados.configurar(app, f"sqlite:///{os.path.join(BASE_DIR,'baseDados','adluc.db')}")
 
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["UPLOAD_FOLDER"] = os.path.join(BASE_DIR, "uploads")
+app.config["UPLOAD_FOLDER"] = os.environ.get("UPLOAD_FOLDER", os.path.join(BASE_DIR, "uploads"))
+# "local" (uploads/ab/cd/<sha256>.<ext>) ou s3://bucket/prefixo; S3_ENDPOINT_URL para MinIO & co.
+app.config["UPLOAD_BACKEND"] = os.environ.get("UPLOAD_BACKEND", "local")
+app.config["S3_ENDPOINT_URL"] = os.environ.get("S3_ENDPOINT_URL")
+# "" (o Flask envia), "nginx" (X-Accel-Redirect para UPLOAD_ACCEL_PREFIXO) ou "sendfile" (X-Sendfile)
+app.config["UPLOAD_SERVIDOR"] = os.environ.get("UPLOAD_SERVIDOR", "")
+app.config["UPLOAD_ACCEL_PREFIXO"] = os.environ.get("UPLOAD_ACCEL_PREFIXO", "/_uploads/")
+app.config["USE_X_SENDFILE"] = app.config["UPLOAD_SERVIDOR"] == "sendfile"
 app.config["MAX_CONTENT_LENGTH"] = 2 * 1024 * 1024  # 2MB
-
-# Configuração do e-mail
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = 'titoadriano.aryan@gmail.com'
+# "0" quando as tarefas correm num processo à parte (`flask run-scheduler`)
+app.config["AGENDADOR_NA_WEB"] = os.environ.get("AGENDADOR_NA_WEB", "1") == "1"
+# PERFIL_SQL=1 liga a contagem de queries por pedido, o aviso de N+1, o log de lentas e o Server-Timing
+app.config["PERFIL_SQL"] = os.environ.get("PERFIL_SQL", "0") == "1"
+app.config["SQL_LENTA_MS"] = int(os.environ.get("SQL_LENTA_MS", 100))
+# memory:// (por processo) ou redis://... (partilhada entre workers)
+app.config["CACHE_URL"] = os.environ.get("CACHE_URL", "memory://")
+# /metrics fica fechado (404) até haver um token (Authorization: Bearer) e/ou uma lista de IPs/redes
+app.config["METRICAS_TOKEN"] = os.environ.get("METRICAS_TOKEN", "")
+app.config["METRICAS_IPS"] = os.environ.get("METRICAS_IPS", "")  # p.ex. "127.0.0.1,10.0.0.0/8"
+
+# Configuração do e-mail (MAIL_SERVER=localhost MAIL_PORT=8025 MAIL_USE_TLS=0 MAIL_USERNAME= para um SMTP local, p.ex. aiosmtpd)
+app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', '1') == '1'
+app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'titoadriano.aryan@gmail.com')  # vazio = sem login
 app.config['MAIL_PASSWORD'] = 'Ndongala931217420.'
 app.config['MAIL_DEFAULT_SENDER'] = ('adluc Notificações', 'titoadriano.aryan@gmail.com')
+# 0 envia cada notificação de comentário; N junta-as num resumo a cada N minutos
+app.config['EMAIL_RESUMO_MINUTOS'] = int(os.environ.get('EMAIL_RESUMO_MINUTOS', 0))
+# Dias que os e-mails enviados ficam na caixa de saída antes de a tarefa os apagar (0 = para sempre)
+app.config['EMAIL_RETENCAO_DIAS'] = int(os.environ.get('EMAIL_RETENCAO_DIAS', 30))
 
 mail = Mail(app)
 
 db.init_app(app)
 with app.app_context():
+    basedados.instalar(db.engine, app.config)
+    metricas.instalar_pool(db.engine)
+migrate = Migrate(app, db)
+InstrumentacaoSQL(app)
+cache = criar_backend(app.config["CACHE_URL"])
+armazenamento.init_app(app)
+etiquetas = Etiquetas(cache)
+
+# ===== Cache de páginas =====
+# Visitantes anónimos recebem a página inteira da cache (e um proxy pode guardá-la max-age segundos);
+# com sessão a página é sempre gerada, mas os blocos comuns vêm de {% call fragmento(...) %}.
+PAGINA_TTL = 300
+PAGINA_MAX_AGE = 60  # proxies não recebem as purgas, por isso guardam menos tempo
+
+def purgar_no_fim(*nomes):
+    # Purga depois do commit (no fim do pedido), senão outro pedido podia guardar dados antigos
+    g.setdefault("etiquetas_a_purgar", set()).update(nomes)
+
+@app.after_request
+def purgar_etiquetas(resp):
+    if g.get("etiquetas_a_purgar"):
+        etiquetas.invalidar(*g.etiquetas_a_purgar)
+    return resp
+
+def pagina_em_cache(*nomes):
+    """Etiquetas podem usar os argumentos da rota, p.ex. "publicacao:{pub_id}"."""
+    def decorador(view):
+        @wraps(view)
+        def envolvida(**kwargs):
+            if session.get("utilizador_id") or "_flashes" in session:
+                resp = make_response(view(**kwargs))
+                resp.headers["Cache-Control"] = "private, no-cache"
+                resp.vary.add("Cookie")
+                return resp
+
+            tags = ["publicacoes"] + [n.format(**kwargs) for n in nomes]
+            # Só o caminho: estas views não leem a query string, e ?x=<aleatório> criaria entradas sem fim
+            chave = etiquetas.chave(f"pagina:{request.path}", tags)
+            guardada = cache.obter(chave)
+            estado = "HIT"
+            if guardada is None:
+                estado = "MISS"
+                resp = make_response(view(**kwargs))
+                if resp.status_code != 200 or session.modified:
+                    return resp
+                corpo = resp.get_data()
+                guardada = cache.guardar(chave, {
+                    "corpo": corpo,
+                    "tipo": resp.content_type,
+                    "etag": hashlib.sha256(corpo).hexdigest()[:32],
+                }, PAGINA_TTL)
+
+            resp = make_response(guardada["corpo"])
+            resp.content_type = guardada["tipo"]
+            resp.set_etag(guardada["etag"])
+            resp.headers["Cache-Control"] = f"public, max-age={PAGINA_MAX_AGE}"
+            resp.headers["X-Cache"] = estado
+            resp.vary.add("Cookie")
+            return resp.make_conditional(request)
+        return envolvida
+    return decorador
+
+@app.template_global()
+def fragmento(nome, *nomes, caller):
+    # As views passam queries (preguiçosas) em vez de listas: só correm quando o bloco não está em cache
+    chave = etiquetas.chave(f"fragmento:{nome}", ["publicacoes", *nomes])
+    return Markup(cache.obter_ou_calcular(chave, lambda: str(caller()), PAGINA_TTL))
+
+with app.app_context():
+    print(basedados.relatorio(db.engine, app.config))
     db.create_all()
 
 # ===== Utils =====
@@ -46,130 +157,305 @@ EXTENSOES_CV = {"pdf", "doc", "docx"}
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in EXTENSOES_CV
 
-def strip_html(txt: str) -> str:
-    if not txt: return ""
-    txt = re.sub(r"<[^>]+>", " ", txt)
-    return re.sub(r"\s+", " ", txt).strip()
+ERRO_IMAGEM = "Imagem inválida: usa PNG, JPEG, WebP ou GIF."
+
+def guardar_imagem(ficheiro):
+    """Logotipo/foto verificado pelo conteúdo e guardado com a extensão real; None se não for imagem."""
+    extensao = imagens.extensao_imagem(ficheiro)
+    if extensao is None:
+        return None
+    chave = armazenamento.guardar_stream(ficheiro.stream, f"imagem.{extensao}")
+    imagens.gerar_variantes(chave)
+    return chave
+
+# Favoritos: memo por pedido (g) + cache. A chave leva a versão do estudante em versoes_cache, que o
+# favoritar sobe na mesma transação; assim todas as sessões do estudante, em qualquer worker e com
+# qualquer CACHE_URL (também memory://), veem logo a alteração.
+def _versao_favoritos(uid):
+    return f"favoritos:{uid}"
 
 def ids_favoritos_do_estudante():
     if session.get("tipo") != "estudante":
         return set()
-    favs = Favorito.query.filter_by(estudante_id=session["utilizador_id"]).all()
-    return {f.vaga_id for f in favs}
-
-# ===== FEEDS EXTERNOS =====
-FEEDS_EXTERNOS = [
-    "http://www.expressoemprego.pt/rss/ultimas-ofertas",
-    "http://www.expressoemprego.pt/rss/informatica",
-    "http://www.expressoemprego.pt/rss/lisboa",
-    "https://www.huork.com/rss/all/",
-    "https://euraxess.ec.europa.eu/job-feed",
-    "https://www.fct.pt/media/noticias/feed/",
-    "https://www.fct.pt/media/noticias/feed/?type=calendar_event",
-    "https://www.fct.pt/media/noticias/feed/?type=science_in_focus",
-]
-
-def _http_session():
-    s = requests.Session()
-    s.headers.update({"User-Agent": "Mozilla/5.0 AdLucBot/1.0"})
-    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429,500,502,503,504])
-    s.mount("http://", HTTPAdapter(max_retries=retries))
-    s.mount("https://", HTTPAdapter(max_retries=retries))
-    return s
+    if "fav_ids" not in g:
+        uid = session["utilizador_id"]
+        ler = lambda: frozenset(db.session.execute(select(Favorito.vaga_id)
+                                                   .where(Favorito.estudante_id == uid)).scalars())
+        g.fav_ids = cache.obter_ou_calcular(f"favoritos:{uid}:{versao(_versao_favoritos(uid))}", ler)
+    return g.fav_ids
+
+def favoritos_alterados():
+    # Chamar antes do commit da escrita em favoritos
+    incrementar_versao(_versao_favoritos(session["utilizador_id"]))
+    g.pop("fav_ids", None)
+
+# ===== Filtros de vagas (/vagas e /api/vagas) =====
+FILTROS_VAGAS = ("q", "cidade", "categoria", "horario", "tipo", "empresa", "natureza")
+
+def ler_filtros_vagas():
+    return {k: request.args.get(k, "").strip() for k in FILTROS_VAGAS}
+
+def filtrar_vagas(query, filtros, com_empresa=False):
+    # Devolve (query, rank); rank é a relevância da pesquisa de texto quando há termo "q".
+    # com_empresa: a query já tem o join a Utilizador (faceta empresa)
+    query, rank = filtrar_por_texto(query, filtros["q"])
+    if filtros["cidade"]:
+        query = query.filter(Vaga.cidade.ilike(f"%{filtros['cidade']}%"))
+    if filtros["categoria"]:
+        query = query.filter(Vaga.categoria == filtros["categoria"])
+    if filtros["horario"]:
+        query = query.filter(Vaga.horario == filtros["horario"])
+    if filtros["tipo"]:
+        query = query.filter(Vaga.tipo == filtros["tipo"])
+    if filtros["empresa"]:
+        if not com_empresa:
+            query = query.join(Utilizador, Vaga.empresa_id == Utilizador.id)
+        query = query.filter(Utilizador.nome_empresa.ilike(f"%{filtros['empresa']}%"))
+    natureza = filtros["natureza"].lower()
+    if natureza == "interna":
+        query = query.filter(Vaga.externa == False)
+    elif natureza == "externa":
+        query = query.filter(Vaga.externa == True)
+    return query, rank
+
+# Contagens (total e facetas) guardadas por conjunto de filtros e versão da tabela vagas
+cache_totais_vagas = CacheTTL(ttl=600)
+cache_facetas_vagas = CacheTTL(ttl=600)
+
+def marcar_vagas_alteradas():
+    # Chamar antes do commit de qualquer escrita em vagas
+    incrementar_versao(VERSAO_VAGAS)
+    purgar_no_fim("vagas")
+
+def contar_vagas(filtros):
+    # COUNT direto sobre vagas: .count() embrulharia a query numa subquery com todas as colunas do modelo
+    chave = (versao(VERSAO_VAGAS), tuple(sorted(filtros.items())))
+    return cache_totais_vagas.obter_ou_calcular(
+        chave, lambda: filtrar_vagas(db.session.query(func.count(Vaga.id)).select_from(Vaga), filtros)[0].scalar())
+
+FACETAS_VAGAS = {
+    "categoria": Vaga.categoria,
+    "cidade": Vaga.cidade,
+    "horario": Vaga.horario,
+    "tipo": Vaga.tipo,
+    "natureza": Vaga.externa,
+    "empresa": Utilizador.nome_empresa,
+}
+
+def queries_facetas(filtros):
+    """(nome, query) de cada faceta: agrupada pela coluna, com todos os filtros menos o da própria faceta."""
+    for nome, coluna in FACETAS_VAGAS.items():
+        query = db.session.query(coluna, func.count(Vaga.id)).select_from(Vaga)
+        if nome == "empresa":
+            query = query.join(Utilizador, Vaga.empresa_id == Utilizador.id)
+        query, _ = filtrar_vagas(query, dict(filtros, **{nome: ""}), com_empresa=(nome == "empresa"))
+        yield nome, query.group_by(coluna)
+
+def calcular_facetas(filtros):
+    facetas = {}
+    for nome, query in queries_facetas(filtros):
+        linhas = query.all()
+        if nome == "natureza":
+            facetas[nome] = {("externa" if valor else "interna"): n for valor, n in linhas}
+        else:
+            facetas[nome] = {valor: n for valor, n in linhas if valor}
+    return facetas
 
-def _parse_feed(url: str):
-    try:
-        resp = _http_session().get(url, timeout=12)
-        if resp.status_code != 200 or not resp.content:
-            print(f"feed HTTP {resp.status_code}: {url}")
-            return []
-        parsed = feedparser.parse(resp.content)
-        return getattr(parsed, "entries", []) or []
-    except Exception as e:
-        print(f"feed erro {url}: {e}")
-        return []
-
-def _inferir_defaults_por_url(url: str):
-    u = url.lower()
-    if "expressoemprego" in u or "huork" in u: return "Emprego (RSS)", "emprego"
-    if "euraxess" in u: return "Investigação (RSS)", "emprego"
-    if "fct.pt" in u: return "Bolsas/Notícias (RSS)", "bolsa"
-    return "Emprego/Notícias (RSS)", "emprego"
-
-SEMENTE_EXTERNAS = [
-    {"titulo":"Estágio Júnior em Dados — Externo",
-     "descricao":"Programa de estágio remoto 6 meses.",
-     "link":"https://exemplo-empregos.pt/estagio-dados","categoria":"Emprego (RSS)","tipo":"emprego"}
-]
+def facetas_vagas(filtros):
+    chave = (versao(VERSAO_VAGAS), tuple(sorted(filtros.items())))
+    return cache_facetas_vagas.obter_ou_calcular(chave, lambda: calcular_facetas(filtros))
 
-def importar_vagas_externas():
-    insercoes, total_entradas = 0, 0
-    for url in FEEDS_EXTERNOS:
-        categoria_def, tipo_def = _inferir_defaults_por_url(url)
-        entries = _parse_feed(url); total_entradas += len(entries)
-        for e in entries[:8]:
-            titulo = strip_html(e.get("title") or "")
-            descricao = strip_html(e.get("summary") or e.get("description") or titulo)
-            link = (e.get("link") or "").strip()
-            if not link or not titulo:
-                continue
+# ===== Scheduler (30 min) =====
+# A importação RSS corre só em background; as páginas leem apenas o que já está na tabela vagas.
+# Só um processo (o dono do lease na BD) corre as tarefas; ver servicos/agendador.py.
+TAREFA_VAGAS = "atualizar_vagas"
 
-            # Tentar buscar imagem
-            imagem = None
-            if "media_content" in e and e.media_content:
-                imagem = e.media_content[0].get("url")
-            elif "enclosures" in e and e.enclosures:
-                imagem = e.enclosures[0].get("href")
-
-            if not Vaga.query.filter_by(link_externo=link).first():
-                db.session.add(Vaga(
-                    titulo=titulo[:200],
-                    descricao=(descricao or titulo)[:2000],
-                    categoria=categoria_def,
-                    tipo=tipo_def,
-                    externa=True,
-                    link_externo=link,
-                    imagem_externa=imagem  # guarda se houver
-                ))
-                insercoes += 1
-    if total_entradas == 0:
-        for it in SEMENTE_EXTERNAS:
-            if not Vaga.query.filter_by(link_externo=it["link"]).first():
-                db.session.add(Vaga(
-                    titulo=it["titulo"][:200], descricao=it["descricao"][:2000],
-                    categoria=it["categoria"], tipo=it["tipo"],
-                    externa=True, link_externo=it["link"],
-                    imagem_externa=None
-                ))
-                insercoes += 1
-    if insercoes:
-        db.session.commit()
+agendador = Agendador(app)
 
-# ===== Scheduler (30 min) =====
-scheduler = BackgroundScheduler()
 def tarefa_atualizar_vagas():
+    insercoes = importar_vagas_externas()
+    etiquetas.invalidar("inicio", "vagas")
+    return insercoes
+
+agendador.tarefa(TAREFA_VAGAS, tarefa_atualizar_vagas, minutes=30)
+# Corrige a deriva dos contadores incrementais (escritas fora do ORM) uma vez por dia
+agendador.tarefa("reconciliar_estatisticas", estatisticas.reconciliar, minutes=24 * 60)
+
+TAREFA_EMAILS = "enviar_emails"
+
+def tarefa_enviar_emails():
+    return correio.enviar_pendentes(mail, app.config["EMAIL_RESUMO_MINUTOS"], app.config["EMAIL_RETENCAO_DIAS"])
+
+agendador.tarefa(TAREFA_EMAILS, tarefa_enviar_emails, minutes=1)
+agendador.tarefa("recolher_uploads", armazenamento.recolher_orfaos, minutes=24 * 60)
+
+@app.before_request
+def iniciar_agendador():
+    # Arranque preguiçoso: corre depois do fork do gunicorn e nunca em comandos `flask ...`
+    if app.config["AGENDADOR_NA_WEB"] and not app.testing:
+        agendador.iniciar()
+
+# ===== Métricas (/metrics, formato Prometheus) =====
+# Com vários workers: PROMETHEUS_MULTIPROC_DIR=/tmp/adluc-metricas (ver gunicorn.conf.py)
+@app.before_request
+def iniciar_cronometro():
+    g.inicio_pedido = time.perf_counter()
+
+@app.after_request
+def registar_metricas(resp):
+    if "inicio_pedido" in g and request.endpoint != "metricas":
+        metricas.registar_pedido(request.endpoint, request.method, resp.status_code,
+                                 time.perf_counter() - g.inicio_pedido)
+    return resp
+
+@app.route("/metrics", endpoint="metricas")
+def metricas_prometheus():
+    token, redes = app.config["METRICAS_TOKEN"], app.config["METRICAS_IPS"]
+    if not token and not redes:
+        return "Não encontrado", 404
+    if not metricas.acesso_permitido(request.headers.get("Authorization", ""), request.remote_addr, token, redes):
+        return "", 401
+    corpo, tipo = metricas.exposicao(agendador.intervalos())
+    return corpo, 200, {"Content-Type": tipo, "Cache-Control": "no-store"}
+
+@app.cli.command("run-scheduler")
+def run_scheduler():
+    """Corre só o agendador, fora dos workers web (usar com AGENDADOR_NA_WEB=0)."""
+    agendador.iniciar()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        agendador.parar()
+
+@app.cli.command("migrar-uploads")
+def migrar_uploads():
+    """Passa os uploads antigos (uploads/<nome>) para blobs com hash e atualiza as colunas."""
+    colunas = [(Candidatura, "ficheiro_cv"), (Utilizador, "cv_principal"),
+               (Utilizador, "logo_empresa"), (Publicacao, "foto")]
+    chaves, migrados, em_falta = {}, set(), set()
+    for modelo, coluna in colunas:
+        for obj in modelo.query.filter(getattr(modelo, coluna).isnot(None)):
+            nome = getattr(obj, coluna)
+            if e_chave(nome) or nome in em_falta:
+                continue
+            if nome not in chaves:
+                caminho = armazenamento.caminho_local(nome)
+                if not caminho or not os.path.isfile(caminho):
+                    em_falta.add(nome)
+                    continue
+                with open(caminho, "rb") as f:
+                    chaves[nome] = armazenamento.guardar_stream(f, nome)
+                migrados.add(caminho)
+            setattr(obj, coluna, chaves[nome])
+        if db.session.dirty:
+            # Logos nos cartões de /api/vagas e no índice de empresas: os URLs mudam com a coluna
+            incrementar_versao(VERSAO_VAGAS)
+            incrementar_versao(VERSAO_EMPRESAS)
+        db.session.commit()
+    etiquetas.invalidar("vagas", "inicio", "publicacoes")  # páginas em cache com os URLs antigos
+    for caminho in migrados:
+        os.remove(caminho)
+    print(f"{len(chaves)} ficheiros migrados; em falta: {sorted(em_falta) or 'nenhum'}")
+
+
+@app.cli.command("verificar-planos")
+def verificar_planos():
+    """EXPLAIN das queries quentes; sai com código 1 se alguma ler uma tabela inteira ou ordenar sem índice."""
+    from servicos.planos import verificar
+    falhas = 0
+    for nome, problemas, plano in verificar():
+        print(f"{'FALHA' if problemas else 'OK':5} {nome}" + (f" ({'; '.join(problemas)})" if problemas else ""))
+        for linha in plano:
+            print(f"        {linha}")
+        falhas += bool(problemas)
+    print(f"{falhas} queries com problemas")
+    if falhas:
+        raise SystemExit(1)
+
+
+@app.cli.command("verificar-queries")
+def verificar_queries():
+    """Pede cada rota de servicos/bench.py com orçamento em MAX_QUERIES; sai com código 1 se alguma passar."""
+    from servicos import bench
+    from servicos.instrumentacao import verificar_max_queries
+    app.config["AGENDADOR_NA_WEB"] = False  # o test client passa pelo before_request; sem tarefas a meio
     with app.app_context():
-        importar_vagas_externas()
-scheduler.add_job(tarefa_atualizar_vagas, "interval", minutes=30)
-scheduler.start()
+        ctx = bench.contexto_bench()
+    falhas = 0
+    for nome, perfil, url in bench.ROTAS:
+        if nome not in bench.MAX_QUERIES:
+            continue
+        cliente, url = bench.cliente_para(app, perfil, ctx), url.format(**ctx)
+        cliente.get(url)  # aquece caches (páginas, índice de empresas)
+        try:
+            verificar_max_queries(cliente, url, bench.MAX_QUERIES[nome])
+            print(f"OK    {nome} (máximo {bench.MAX_QUERIES[nome]})")
+        except AssertionError as e:
+            print(f"FALHA {nome}: {e}")
+            falhas += 1
+    if falhas:
+        raise SystemExit(1)
+
+@app.cli.command("seed-bench")
+@click.option("--escala", default=1.0, show_default=True,
+              help="1.0 = 50k estudantes, 2k empresas, 200k vagas, 2M candidaturas, 500k favoritos")
+@click.option("--semente", default=42, show_default=True)
+@click.option("--lote", default=10_000, show_default=True, help="linhas por INSERT em lote")
+def seed_bench(escala, semente, lote):
+    """Acrescenta dados sintéticos para benchmarks (usar numa BD própria: DATABASE_URL=sqlite:////tmp/bench.db)."""
+    from servicos import bench
+    inicio = time.time()
+    try:
+        contagens = bench.semear(escala, semente, lote, CATEGORIAS_VAGAS, DISTRITOS)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    incrementar_versao(VERSAO_VAGAS)
+    incrementar_versao(VERSAO_EMPRESAS)
+    db.session.commit()
+    etiquetas.invalidar("vagas", "inicio", "publicacoes")
+    print(f"seed: {sum(contagens.values())} linhas em {time.time() - inicio:.0f}s; "
+          f"senha de todos os utilizadores @{bench.DOMINIO}: {bench.SENHA}")
+
+
+@app.cli.command("bench")
+@click.option("--pedidos", default=200, show_default=True, help="pedidos medidos por rota (e por worker)")
+@click.option("--aquecimento", default=10, show_default=True)
+@click.option("--workers", default=1, show_default=True, help="processos em paralelo (modo carga)")
+@click.option("--rota", "rotas", multiple=True, help="só estas rotas (nome em servicos/bench.py ROTAS)")
+@click.option("--saida", default="bench.json", show_default=True)
+@click.option("--comparar", "baseline", type=click.Path(exists=True), help="JSON de uma execução anterior")
+def bench_rotas(pedidos, aquecimento, workers, rotas, saida, baseline):
+    """Mede p50/p95/p99, queries por pedido e RSS de cada rota e grava o resultado em JSON."""
+    from servicos import bench
+    app.config["AGENDADOR_NA_WEB"] = False  # nem tarefas (RSS, e-mail, GC) nem liderança durante a medição
+    escolhidas = [r for r in bench.ROTAS if not rotas or r[0] in rotas]
+    resultado = bench.medir(app, escolhidas, pedidos, aquecimento, workers)
+    bench.gravar(resultado, saida)
+    for nome, r in resultado["rotas"].items():
+        print(f"{nome:22} p50={r['p50_ms']:>8}ms p95={r['p95_ms']:>8}ms p99={r['p99_ms']:>8}ms "
+              f"queries={r['queries_media']:>6} estados={r['estados']} rss={r['rss_mb']}MB")
+    print(f"{resultado['debito_rps']} pedidos/s com {workers} worker(s); resultado em {saida}")
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            print("\n".join(bench.comparar(json.load(f), resultado)))
 
 # ===== Rotas =====
 @app.route("/", endpoint="pagina_inicial")
+@pagina_em_cache("inicio", "vagas")
 def pagina_inicial():
-    importar_vagas_externas()
-
-    vagas_internas = Vaga.query.filter_by(externa=False).order_by(Vaga.id.desc()).limit(3).all()
-    vagas_externas = Vaga.query.filter_by(externa=True).order_by(Vaga.id.desc()).limit(3).all()
+    # Queries sem .all(): o template só as executa se o fragmento não estiver em cache
+    vagas_internas = Vaga.query.filter_by(externa=False).order_by(Vaga.id.desc()).limit(3)
+    vagas_externas = Vaga.query.filter_by(externa=True).order_by(Vaga.id.desc()).limit(3)
 
-    noticias = Publicacao.query.filter_by(tipo="noticia").order_by(Publicacao.data_hora.desc()).limit(3).all()
-    dicas = Publicacao.query.filter_by(tipo="dica").order_by(Publicacao.data_hora.desc()).limit(3).all()
+    noticias = Publicacao.query.filter_by(tipo="noticia").order_by(Publicacao.data_hora.desc()).limit(3)
+    dicas = Publicacao.query.filter_by(tipo="dica").order_by(Publicacao.data_hora.desc()).limit(3)
 
     return render_template("index.html",
                            vagas_internas=vagas_internas,
                            vagas_externas=vagas_externas,
                            noticias=noticias,
-                           dicas=dicas,
-                           fav_ids=ids_favoritos_do_estudante())
+                           dicas=dicas)
 
 # LOGIN
 @app.route("/login", methods=["GET","POST"], endpoint="login")
@@ -222,105 +508,56 @@ def registo():
                     # Upload do logo
                     ficheiro = request.files.get("logo_empresa")
                     if ficheiro and ficheiro.filename != "":
-                        from werkzeug.utils import secure_filename
-                        filename = secure_filename(ficheiro.filename)
-                        caminho = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-                        ficheiro.save(caminho)
-                        novo.logo_empresa = filename
+                        novo.logo_empresa = guardar_imagem(ficheiro)
+                        if novo.logo_empresa is None:
+                            erro = ERRO_IMAGEM
 
             if not erro:
                 db.session.add(novo)
+                if novo.tipo == "empresa":
+                    marcar_empresa_alterada()
                 db.session.commit()
+                if novo.tipo == "empresa":
+                    empresa_alterada(novo.id, novo.nome_empresa)
                 return redirect(url_for("login"))
 
     return render_template("registo.html", erro=erro)
 
-# LISTA VAGAS (com filtros simples e paginação)
-@app.route("/vagas", endpoint="pagina_vagas")
-def pagina_vagas():
-    q = request.args.get("q", "").strip()
-    cidade = request.args.get("cidade", "").strip()
-    categoria = request.args.get("categoria", "").strip()
-    horario = request.args.get("horario", "").strip()
-    tipo = request.args.get("tipo", "").strip()
-    empresa_nome = request.args.get("empresa", "").strip()
-    natureza = request.args.get("natureza", "").strip()
-    pagina = request.args.get("pagina", 1, type=int)
-    por_pagina = 9
-
-    query = Vaga.query.order_by(Vaga.id.desc())
-
-    # filtros
-    if q:
-        query = query.filter((Vaga.titulo.ilike(f"%{q}%")) | (Vaga.descricao.ilike(f"%{q}%")))
-    if cidade:
-        query = query.filter(Vaga.cidade.ilike(f"%{cidade}%"))
-    if categoria:
-        query = query.filter(Vaga.categoria == categoria)
-    if horario:
-        query = query.filter(Vaga.horario == horario)
-    if tipo:
-        query = query.filter(Vaga.tipo == tipo)
-    if empresa_nome:
-        query = query.join(Utilizador, Vaga.empresa_id == Utilizador.id).filter(
-            Utilizador.nome_empresa.ilike(f"%{empresa_nome}%")
-        )
-    if natureza == "interna":
-        query = query.filter(Vaga.externa == False)
-    elif natureza == "externa":
-        query = query.filter(Vaga.externa == True)
+# Distritos fixos (Portugal)
+DISTRITOS = [
+    "Aveiro","Beja","Braga","Bragança","Castelo Branco","Coimbra","Évora","Faro",
+    "Guarda","Leiria","Lisboa","Portalegre","Porto","Santarém","Setúbal",
+    "Viana do Castelo","Vila Real","Viseu",
+    "Região Autónoma dos Açores","Região Autónoma da Madeira"
+]
 
-    total = query.count()
-    vagas = query.offset((pagina - 1) * por_pagina).limit(por_pagina).all()
-
-    # Distritos fixos (Portugal)
-    distritos = [
-        "Aveiro","Beja","Braga","Bragança","Castelo Branco","Coimbra","Évora","Faro",
-        "Guarda","Leiria","Lisboa","Portalegre","Porto","Santarém","Setúbal",
-        "Viana do Castelo","Vila Real","Viseu",
-        "Região Autónoma dos Açores","Região Autónoma da Madeira"
-    ]
-
-    # Categorias fixas (SRS)
-    categorias = [
-        "Administração / Secretariado","Agricultura / Florestas / Pescas","Arquitectura / Design",
-        "Artes / Entretenimento / Media","Banca / Seguros / Serviços Financeiros","Beleza / Moda / Bem Estar",
-        "Call Center / Help Desk","Comercial / Vendas","Comunicação Social / Media","Conservação / Manutenção / Técnica",
-        "Construção Civil","Contabilidade / Finanças","Desporto / Ginásios","Direito / Justiça",
-        "Educação / Formação","Engenharia (Ambiente)","Engenharia (Civil)","Engenharia (Eletrotécnica)",
-        "Engenharia (Mecânica)","Engenharia (Química / Biologia)","Farmácia / Biotecnologia",
-        "Gestão de Empresas / Economia","Gestão RH","Hotelaria / Turismo","Imobiliário",
-        "Indústria / Produção","Informática (Análise de Sistemas)","Informática (Formação)",
-        "Informática (Gestão de Redes)","Informática (Internet)","Informática (Multimédia)",
-        "Informática (Programação)","Informática (Técnico de Hardware)","Informática (Comercial / Gestor de Conta)",
-        "Limpezas / Domésticas","Lojas / Comércio / Balcão","Publicidade / Marketing","Relações Públicas",
-        "Restauração / Bares / Pastelarias","Saúde / Medicina / Enfermagem","Serviços Sociais",
-        "Serviços Técnicos","Telecomunicações","Transportes / Logística"
-    ]
-
-    # Empresas da BD
-    empresas = [e.nome_empresa for e in Utilizador.query.filter_by(tipo="empresa").all() if e.nome_empresa]
+# Categorias fixas (SRS)
+CATEGORIAS_VAGAS = [
+    "Administração / Secretariado","Agricultura / Florestas / Pescas","Arquitectura / Design",
+    "Artes / Entretenimento / Media","Banca / Seguros / Serviços Financeiros","Beleza / Moda / Bem Estar",
+    "Call Center / Help Desk","Comercial / Vendas","Comunicação Social / Media","Conservação / Manutenção / Técnica",
+    "Construção Civil","Contabilidade / Finanças","Desporto / Ginásios","Direito / Justiça",
+    "Educação / Formação","Engenharia (Ambiente)","Engenharia (Civil)","Engenharia (Eletrotécnica)",
+    "Engenharia (Mecânica)","Engenharia (Química / Biologia)","Farmácia / Biotecnologia",
+    "Gestão de Empresas / Economia","Gestão RH","Hotelaria / Turismo","Imobiliário",
+    "Indústria / Produção","Informática (Análise de Sistemas)","Informática (Formação)",
+    "Informática (Gestão de Redes)","Informática (Internet)","Informática (Multimédia)",
+    "Informática (Programação)","Informática (Técnico de Hardware)","Informática (Comercial / Gestor de Conta)",
+    "Limpezas / Domésticas","Lojas / Comércio / Balcão","Publicidade / Marketing","Relações Públicas",
+    "Restauração / Bares / Pastelarias","Saúde / Medicina / Enfermagem","Serviços Sociais",
+    "Serviços Técnicos","Telecomunicações","Transportes / Logística"
+]
 
+# LISTA VAGAS: só o formulário de filtros; os cartões, o total e os favoritos vêm de /api/vagas,
+# /api/vagas/facetas e /api/favoritos (scroll infinito em templates/vagas.html)
+@app.route("/vagas", endpoint="pagina_vagas")
+def pagina_vagas():
     return render_template(
         "vagas.html",
-        vagas=vagas,
-        total=total,
-        pagina=pagina,
-        tem_prev=pagina > 1,
-        tem_next=(pagina * por_pagina) < total,
-        filtros={
-            "q": q,
-            "cidade": cidade,
-            "categoria": categoria,
-            "horario": horario,
-            "tipo": tipo,
-            "empresa": empresa_nome,
-            "natureza": natureza,
-        },
-        cidades=distritos,
-        categorias=categorias,
-        empresas=empresas,
-        fav_ids=ids_favoritos_do_estudante(),
+        filtros=ler_filtros_vagas(),
+        cidades=DISTRITOS,
+        categorias=CATEGORIAS_VAGAS,
+        empresas=garantir_indice().nomes(),  # índice em memória, ordem alfabética
     )
 
 # DETALHES + candidatura (internas)
@@ -346,12 +583,11 @@ def detalhes_vaga(vaga_id):
             elif not allowed_file(ficheiro.filename):
                 erro = "Aceites: PDF/DOC/DOCX."
             else:
-                nome = secure_filename(ficheiro.filename)
-                caminho = os.path.join(app.config["UPLOAD_FOLDER"], nome)
-                ficheiro.save(caminho)
+                nome = armazenamento.guardar_upload(ficheiro)
                 db.session.add(Candidatura(
                     estudante_id=session["utilizador_id"],
                     vaga_id=vaga.id,
+                    empresa_id=vaga.empresa_id,
                     ficheiro_cv=nome
                 ))
                 db.session.commit()
@@ -374,20 +610,31 @@ def favoritar(vaga_id):
     f=Favorito.query.filter_by(estudante_id=session["utilizador_id"], vaga_id=vaga.id).first()
     if f: db.session.delete(f)
     else: db.session.add(Favorito(estudante_id=session["utilizador_id"], vaga_id=vaga.id))
+    favoritos_alterados()
     db.session.commit()
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"vaga_id": vaga.id, "favorito": f is None})
     return redirect(request.referrer or url_for("pagina_vagas"))
 
+@app.route("/api/favoritos", endpoint="api_favoritos")
+def api_favoritos():
+    resp = jsonify({"ids": sorted(ids_favoritos_do_estudante())})
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
 @app.route("/favoritos", endpoint="pagina_favoritos")
 def pagina_favoritos():
     if session.get("tipo")!="estudante": return redirect(url_for("login"))
     favoritos=(Favorito.query.filter_by(estudante_id=session["utilizador_id"])
-               .join(Vaga, Favorito.vaga_id==Vaga.id).order_by(Favorito.id.desc()).all())
+               .join(Vaga, Favorito.vaga_id==Vaga.id).options(contains_eager(Favorito.vaga))
+               .order_by(Favorito.id.desc()).all())
     return render_template("favoritos.html", favoritos=favoritos)
 
 @app.route("/candidaturas", endpoint="minhas_candidaturas")
 def minhas_candidaturas():
     if session.get("tipo")!="estudante": return redirect(url_for("login"))
-    cands=Candidatura.query.filter_by(estudante_id=session["utilizador_id"]).all()
+    cands=(Candidatura.query.filter_by(estudante_id=session["utilizador_id"])
+           .options(joinedload(Candidatura.vaga)).all())
     return render_template("candidaturas.html", candidaturas=cands)
 
 # EMPRESA
@@ -407,7 +654,7 @@ def publicar_vaga():
             horario=request.form.get("horario") or None, tipo=request.form.get("tipo") or None,
             externa=False, empresa_id=session.get("utilizador_id")
         )
-        db.session.add(vaga); db.session.commit()
+        db.session.add(vaga); marcar_vagas_alteradas(); db.session.commit()
         return redirect(url_for("minhas_vagas"))
     return render_template("publicar_vaga.html")
 
@@ -429,7 +676,7 @@ def editar_vaga(vaga_id):
         vaga.cidade=request.form.get("cidade") or None
         vaga.horario=request.form.get("horario") or None
         vaga.tipo=request.form.get("tipo") or None
-        db.session.commit(); return redirect(url_for("minhas_vagas"))
+        marcar_vagas_alteradas(); db.session.commit(); return redirect(url_for("minhas_vagas"))
     return render_template("editar_vaga.html", vaga=vaga)
 
 @app.route("/remover_vaga/<int:vaga_id>", methods=["POST"], endpoint="remover_vaga")
@@ -437,18 +684,55 @@ def remover_vaga(vaga_id):
     if session.get("tipo")!="empresa": return redirect(url_for("login"))
     vaga=Vaga.query.get_or_404(vaga_id)
     if vaga.empresa_id!=session["utilizador_id"]: return redirect(url_for("minhas_vagas"))
-    for c in vaga.candidaturas:
-        if c.ficheiro_cv:
-            caminho=os.path.join(app.config["UPLOAD_FOLDER"], c.ficheiro_cv)
-            if os.path.exists(caminho): os.remove(caminho)
-    db.session.delete(vaga); db.session.commit()
+    # Os CVs das candidaturas são libertados em cascata (servicos/armazenamento.py)
+    db.session.delete(vaga); marcar_vagas_alteradas(); db.session.commit()
     return redirect(url_for("minhas_vagas"))
 
+CANDIDATURAS_POR_PAGINA = 20
+
+# Queries de gerir_candidaturas (também verificadas por servicos/planos.py)
+def query_vagas_com_candidaturas(uid):
+    return (db.session.query(Vaga.id, Vaga.titulo, func.count(Candidatura.id).label("n"))
+            .outerjoin(Candidatura, Candidatura.vaga_id==Vaga.id).filter(Vaga.empresa_id==uid)
+            .group_by(Vaga.id).order_by(Vaga.id.desc()))  # só o id: o GROUP BY segue ix_vagas_empresa_id
+
+def query_caixa_candidaturas(uid, vaga_id=None):
+    query=(Candidatura.query.join(Vaga, Candidatura.vaga_id==Vaga.id).filter(Candidatura.empresa_id==uid)
+           .options(contains_eager(Candidatura.vaga), joinedload(Candidatura.estudante)))
+    return query if vaga_id is None else query.filter(Candidatura.vaga_id==vaga_id)
+
 @app.route("/gerir_candidaturas", endpoint="gerir_candidaturas")
 def gerir_candidaturas():
     if session.get("tipo")!="empresa": return redirect(url_for("login"))
-    cands=Candidatura.query.join(Vaga).filter(Vaga.empresa_id==session["utilizador_id"]).all()
-    return render_template("gerir_candidaturas.html", candidaturas=cands)
+    uid=session["utilizador_id"]
+    # Vagas da empresa com o nº de candidaturas (filtro e totais); as candidaturas vêm por páginas (cursor)
+    vagas=query_vagas_com_candidaturas(uid).all()
+    vaga_id=request.args.get("vaga", type=int)
+    if vaga_id is not None and vaga_id not in {v.id for v in vagas}: return "Vaga não encontrada", 404
+    cands, cursor_seguinte, cursor_anterior = pagina_keyset(
+        query_caixa_candidaturas(uid, vaga_id), None, request.args.get("cursor", ""), CANDIDATURAS_POR_PAGINA,
+        chave=Candidatura.id)
+    return render_template("gerir_candidaturas.html", candidaturas=cands, vagas=vagas, vaga_id=vaga_id,
+                           total=sum(v.n for v in vagas if vaga_id in (None, v.id)),
+                           cursor_seguinte=cursor_seguinte, cursor_anterior=cursor_anterior)
+
+@app.route("/gerir_candidaturas/<int:vaga_id>/cvs.zip", endpoint="descarregar_cvs_vaga")
+def descarregar_cvs_vaga(vaga_id):
+    tipo=session.get("tipo")
+    if tipo not in ["empresa","admin"]: return redirect(url_for("login"))
+    vaga=Vaga.query.get_or_404(vaga_id)
+    if tipo=="empresa" and vaga.empresa_id!=session["utilizador_id"]: return "Sem acesso", 403
+    linhas=(db.session.query(Candidatura.id, Candidatura.ficheiro_cv, Utilizador.nome)
+            .join(Utilizador, Candidatura.estudante_id==Utilizador.id)
+            .filter(Candidatura.vaga_id==vaga.id).order_by(Candidatura.id).yield_per(500))
+    ficheiros=((f"{cid}_{secure_filename(nome or '') or 'candidato'}{os.path.splitext(chave)[1]}", chave)
+               for cid, chave, nome in linhas)
+    # O ZIP é gerado enquanto é enviado: sem Content-Length, e o nginx não deve guardá-lo antes de o passar
+    resp=Response(stream_with_context(armazenamento.zip_stream(ficheiros)), mimetype="application/zip")
+    resp.headers["Content-Disposition"]=f'attachment; filename="cvs-vaga-{vaga.id}.zip"'
+    resp.headers["Cache-Control"]="private, no-store"
+    resp.headers["X-Accel-Buffering"]="no"
+    return resp
 
 # ADMIN (placeholder)
 @app.route("/admin", endpoint="pagina_admin")
@@ -456,10 +740,67 @@ def pagina_admin():
     if session.get("tipo")!="admin": return redirect(url_for("login"))
     return render_template("admin.html")
 
+# FICHEIROS: /media/... inline e público (logotipos, fotos); /uploads/... como anexo, só para quem pode ver
+def e_imagem_publica(chave):
+    # Cache curta só do "sim": a mesma imagem é pedida por muitas páginas. Um "não" deixa de o ser assim
+    # que a chave é gravada numa coluna (upload, migrar-uploads), e em cache dava 404 à imagem nova.
+    if cache.obter(f"media_publica:{chave}", False):
+        return True
+    publica = (db.session.query(Publicacao.id).filter_by(foto=chave).first() is not None
+               or db.session.query(Utilizador.id).filter_by(logo_empresa=chave).first() is not None)
+    if publica:
+        cache.guardar(f"media_publica:{chave}", True)
+    return publica
+
+def pode_descarregar(chave):
+    tipo, uid = session.get("tipo"), session.get("utilizador_id")
+    if tipo == "admin" or e_imagem_publica(chave):
+        return True
+    if tipo == "estudante":
+        return (db.session.query(Utilizador.id).filter_by(id=uid, cv_principal=chave).first() is not None
+                or db.session.query(Candidatura.id).filter_by(estudante_id=uid, ficheiro_cv=chave).first() is not None)
+    if tipo == "empresa":
+        return (db.session.query(Candidatura.id).join(Vaga)
+                .filter(Vaga.empresa_id == uid, Candidatura.ficheiro_cv == chave).first() is not None)
+    return False
+
 # DOWNLOAD CV
 @app.route("/uploads/<filename>", endpoint="download_cv")
 def download_cv(filename):
-    return send_from_directory(app.config["UPLOAD_FOLDER"], filename, as_attachment=True)
+    if not pode_descarregar(filename):
+        return redirect(url_for("login")) if not session.get("utilizador_id") else ("Sem acesso", 403)
+    return armazenamento.enviar(filename, anexo=True, publico=False)
+
+@app.route("/media/<chave>", endpoint="media")
+def media(chave):
+    if not e_chave_imagem(chave) or not e_imagem_publica(chave):
+        return "Não encontrado", 404
+    return armazenamento.enviar(chave)
+
+# IMAGENS REDIMENSIONADAS (geradas no upload ou aqui, no primeiro pedido)
+@app.route("/media/<chave>/w<int:largura>.<formato>", endpoint="imagem_variante")
+def imagem_variante(chave, largura, formato):
+    if (largura not in imagens.LARGURAS or formato not in imagens.FORMATOS or not e_chave_imagem(chave)
+            or not e_imagem_publica(chave)):
+        return "Variante inválida", 404
+    variante = imagens.obter_variante(chave, largura, formato) if e_chave(chave) else None
+    return armazenamento.enviar(variante or chave)
+
+@app.template_global()
+def img_resp(chave, alt="", sizes="100vw", **atributos):
+    """<picture> com srcset WebP/JPEG das variantes; `class_` e `style` passam para o <img>."""
+    if not chave:
+        return ""
+    extra = " ".join(f'{k.rstrip("_")}="{escape(v)}"' for k, v in atributos.items())
+    if not (imagens.disponivel() and e_chave(chave)):
+        return Markup(f'<img src="{url_for("media", chave=chave)}" alt="{escape(alt)}" {extra}>')
+    srcset = {f: ", ".join(f'{url_for("imagem_variante", chave=chave, largura=l, formato=f)} {l}w'
+                           for l in imagens.LARGURAS) for f in imagens.FORMATOS}
+    src = url_for("imagem_variante", chave=chave, largura=640, formato="jpg")
+    return Markup(
+        f'<picture style="display:contents"><source type="image/webp" srcset="{srcset["webp"]}" sizes="{escape(sizes)}">'
+        f'<img src="{src}" srcset="{srcset["jpg"]}" sizes="{escape(sizes)}" alt="{escape(alt)}" loading="lazy" {extra}></picture>'
+    )
 
 # LOGOUT
 @app.route("/logout", endpoint="logout")
@@ -489,14 +830,13 @@ def pagina_perfil():
         # upload do CV principal
         ficheiro = request.files.get("cv_principal")
         if ficheiro and ficheiro.filename != "":
-            from werkzeug.utils import secure_filename
-            filename = secure_filename(ficheiro.filename)
-            caminho = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            ficheiro.save(caminho)
-            estudante.cv_principal = filename
+            if allowed_file(ficheiro.filename):
+                estudante.cv_principal = armazenamento.guardar_upload(ficheiro)
+            else:
+                erro = "Aceites: PDF/DOC/DOCX."
 
         db.session.commit()
-        sucesso = True
+        sucesso = erro is None
 
     return render_template("perfil.html", estudante=estudante, erro=erro, sucesso=sucesso)
 
@@ -515,14 +855,17 @@ def pagina_perfil_empresa():
         # upload de logotipo
         ficheiro = request.files.get("logo_empresa")
         if ficheiro and ficheiro.filename != "":
-            from werkzeug.utils import secure_filename
-            filename = secure_filename(ficheiro.filename)
-            caminho = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            ficheiro.save(caminho)
-            empresa.logo_empresa = filename
+            logo = guardar_imagem(ficheiro)
+            if logo is None:
+                erro = ERRO_IMAGEM
+            else:
+                empresa.logo_empresa = logo
+                marcar_vagas_alteradas()  # o logo aparece nos cartões de /api/vagas
 
+        marcar_empresa_alterada()
         db.session.commit()
-        sucesso = True
+        empresa_alterada(empresa.id, empresa.nome_empresa)
+        sucesso = erro is None
 
     return render_template("perfil_empresa.html", empresa=empresa, erro=erro, sucesso=sucesso)
 
@@ -557,7 +900,6 @@ def publicar_conteudo():
         return redirect(url_for("login"))
 
     if request.method == "POST":
-        from werkzeug.utils import secure_filename
         titulo = request.form.get("titulo")
         tipo = request.form.get("tipo")
         conteudo = request.form.get("conteudo")
@@ -565,10 +907,9 @@ def publicar_conteudo():
 
         ficheiro = request.files.get("foto")
         if ficheiro and ficheiro.filename != "":
-            filename = secure_filename(ficheiro.filename)
-            caminho = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            ficheiro.save(caminho)
-            foto = filename
+            foto = guardar_imagem(ficheiro)
+            if foto is None:
+                return render_template("publicar_conteudo.html", erro=ERRO_IMAGEM)
 
         pub = Publicacao(
             titulo=titulo,
@@ -579,6 +920,7 @@ def publicar_conteudo():
         )
         db.session.add(pub)
         db.session.commit()
+        publicacoes_alteradas()
         return redirect(url_for("gestao_publicacoes"))
 
     return render_template("publicar_conteudo.html")
@@ -596,13 +938,14 @@ def editar_publicacao(pub_id):
 
         ficheiro = request.files.get("foto")
         if ficheiro and ficheiro.filename != "":
-            from werkzeug.utils import secure_filename
-            filename = secure_filename(ficheiro.filename)
-            caminho = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            ficheiro.save(caminho)
-            pub.foto = filename
+            foto = guardar_imagem(ficheiro)
+            if foto is None:
+                db.session.rollback()
+                return render_template("editar_publicacao.html", pub=pub, erro=ERRO_IMAGEM)
+            pub.foto = foto
 
         db.session.commit()
+        publicacoes_alteradas()
         return redirect(url_for("gestao_publicacoes"))
 
     return render_template("editar_publicacao.html", pub=pub)
@@ -614,37 +957,54 @@ def remover_publicacao(pub_id):
         return redirect(url_for("login"))
     db.session.delete(pub)
     db.session.commit()
+    publicacoes_alteradas()
     return redirect(url_for("gestao_publicacoes"))
 
 @app.route("/noticias", endpoint="pagina_noticias")
+@pagina_em_cache("noticias")
 def pagina_noticias():
-    pubs = Publicacao.query.filter_by(tipo="noticia").order_by(Publicacao.data_hora.desc()).all()
+    pubs = Publicacao.query.filter_by(tipo="noticia").order_by(Publicacao.data_hora.desc())
     return render_template("pagina_noticias.html", publicacoes=pubs)
 
 @app.route("/dicas", endpoint="pagina_dicas")
+@pagina_em_cache("dicas")
 def pagina_dicas():
-    pubs = Publicacao.query.filter_by(tipo="dica").order_by(Publicacao.data_hora.desc()).all()
+    pubs = Publicacao.query.filter_by(tipo="dica").order_by(Publicacao.data_hora.desc())
     return render_template("pagina_dicas.html", publicacoes=pubs)
 
 @app.route("/publicacao/<int:pub_id>", endpoint="detalhe_publicacao")
+@pagina_em_cache("publicacao:{pub_id}")
 def detalhe_publicacao(pub_id):
-    pub = Publicacao.query.get_or_404(pub_id)
-    return render_template("detalhe_publicacao.html", pub=pub)
+    pub = Publicacao.query.options(joinedload(Publicacao.autor)).get_or_404(pub_id)
+    # Publicacao não tem relação para os comentários: uma query, com o autor no mesmo SELECT
+    comentarios = (Comentario.query.filter_by(publicacao_id=pub.id).options(joinedload(Comentario.autor))
+                   .order_by(Comentario.data_hora).all())
+    return render_template("detalhe_publicacao.html", pub=pub, comentarios=comentarios)
 
 
 @app.route("/conteudos", endpoint="pagina_conteudos")
+@pagina_em_cache("noticias", "dicas")
 def pagina_conteudos():
-    noticias = Publicacao.query.filter_by(tipo="noticia").order_by(Publicacao.data_hora.desc()).limit(5).all()
-    dicas = Publicacao.query.filter_by(tipo="dica").order_by(Publicacao.data_hora.desc()).limit(5).all()
-    mais_lidas = Publicacao.query.order_by(Publicacao.data_hora.asc()).limit(5).all()  # aqui poderíamos adicionar lógica de contagem de visualizações depois
+    noticias = Publicacao.query.filter_by(tipo="noticia").order_by(Publicacao.data_hora.desc()).limit(5)
+    dicas = Publicacao.query.filter_by(tipo="dica").order_by(Publicacao.data_hora.desc()).limit(5)
+    mais_lidas = Publicacao.query.order_by(Publicacao.data_hora.asc()).limit(5)  # aqui poderíamos adicionar lógica de contagem de visualizações depois
 
     return render_template("pagina_conteudos.html", noticias=noticias, dicas=dicas, mais_lidas=mais_lidas)
 
+# Rodapé "Mais recentes": em todas as páginas, por isso vem da cache (zero queries por render).
+# Publicar/editar/remover purga a etiqueta "publicacoes" (e com ela todas as páginas em cache).
+def _carregar_publicacoes_recentes():
+    pubs = (db.session.query(Publicacao.id, Publicacao.titulo)
+            .order_by(Publicacao.data_hora.desc()).limit(3).all())
+    return [{"id": p.id, "titulo": p.titulo} for p in pubs]
+
+def publicacoes_alteradas():
+    etiquetas.invalidar("publicacoes", "noticias", "dicas", "inicio")
+
 @app.context_processor
 def inject_publicacoes_recentes():
-    from modelos.modelos import Publicacao
-    recentes = Publicacao.query.order_by(Publicacao.data_hora.desc()).limit(3).all()
-    return dict(publicacoes_recentes=recentes)
+    chave = etiquetas.chave("publicacoes_recentes", ["publicacoes"])
+    return dict(publicacoes_recentes=cache.obter_ou_calcular(chave, _carregar_publicacoes_recentes))
 
 @app.route("/publicacao/<int:pub_id>/comentar", methods=["POST"], endpoint="comentar_publicacao")
 def comentar_publicacao(pub_id):
@@ -659,21 +1019,17 @@ def comentar_publicacao(pub_id):
             publicacao_id=pub_id
         )
         db.session.add(comentario)
-        db.session.commit()
 
-        # Enviar e-mail para o admin
+        # Notificação ao admin vai para a caixa de saída (mesma transação); o agendador envia-a
         pub = Publicacao.query.get_or_404(pub_id)
-        autor = Utilizador.query.get(session["utilizador_id"]) #Utilizador.query.filter_by(tipo="admin").all()
-
         link = url_for("detalhe_publicacao", pub_id=pub_id, _external=True)
-
-        msg = Message(
-            subject=f"Novo comentário em: {pub.titulo}",
-            recipients=["admin@adluc.pt"],  # <-- troca pelo e-mail real do admin
-            body=f"""
+        correio.enfileirar(
+            ["admin@adluc.pt"],  # <-- troca pelo e-mail real do admin
+            f"Novo comentário em: {pub.titulo}",
+            f"""
 Olá Admin,
 
-O estudante {autor.nome} comentou na publicação "{pub.titulo}".
+O estudante {session.get("nome")} comentou na publicação "{pub.titulo}".
 
 Comentário:
 {conteudo[:200]}...
@@ -682,99 +1038,113 @@ Veja em: {link}
 
 --
 Sistema adluc
-"""
+""",
+            tipo="comentario",
         )
-        try:
-            mail.send(msg)
-            print("Notificação enviada para o admin")
-        except Exception as e:
-            print("Erro ao enviar e-mail:", e)
+        db.session.commit()
+        etiquetas.invalidar(f"publicacao:{pub_id}")
 
     return redirect(url_for("detalhe_publicacao", pub_id=pub_id))
 
 @app.route("/api/empresas")
 def api_empresas():
-    termo = request.args.get("q", "").lower()
-    empresas = Utilizador.query.filter_by(tipo="empresa").all()
-    resultados = []
-
-    for e in empresas:
-        if termo in e.nome_empresa.lower():
-            resultados.append({"id": e.id, "nome": e.nome_empresa})
-
-    return jsonify(resultados)
+    limite = min(max(request.args.get("limite", 10, type=int), 1), 50)
+    resultados = garantir_indice().procurar(request.args.get("q", ""), limite)
+    return jsonify([{"id": i, "nome": nome} for i, nome in resultados])
+
+# Só as colunas que o cartão usa; descrição cortada no SQL e logo via LEFT JOIN (sem lazy-load por linha)
+LogoEmpresa = aliased(Utilizador)
+COLUNAS_API_VAGAS = (
+    Vaga.id, Vaga.titulo, func.substr(Vaga.descricao, 1, 120).label("descricao"),
+    Vaga.categoria, Vaga.cidade, Vaga.horario, Vaga.tipo, Vaga.externa, Vaga.link_externo,
+    LogoEmpresa.logo_empresa,
+)
+
+def query_api_vagas(filtros):
+    """(query, rank) dos cartões de /api/vagas, ainda sem cursor nem ORDER BY."""
+    query = (db.session.query(*COLUNAS_API_VAGAS).select_from(Vaga)
+             .outerjoin(LogoEmpresa, Vaga.empresa_id == LogoEmpresa.id))
+    return filtrar_vagas(query, filtros)
+
+def etag_api_vagas():
+    # Mesmo conjunto de parâmetros + mesma versão da tabela => mesma resposta
+    chave = f"{versao(VERSAO_VAGAS)}|{sorted(request.args.items(multi=True))}"
+    return hashlib.sha256(chave.encode()).hexdigest()[:32]
 
 @app.route("/api/vagas")
 def api_vagas():
-    q = request.args.get("q", "").lower()
-    cidade = request.args.get("cidade", "").lower()
-    categoria = request.args.get("categoria", "")
-    horario = request.args.get("horario", "")
-    tipo = request.args.get("tipo", "")
-    empresa_nome = request.args.get("empresa", "").lower()
-    natureza = request.args.get("natureza", "").lower()  # <-- novo filtro
-
-    query = Vaga.query
-
-    # filtros
-    if q:
-        query = query.filter(Vaga.titulo.ilike(f"%{q}%") | Vaga.descricao.ilike(f"%{q}%"))
-    if cidade:
-        query = query.filter(Vaga.cidade.ilike(f"%{cidade}%"))
-    if categoria:
-        query = query.filter(Vaga.categoria == categoria)
-    if horario:
-        query = query.filter(Vaga.horario == horario)
-    if tipo:
-        query = query.filter(Vaga.tipo == tipo)
-    if empresa_nome:
-        query = query.join(Utilizador, Vaga.empresa_id == Utilizador.id).filter(Utilizador.nome_empresa.ilike(f"%{empresa_nome}%"))
-    if natureza == "interna":
-        query = query.filter(Vaga.externa == False)
-    elif natureza == "externa":
-        query = query.filter(Vaga.externa == True)
-
-    vagas = query.order_by(Vaga.id.desc()).limit(50).all()
+    etag = etag_api_vagas()
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+        resp.set_etag(etag)
+        return resp
+
+    filtros = ler_filtros_vagas()
+    limite = min(max(request.args.get("limite", 50, type=int), 1), 100)
+    query, rank = query_api_vagas(filtros)
+    vagas, cursor_seguinte, cursor_anterior = pagina_keyset(query, rank, request.args.get("cursor", ""), limite)
+
+    # url_for uma vez por pedido em vez de duas por linha
+    fallback = url_for("static", filename="imagens/fallback_vaga.png")
+    link_interno = url_for("detalhes_vaga", vaga_id=0)[:-1]
+    # Cartões mostram o logo com ~300px de largura: variante w320 (JPEG e WebP)
+    prefixo_logo = url_for("imagem_variante", chave="x", largura=320, formato="jpg")[:-len("x/w320.jpg")]
 
     resultados = []
     for v in vagas:
         resultados.append({
             "id": v.id,
             "titulo": v.titulo,
-            "descricao": (v.descricao[:120] + "...") if v.descricao else "",
+            "descricao": (v.descricao + "...") if v.descricao else "",
             "categoria": v.categoria,
             "cidade": v.cidade,
             "horario": v.horario,
             "tipo": v.tipo,
             "externa": v.externa,
-            "link": v.link_externo if v.externa else url_for("detalhes_vaga", vaga_id=v.id),
+            "link": v.link_externo if v.externa else f"{link_interno}{v.id}",
             "imagem": (
-                url_for("static", filename="imagens/fallback_vaga.png")
-                if v.externa else (
-                    url_for("download_cv", filename=v.empresa.logo_empresa)
-                    if v.empresa and v.empresa.logo_empresa else url_for("static", filename="imagens/fallback_vaga.png")
-                )
-            )
+                fallback if v.externa or not v.logo_empresa
+                else f"{prefixo_logo}{quote(v.logo_empresa)}/w320.jpg"
+            ),
+            "imagem_webp": (
+                None if v.externa or not v.logo_empresa or not e_chave(v.logo_empresa)
+                else f"{prefixo_logo}{quote(v.logo_empresa)}/w320.webp"
+            ),
         })
-    return jsonify(resultados)
+    resposta = {"vagas": resultados, "next": cursor_seguinte, "prev": cursor_anterior}
+    if request.args.get("total") == "1":
+        resposta["total"] = contar_vagas(filtros)
+    resp = jsonify(resposta)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+@app.route("/api/vagas/facetas", endpoint="api_facetas_vagas")
+def api_facetas_vagas():
+    return jsonify(facetas_vagas(ler_filtros_vagas()))
 
 @app.route("/sobre", endpoint="pagina_sobre")
+@pagina_em_cache()
 def pagina_sobre():
     return render_template("sobre.html")
 
 @app.route("/termos", endpoint="pagina_termos")
+@pagina_em_cache()
 def pagina_termos():
     return render_template("termos.html")
 
 @app.route("/contactos", endpoint="pagina_contactos")
+@pagina_em_cache()
 def pagina_contactos():
     return render_template("contactos.html")
 
 @app.route("/razoes", endpoint="pagina_razoes")
+@pagina_em_cache()
 def pagina_razoes():
     return render_template("razoes.html")
 
 @app.route("/precos", endpoint="pagina_precos")
+@pagina_em_cache()
 def pagina_precos():
     return render_template("precos.html")
 
@@ -804,7 +1174,9 @@ def editar_utilizador(utilizador_id):
             u.nome = request.form.get("nome")
             u.email = request.form.get("email")
             u.tipo = request.form.get("tipo")
+            marcar_empresa_alterada()
             db.session.commit()
+            empresa_alterada(u.id, u.nome_empresa if u.tipo == "empresa" else None)
             sucesso = True
         except Exception as e:
             erro = f"Ocorreu um erro: {e}"
@@ -817,7 +1189,13 @@ def remover_utilizador(utilizador_id):
         return redirect(url_for("login"))
     u = Utilizador.query.get_or_404(utilizador_id)
     db.session.delete(u)
+    era_empresa = u.tipo == "empresa"
+    if era_empresa:
+        marcar_vagas_alteradas()  # as vagas da empresa vão em cascata
+        marcar_empresa_alterada()
     db.session.commit()
+    if era_empresa:
+        empresa_alterada(utilizador_id, None)
     return redirect(url_for("gerir_utilizadores"))
 
 @app.route("/admin/relatorios", endpoint="relatorios")
@@ -825,44 +1203,96 @@ def relatorios():
     if session.get("tipo") != "admin":
         return redirect(url_for("login"))
 
-    total_utilizadores = Utilizador.query.count()
-    total_estudantes = Utilizador.query.filter_by(tipo="estudante").count()
-    total_empresas = Utilizador.query.filter_by(tipo="empresa").count()
-    total_admins = Utilizador.query.filter_by(tipo="admin").count()
-
-    total_vagas = Vaga.query.count()
-    vagas_internas = Vaga.query.filter_by(externa=False).count()
-    vagas_externas = Vaga.query.filter_by(externa=True).count()
-
-    total_candidaturas = Candidatura.query.count()
-    media_candidaturas = round(total_candidaturas / total_vagas, 2) if total_vagas else 0
-
-    total_favoritos = Favorito.query.count()
-
-    total_noticias = Publicacao.query.filter_by(tipo="noticia").count()
-    total_dicas = Publicacao.query.filter_by(tipo="dica").count()
+    # Linhas pré-calculadas (servicos/estatisticas.py): custo constante, seja qual for o tamanho das tabelas
+    t = estatisticas.totais()
+    total_vagas = t[("vagas", "interna")] + t[("vagas", "externa")]
+    total_candidaturas = t[("candidaturas", "")]
 
     return render_template(
         "relatorios.html",
-        total_utilizadores=total_utilizadores,
-        total_estudantes=total_estudantes,
-        total_empresas=total_empresas,
-        total_admins=total_admins,
+        total_utilizadores=sum(v for (metrica, _), v in t.items() if metrica == "registos"),
+        total_estudantes=t[("registos", "estudante")],
+        total_empresas=t[("registos", "empresa")],
+        total_admins=t[("registos", "admin")],
         total_vagas=total_vagas,
-        vagas_internas=vagas_internas,
-        vagas_externas=vagas_externas,
+        vagas_internas=t[("vagas", "interna")],
+        vagas_externas=t[("vagas", "externa")],
         total_candidaturas=total_candidaturas,
-        media_candidaturas=media_candidaturas,
-        total_favoritos=total_favoritos,
-        total_noticias=total_noticias,
-        total_dicas=total_dicas,
+        media_candidaturas=round(total_candidaturas / total_vagas, 2) if total_vagas else 0,
+        total_favoritos=t[("favoritos", "")],
+        total_noticias=t[("publicacoes", "noticia")],
+        total_dicas=t[("publicacoes", "dica")],
+        top_vagas=estatisticas.top_vagas_candidaturas(),
+        serie=estatisticas.serie_diaria(30),
     )
 
+# EXPORTAÇÃO (CSV/NDJSON gerado enquanto é enviado; ver servicos/exportacao.py)
+@app.route("/admin/export/<entidade>", endpoint="exportar")
+def exportar(entidade):
+    if session.get("tipo") != "admin":
+        return redirect(url_for("login"))
+    formato = request.args.get("formato", "csv")
+    if formato not in exportacao.FORMATOS:
+        return f"formato inválido: {formato} (csv ou ndjson)", 400
+    try:
+        stmt = exportacao.consulta(entidade, request.args)
+    except LookupError:
+        return "Não encontrado", 404
+    except ValueError as e:
+        return str(e), 400
+    try:
+        exportacao.verificar(db.engine, stmt)
+    except DBAPIError as e:
+        print(f"exportação: {entidade} falhou antes de começar: {e.orig}")
+        return "Exportação indisponível: a base de dados não está atualizada (flask db upgrade).", 503
+    resp = Response(exportacao.gerar(db.engine, entidade, stmt, formato), content_type=exportacao.FORMATOS[formato])
+    resp.headers["Content-Disposition"] = (
+        f'attachment; filename="{entidade}-{datetime.utcnow():%Y%m%d-%H%M}.{formato}"')
+    resp.headers["Cache-Control"] = "private, no-store"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
 @app.route("/admin/configuracoes", endpoint="pagina_configuracoes")
 def pagina_configuracoes():
     if session.get("tipo") != "admin":
         return redirect(url_for("login"))
-    return render_template("configuracoes.html")
+    estado_vagas = db.session.get(EstadoTarefa, TAREFA_VAGAS)
+    garantir_fontes()
+    fontes = FonteFeed.query.order_by(FonteFeed.id).all()
+    return render_template("configuracoes.html", estado_vagas=estado_vagas, fontes=fontes,
+                           emails=correio.contar_por_estado())
+
+@app.route("/admin/feeds", methods=["POST"], endpoint="adicionar_fonte_feed")
+def adicionar_fonte_feed():
+    if session.get("tipo") != "admin":
+        return redirect(url_for("login"))
+    url = (request.form.get("url") or "").strip()
+    if url.startswith(("http://", "https://")) and not FonteFeed.query.filter_by(url=url).first():
+        db.session.add(FonteFeed(url=url, categoria=request.form.get("categoria") or None,
+                                 tipo=request.form.get("tipo") or None))
+        db.session.commit()
+    return redirect(url_for("pagina_configuracoes"))
+
+@app.route("/admin/feeds/<int:fonte_id>/alternar", methods=["POST"], endpoint="alternar_fonte_feed")
+def alternar_fonte_feed(fonte_id):
+    if session.get("tipo") != "admin":
+        return redirect(url_for("login"))
+    fonte = FonteFeed.query.get_or_404(fonte_id)
+    fonte.ativo = not fonte.ativo
+    if fonte.ativo:
+        fonte.erros_seguidos, fonte.proxima_recolha = 0, None
+    db.session.commit()
+    return redirect(url_for("pagina_configuracoes"))
+
+@app.route("/admin/vagas_externas/atualizar", methods=["POST"], endpoint="atualizar_vagas_externas")
+def atualizar_vagas_externas():
+    if session.get("tipo") != "admin":
+        return redirect(url_for("login"))
+    # Fica registado na BD; o processo líder corre a tarefa em background e o pedido não espera pelos feeds
+    agendador.pedir_execucao(TAREFA_VAGAS)
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"estado": "agendado"}), 202
+    return redirect(url_for("pagina_configuracoes"))
 
 @app.route("/admin/alterar_senha", methods=["POST"], endpoint="alterar_senha_admin")
 def alterar_senha_admin():
@@ -885,10 +1315,12 @@ def alterar_senha_admin():
 @app.route("/comentario/<int:coment_id>/remover", methods=["POST"], endpoint="remover_comentario")
 def remover_comentario(coment_id):
     comentario = Comentario.query.get_or_404(coment_id)
+    pub_id = comentario.publicacao_id
     if session.get("tipo") == "admin":
         db.session.delete(comentario)
         db.session.commit()
-    return redirect(url_for("detalhe_publicacao", pub_id=comentario.publicacao_id))
+        etiquetas.invalidar(f"publicacao:{pub_id}")
+    return redirect(url_for("detalhe_publicacao", pub_id=pub_id))
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,20 @@
+import os
+import shutil
+
+# Lido automaticamente pelo gunicorn (Procfile/Dockerfile). Com PROMETHEUS_MULTIPROC_DIR definido,
+# cada worker escreve as métricas nessa pasta e o /metrics de qualquer um soma todos (servicos/metricas.py).
+
+
+def on_starting(server):
+    # Valores de um arranque anterior somavam-se aos novos
+    pasta = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if pasta:
+        shutil.rmtree(pasta, ignore_errors=True)
+        os.makedirs(pasta, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Tira os gauges "livesum" (pool da BD) do worker que morreu
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
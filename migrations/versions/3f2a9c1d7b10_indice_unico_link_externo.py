@@ -0,0 +1,59 @@
+"""indice unico em vagas.link_externo
+
+Revision ID: 3f2a9c1d7b10
+Revises: 
+Create Date: 2026-10-17 18:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# Vaga duplicada = mesma link_externo que outra com id menor; a de id menor é a que fica
+DUPLICADAS = """
+    SELECT v.id FROM vagas v
+    WHERE v.link_externo IS NOT NULL
+      AND v.id > (SELECT MIN(v2.id) FROM vagas v2 WHERE v2.link_externo = v.link_externo)
+"""
+MANTIDA = """
+    (SELECT MIN(v2.id) FROM vagas v2
+     WHERE v2.link_externo = (SELECT v.link_externo FROM vagas v WHERE v.id = {col}))
+"""
+
+
+def _indices(tabela):
+    return {i["name"] for i in sa.inspect(op.get_bind()).get_indexes(tabela)}
+
+
+def upgrade():
+    # db.create_all() já cria o índice em bases de dados novas
+    if "uq_vagas_link_externo" in _indices("vagas"):
+        return
+
+    # Limpa duplicados criados por importações concorrentes antes de impor a unicidade
+    op.execute(f"""
+        UPDATE favoritos SET vaga_id = {MANTIDA.format(col='favoritos.vaga_id')}
+        WHERE vaga_id IN ({DUPLICADAS})
+          AND NOT EXISTS (SELECT 1 FROM favoritos f2
+                          WHERE f2.estudante_id = favoritos.estudante_id
+                            AND f2.vaga_id = {MANTIDA.format(col='favoritos.vaga_id')})
+    """)
+    op.execute(f"DELETE FROM favoritos WHERE vaga_id IN ({DUPLICADAS})")
+    op.execute(f"""
+        UPDATE candidaturas SET vaga_id = {MANTIDA.format(col='candidaturas.vaga_id')}
+        WHERE vaga_id IN ({DUPLICADAS})
+    """)
+    op.execute(f"DELETE FROM vagas WHERE id IN (SELECT id FROM ({DUPLICADAS}) d)")
+
+    op.create_index("uq_vagas_link_externo", "vagas", ["link_externo"], unique=True)
+
+
+def downgrade():
+    op.drop_index("uq_vagas_link_externo", table_name="vagas")
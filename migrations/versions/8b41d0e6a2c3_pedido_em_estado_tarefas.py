@@ -0,0 +1,31 @@
+"""pedido_em em estado_tarefas
+
+Revision ID: 8b41d0e6a2c3
+Revises: 3f2a9c1d7b10
+Create Date: 2026-10-17 19:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b41d0e6a2c3'
+down_revision = '3f2a9c1d7b10'
+branch_labels = None
+depends_on = None
+
+
+def _colunas(tabela):
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns(tabela)}
+
+
+def upgrade():
+    # Tabelas novas são criadas pelo db.create_all(); aqui só entra o que falta nas existentes
+    if "pedido_em" not in _colunas("estado_tarefas"):
+        op.add_column("estado_tarefas", sa.Column("pedido_em", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("estado_tarefas") as batch_op:
+        batch_op.drop_column("pedido_em")
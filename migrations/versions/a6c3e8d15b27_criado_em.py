@@ -0,0 +1,36 @@
+"""criado_em em utilizadores, vagas, candidaturas e favoritos
+
+Revision ID: a6c3e8d15b27
+Revises: e4b7c2a91f06
+Create Date: 2026-10-17 23:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c3e8d15b27'
+down_revision = 'e4b7c2a91f06'
+branch_labels = None
+depends_on = None
+
+TABELAS = ("utilizadores", "vagas", "candidaturas", "favoritos")
+
+
+def _colunas(tabela):
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns(tabela)}
+
+
+def upgrade():
+    # Sem default no servidor (o SQLite não aceita CURRENT_TIMESTAMP num ADD COLUMN): as linhas
+    # existentes ficam a NULL e as novas recebem datetime.utcnow do modelo
+    for tabela in TABELAS:
+        if "criado_em" not in _colunas(tabela):
+            op.add_column(tabela, sa.Column("criado_em", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    for tabela in TABELAS:
+        with op.batch_alter_table(tabela) as batch_op:
+            batch_op.drop_column("criado_em")
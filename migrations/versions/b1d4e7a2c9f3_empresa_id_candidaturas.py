@@ -0,0 +1,33 @@
+"""empresa_id em candidaturas (caixa de gerir_candidaturas por índice)
+
+Revision ID: b1d4e7a2c9f3
+Revises: a6c3e8d15b27
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1d4e7a2c9f3'
+down_revision = 'a6c3e8d15b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspetor = sa.inspect(op.get_bind())
+    if "empresa_id" not in {c["name"] for c in inspetor.get_columns("candidaturas")}:
+        op.add_column("candidaturas", sa.Column("empresa_id", sa.Integer(), nullable=True))
+    op.execute("UPDATE candidaturas SET empresa_id = "
+               "(SELECT vagas.empresa_id FROM vagas WHERE vagas.id = candidaturas.vaga_id) "
+               "WHERE empresa_id IS NULL")
+    if "ix_candidaturas_empresa_id" not in {i["name"] for i in inspetor.get_indexes("candidaturas")}:
+        op.create_index("ix_candidaturas_empresa_id", "candidaturas", ["empresa_id", sa.text("id DESC")])
+
+
+def downgrade():
+    op.drop_index("ix_candidaturas_empresa_id", table_name="candidaturas")
+    with op.batch_alter_table("candidaturas") as batch_op:
+        batch_op.drop_column("empresa_id")
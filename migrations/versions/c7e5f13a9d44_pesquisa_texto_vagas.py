@@ -0,0 +1,90 @@
+"""pesquisa de texto em vagas (FTS5 / tsvector)
+
+Revision ID: c7e5f13a9d44
+Revises: 8b41d0e6a2c3
+Create Date: 2026-10-17 19:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e5f13a9d44'
+down_revision = '8b41d0e6a2c3'
+branch_labels = None
+depends_on = None
+
+
+def _upgrade_sqlite():
+    # Tabela FTS5 de conteúdo externo: guarda só o índice, o texto continua em vagas.
+    # remove_diacritics 2 => "gestão" e "gestao" são o mesmo token.
+    op.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS vagas_fts USING fts5(
+            titulo, descricao,
+            content='vagas', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    # Triggers mantêm o índice em sincronia em qualquer escrita (rotas, importação RSS em lote, cascades)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS vagas_fts_ai AFTER INSERT ON vagas BEGIN
+            INSERT INTO vagas_fts(rowid, titulo, descricao) VALUES (new.id, new.titulo, new.descricao);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS vagas_fts_ad AFTER DELETE ON vagas BEGIN
+            INSERT INTO vagas_fts(vagas_fts, rowid, titulo, descricao)
+            VALUES ('delete', old.id, old.titulo, old.descricao);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS vagas_fts_au AFTER UPDATE OF titulo, descricao ON vagas BEGIN
+            INSERT INTO vagas_fts(vagas_fts, rowid, titulo, descricao)
+            VALUES ('delete', old.id, old.titulo, old.descricao);
+            INSERT INTO vagas_fts(rowid, titulo, descricao) VALUES (new.id, new.titulo, new.descricao);
+        END
+    """)
+    op.execute("INSERT INTO vagas_fts(vagas_fts) VALUES ('rebuild')")
+
+
+def _upgrade_postgresql():
+    # Configuração portuguesa com unaccent para ignorar acentos no índice e nas pesquisas
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("""
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+                CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION pt_unaccent
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            END IF;
+        END $$
+    """)
+    # Coluna gerada: o Postgres mantém-na em sincronia sem triggers
+    op.execute("""
+        ALTER TABLE vagas ADD COLUMN IF NOT EXISTS pesquisa tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('pt_unaccent', coalesce(titulo, '')), 'A') ||
+            setweight(to_tsvector('pt_unaccent', coalesce(descricao, '')), 'B')
+        ) STORED
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_vagas_pesquisa ON vagas USING GIN (pesquisa)")
+
+
+def upgrade():
+    dialeto = op.get_bind().dialect.name
+    if dialeto == "sqlite":
+        _upgrade_sqlite()
+    elif dialeto == "postgresql":
+        _upgrade_postgresql()
+
+
+def downgrade():
+    dialeto = op.get_bind().dialect.name
+    if dialeto == "sqlite":
+        for trigger in ("vagas_fts_ai", "vagas_fts_ad", "vagas_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS vagas_fts")
+    elif dialeto == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_vagas_pesquisa")
+        op.execute("ALTER TABLE vagas DROP COLUMN IF EXISTS pesquisa")
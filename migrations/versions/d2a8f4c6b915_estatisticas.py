@@ -0,0 +1,63 @@
+"""estatisticas_totais / estatisticas_diarias
+
+Revision ID: d2a8f4c6b915
+Revises: c7e5f13a9d44
+Create Date: 2026-10-17 21:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a8f4c6b915'
+down_revision = 'c7e5f13a9d44'
+branch_labels = None
+depends_on = None
+
+
+TOTAIS_INICIAIS = """
+INSERT INTO estatisticas_totais (metrica, chave, valor)
+SELECT 'registos', tipo, COUNT(*) FROM utilizadores GROUP BY tipo
+UNION ALL
+SELECT 'vagas', CASE WHEN externa THEN 'externa' ELSE 'interna' END, COUNT(*) FROM vagas GROUP BY externa
+UNION ALL
+SELECT 'candidaturas', '', COUNT(*) FROM candidaturas GROUP BY 1
+UNION ALL
+SELECT 'candidaturas_vaga', CAST(vaga_id AS VARCHAR(60)), COUNT(*) FROM candidaturas GROUP BY vaga_id
+UNION ALL
+SELECT 'favoritos', '', COUNT(*) FROM favoritos GROUP BY 1
+UNION ALL
+SELECT 'publicacoes', COALESCE(tipo, 'noticia'), COUNT(*) FROM publicacoes GROUP BY tipo
+"""
+
+
+def upgrade():
+    # As tabelas podem já ter sido criadas (vazias) pelo db.create_all() ao importar a app
+    tabelas = set(sa.inspect(op.get_bind()).get_table_names())
+    if "estatisticas_totais" not in tabelas:
+        op.create_table(
+            "estatisticas_totais",
+            sa.Column("metrica", sa.String(40), primary_key=True),
+            sa.Column("chave", sa.String(60), primary_key=True),
+            sa.Column("valor", sa.Integer(), nullable=False),
+        )
+        op.create_index("ix_estatisticas_totais_metrica_valor", "estatisticas_totais", ["metrica", "valor"])
+    if "estatisticas_diarias" not in tabelas:
+        op.create_table(
+            "estatisticas_diarias",
+            sa.Column("dia", sa.Date(), primary_key=True),
+            sa.Column("metrica", sa.String(40), primary_key=True),
+            sa.Column("chave", sa.String(60), primary_key=True),
+            sa.Column("valor", sa.Integer(), nullable=False),
+        )
+
+    # Ponto de partida dos totais; daqui em diante são mantidos a cada escrita
+    vazia = op.get_bind().execute(sa.text("SELECT COUNT(*) FROM estatisticas_totais")).scalar() == 0
+    if vazia:
+        op.execute(TOTAIS_INICIAIS)
+
+
+def downgrade():
+    op.drop_table("estatisticas_diarias")
+    op.drop_table("estatisticas_totais")
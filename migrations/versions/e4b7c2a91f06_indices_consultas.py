@@ -0,0 +1,49 @@
+"""índices compostos para as queries das rotas
+
+Revision ID: e4b7c2a91f06
+Revises: d2a8f4c6b915
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c2a91f06'
+down_revision = 'd2a8f4c6b915'
+branch_labels = None
+depends_on = None
+
+
+# (nome, tabela, colunas) — iguais aos __table_args__ de modelos/modelos.py; confirmar com `flask verificar-planos`
+INDICES = [
+    ("ix_vagas_externa_id", "vagas", ["externa", "id DESC"]),              # página inicial, natureza
+    ("ix_vagas_empresa_id", "vagas", ["empresa_id", "id DESC"]),           # minhas_vagas, gerir_candidaturas
+    ("ix_vagas_categoria_id", "vagas", ["categoria", "id DESC"]),          # filtros + keyset
+    ("ix_vagas_horario_id", "vagas", ["horario", "id DESC"]),
+    ("ix_vagas_tipo_id", "vagas", ["tipo", "id DESC"]),
+    ("ix_candidaturas_estudante_vaga", "candidaturas", ["estudante_id", "vaga_id"]),
+    ("ix_candidaturas_vaga_id", "candidaturas", ["vaga_id"]),
+    ("ix_candidaturas_ficheiro_cv", "candidaturas", ["ficheiro_cv"]),   # acesso a /uploads
+    ("ix_favoritos_vaga_id", "favoritos", ["vaga_id"]),                  # estudante_id já vem no único
+    ("ix_comentarios_publicacao_data", "comentarios", ["publicacao_id", "data_hora"]),
+    ("ix_publicacoes_tipo_data", "publicacoes", ["tipo", "data_hora DESC"]),
+    ("ix_publicacoes_data", "publicacoes", ["data_hora DESC"]),         # rodapé "mais recentes"
+    ("ix_publicacoes_foto", "publicacoes", ["foto"]),
+    ("ix_utilizadores_tipo_id", "utilizadores", ["tipo", "id DESC"]),
+    ("ix_utilizadores_logo_empresa", "utilizadores", ["logo_empresa"]),
+]
+
+
+def upgrade():
+    # O db.create_all() já os cria numa BD nova; aqui só entram os que faltam nas existentes
+    inspetor = sa.inspect(op.get_bind())
+    for nome, tabela, colunas in INDICES:
+        if nome not in {i["name"] for i in inspetor.get_indexes(tabela)}:
+            op.create_index(nome, tabela, [sa.text(c) for c in colunas])
+
+
+def downgrade():
+    for nome, tabela, _ in reversed(INDICES):
+        op.drop_index(nome, table_name=tabela)
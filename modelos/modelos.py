@@ -24,6 +24,10 @@ class Utilizador(db.Model):
     telefone = db.Column(db.String(50), nullable=True)
     logo_empresa = db.Column(db.String(200), nullable=True)
 
+    # deferred: fora dos SELECT normais, para as páginas continuarem a abrir numa BD ainda sem a migração
+    # a6c3e8d15b27 (só a exportação a lê); NULL nas linhas anteriores à coluna
+    criado_em = db.deferred(db.Column(db.DateTime, default=datetime.utcnow, nullable=True))
+
     #Relacionamentos com CASCADE
     candidaturas = db.relationship("Candidatura", backref="estudante",
                                    cascade="all, delete-orphan", lazy=True)
@@ -36,6 +40,11 @@ class Utilizador(db.Model):
     comentarios = db.relationship("Comentario", backref="autor",
                                   cascade="all, delete-orphan", lazy=True)
 
+    __table_args__ = (
+        db.Index("ix_utilizadores_tipo_id", "tipo", db.text("id DESC")),
+        db.Index("ix_utilizadores_logo_empresa", "logo_empresa"),
+    )
+
     def definir_senha(self, senha):
         self.senha_hash = generate_password_hash(senha)
 
@@ -56,12 +65,24 @@ class Vaga(db.Model):
     link_externo = db.Column(db.String(500), nullable=True)
     imagem_externa = db.Column(db.String(500), nullable=True)
     empresa_id = db.Column(db.Integer, db.ForeignKey("utilizadores.id"), nullable=True)
+    criado_em = db.deferred(db.Column(db.DateTime, default=datetime.utcnow, nullable=True))  # ver Utilizador
 
     candidaturas = db.relationship("Candidatura", backref="vaga",
                                    cascade="all, delete-orphan", lazy=True)
     favoritos = db.relationship("Favorito", backref="vaga",
                                 cascade="all, delete-orphan", lazy=True)
 
+    # Dedupe das vagas importadas por RSS (NULLs das vagas internas não colidem); os outros índices
+    # seguem as queries reais: filtro por igualdade + ORDER BY id DESC (keyset, página inicial)
+    __table_args__ = (
+        db.Index("uq_vagas_link_externo", "link_externo", unique=True),
+        db.Index("ix_vagas_externa_id", "externa", db.text("id DESC")),
+        db.Index("ix_vagas_empresa_id", "empresa_id", db.text("id DESC")),
+        db.Index("ix_vagas_categoria_id", "categoria", db.text("id DESC")),
+        db.Index("ix_vagas_horario_id", "horario", db.text("id DESC")),
+        db.Index("ix_vagas_tipo_id", "tipo", db.text("id DESC")),
+    )
+
 
 class Candidatura(db.Model):
     __tablename__ = "candidaturas"
@@ -69,6 +90,17 @@ class Candidatura(db.Model):
     estudante_id = db.Column(db.Integer, db.ForeignKey("utilizadores.id"), nullable=False)
     vaga_id = db.Column(db.Integer, db.ForeignKey("vagas.id"), nullable=False)
     ficheiro_cv = db.Column(db.String(200), nullable=False)
+    criado_em = db.deferred(db.Column(db.DateTime, default=datetime.utcnow, nullable=True))  # ver Utilizador
+    # Cópia de vagas.empresa_id (sem FK: a relação é a de vaga_id): a caixa de gerir_candidaturas pagina
+    # por (empresa_id, id DESC) sem ordenar todas as candidaturas da empresa. Diferida como criado_em.
+    empresa_id = db.deferred(db.Column(db.Integer, nullable=True))
+
+    __table_args__ = (
+        db.Index("ix_candidaturas_estudante_vaga", "estudante_id", "vaga_id"),
+        db.Index("ix_candidaturas_vaga_id", "vaga_id"),
+        db.Index("ix_candidaturas_ficheiro_cv", "ficheiro_cv"),
+        db.Index("ix_candidaturas_empresa_id", "empresa_id", db.text("id DESC")),
+    )
 
 
 class Favorito(db.Model):
@@ -76,9 +108,11 @@ class Favorito(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     estudante_id = db.Column(db.Integer, db.ForeignKey("utilizadores.id"), nullable=False)
     vaga_id = db.Column(db.Integer, db.ForeignKey("vagas.id"), nullable=False)
+    criado_em = db.deferred(db.Column(db.DateTime, default=datetime.utcnow, nullable=True))  # ver Utilizador
 
     __table_args__ = (db.UniqueConstraint('estudante_id', 'vaga_id',
-                                          name='uq_favorito_estudante_vaga'),)
+                                          name='uq_favorito_estudante_vaga'),
+                      db.Index("ix_favoritos_vaga_id", "vaga_id"))
 
 
 class Publicacao(db.Model):
@@ -91,6 +125,12 @@ class Publicacao(db.Model):
     conteudo = db.Column(db.Text, nullable=False)
     tipo = db.Column(db.String(20), default="noticia")
 
+    __table_args__ = (
+        db.Index("ix_publicacoes_tipo_data", "tipo", db.text("data_hora DESC")),
+        db.Index("ix_publicacoes_data", db.text("data_hora DESC")),
+        db.Index("ix_publicacoes_foto", "foto"),
+    )
+
 
 class Comentario(db.Model):
     __tablename__ = "comentarios"
@@ -99,4 +139,98 @@ class Comentario(db.Model):
     data_hora = db.Column(db.DateTime, default=datetime.utcnow)
 
     autor_id = db.Column(db.Integer, db.ForeignKey("utilizadores.id"), nullable=False)
-    publicacao_id = db.Column(db.Integer, db.ForeignKey("publicacoes.id"), nullable=False)
\ No newline at end of file
+    publicacao_id = db.Column(db.Integer, db.ForeignKey("publicacoes.id"), nullable=False)
+
+    __table_args__ = (db.Index("ix_comentarios_publicacao_data", "publicacao_id", "data_hora"),)
+
+class EstadoTarefa(db.Model):
+    __tablename__ = "estado_tarefas"
+    nome = db.Column(db.String(100), primary_key=True)
+    ultima_execucao = db.Column(db.DateTime, nullable=True)
+    ultimo_sucesso = db.Column(db.DateTime, nullable=True)  # marcador persistido da última execução OK
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    insercoes = db.Column(db.Integer, default=0, nullable=False)
+    pedido_em = db.Column(db.DateTime, nullable=True)  # execução manual pedida pelo admin
+
+
+class Lideranca(db.Model):
+    # Lease na BD: só o processo dono (e dentro do prazo) corre as tarefas agendadas
+    __tablename__ = "lideranca"
+    nome = db.Column(db.String(100), primary_key=True)
+    dono = db.Column(db.String(200), nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False)
+
+
+class VersaoCache(db.Model):
+    # Contador por "tabela lógica"; sobe a cada escrita e invalida as caches que o usam na chave
+    __tablename__ = "versoes_cache"
+    nome = db.Column(db.String(50), primary_key=True)
+    valor = db.Column(db.Integer, default=0, nullable=False)
+
+
+class FonteFeed(db.Model):
+    __tablename__ = "fontes_feed"
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(500), unique=True, nullable=False)
+    categoria = db.Column(db.String(200), nullable=True)
+    tipo = db.Column(db.String(50), nullable=True)
+    ativo = db.Column(db.Boolean, default=True, nullable=False)
+    intervalo_min = db.Column(db.Integer, default=30, nullable=False)
+
+    # Estado do último pedido (GET condicional + backoff)
+    etag = db.Column(db.String(500), nullable=True)
+    last_modified = db.Column(db.String(100), nullable=True)
+    hash_conteudo = db.Column(db.String(64), nullable=True)
+    ultimo_status = db.Column(db.Integer, nullable=True)
+    ultimo_total = db.Column(db.Integer, default=0, nullable=False)
+    erros_seguidos = db.Column(db.Integer, default=0, nullable=False)
+    sem_alteracoes = db.Column(db.Integer, default=0, nullable=False)
+    ultima_recolha = db.Column(db.DateTime, nullable=True)
+    proxima_recolha = db.Column(db.DateTime, nullable=True)
+
+
+class EstatisticaTotal(db.Model):
+    # Totais atuais por (métrica, chave), mantidos a cada flush; os relatórios leem só estas linhas
+    __tablename__ = "estatisticas_totais"
+    metrica = db.Column(db.String(40), primary_key=True)  # registos, vagas, candidaturas, candidaturas_vaga, favoritos, publicacoes
+    chave = db.Column(db.String(60), primary_key=True)    # tipo de utilizador, interna/externa, vaga_id ou ""
+    valor = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (db.Index("ix_estatisticas_totais_metrica_valor", "metrica", "valor"),)
+
+
+class EstatisticaDiaria(db.Model):
+    # Variação líquida por dia (inserções - remoções); as correções de reconciliar() só vão aos totais
+    __tablename__ = "estatisticas_diarias"
+    dia = db.Column(db.Date, primary_key=True)
+    metrica = db.Column(db.String(40), primary_key=True)
+    chave = db.Column(db.String(60), primary_key=True)
+    valor = db.Column(db.Integer, default=0, nullable=False)
+
+
+class EmailPendente(db.Model):
+    # Caixa de saída: o pedido só grava aqui; o agendador envia em lote e volta a tentar com backoff
+    __tablename__ = "emails_pendentes"
+    id = db.Column(db.Integer, primary_key=True)
+    destinatarios = db.Column(db.Text, nullable=False)  # separados por vírgula
+    assunto = db.Column(db.String(300), nullable=False)
+    corpo = db.Column(db.Text, nullable=False)
+    tipo = db.Column(db.String(30), default="geral", nullable=False)  # "comentario" pode ir no resumo
+    estado = db.Column(db.String(20), default="pendente", nullable=False)  # pendente, enviado, falhado
+    tentativas = db.Column(db.Integer, default=0, nullable=False)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    proximo_envio = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    enviado_em = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index("ix_emails_pendentes_estado_proximo", "estado", "proximo_envio"),)
+
+
+class Blob(db.Model):
+    # Ficheiro enviado, guardado pelo sha256 do conteúdo; várias linhas podem apontar para o mesmo blob
+    __tablename__ = "blobs"
+    chave = db.Column(db.String(80), primary_key=True)  # "<sha256>.<ext>"
+    tamanho = db.Column(db.BigInteger, nullable=False)
+    referencias = db.Column(db.Integer, default=0, nullable=False)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,175 @@
+import atexit
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from modelos.modelos import db, Lideranca, EstadoTarefa
+from servicos import metricas
+
+# ===== Scheduler com líder único =====
+# Todos os processos (workers gunicorn, `flask run-scheduler`) disputam o mesmo lease na BD.
+# Só o dono corre as tarefas; se morrer, o lease expira e outro processo assume.
+LEASE_NOME = "agendador"
+LEASE_TTL = timedelta(seconds=60)
+BATIMENTO_SEGUNDOS = 15
+
+
+def adquirir_lease(nome: str, dono: str, ttl: timedelta = LEASE_TTL) -> bool:
+    """Renova o lease se já for nosso ou se tiver expirado; UPDATE condicional, atómico em SQLite e Postgres."""
+    agora = datetime.utcnow()
+    r = db.session.execute(
+        update(Lideranca)
+        .where(Lideranca.nome == nome)
+        .where((Lideranca.dono == dono) | (Lideranca.expira_em < agora))
+        .values(dono=dono, expira_em=agora + ttl)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if r.rowcount:
+        return True
+    if db.session.get(Lideranca, nome) is not None:
+        return False
+    try:
+        db.session.add(Lideranca(nome=nome, dono=dono, expira_em=agora + ttl))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()  # outro processo criou a linha primeiro
+        return False
+
+
+def libertar_lease(nome: str, dono: str):
+    db.session.execute(
+        update(Lideranca)
+        .where(Lideranca.nome == nome, Lideranca.dono == dono)
+        .values(expira_em=datetime(1970, 1, 1))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+class Agendador:
+    def __init__(self, app=None):
+        self.app = None
+        self.scheduler = BackgroundScheduler()
+        self.dono = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.e_lider = False
+        self._tarefas = {}
+        self._iniciado = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions["agendador"] = self
+
+    def tarefa(self, nome: str, func, minutes: int):
+        """Regista uma tarefa periódica; `func` corre dentro do app context e pode devolver um contador."""
+        self._tarefas[nome] = (func, timedelta(minutes=minutes))
+
+    def intervalos(self):
+        return {nome: intervalo for nome, (_, intervalo) in self._tarefas.items()}
+
+    def iniciar(self):
+        with self._lock:
+            if self._iniciado:
+                return
+            self._iniciado = True
+        for nome, (func, intervalo) in self._tarefas.items():
+            # Fica em pausa até este processo ganhar o lease
+            self.scheduler.add_job(self._executar, "interval", seconds=intervalo.total_seconds(),
+                                   args=[nome], id=nome, max_instances=1, coalesce=True, next_run_time=None)
+        self.scheduler.add_job(self._batimento, "interval", seconds=BATIMENTO_SEGUNDOS, id="_batimento",
+                               max_instances=1, coalesce=True, next_run_time=datetime.now())
+        self.scheduler.add_listener(self._perdida, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+        self.scheduler.start()
+        atexit.register(self.parar)
+
+    def parar(self):
+        if not self._iniciado:
+            return
+        self._iniciado = False
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        if self.e_lider:
+            self.e_lider = False
+            with self.app.app_context():
+                libertar_lease(LEASE_NOME, self.dono)
+
+    def pedir_execucao(self, nome: str):
+        """Pede uma execução já; o líder apanha o pedido no próximo batimento (ou de imediato se formos nós)."""
+        estado = db.session.get(EstadoTarefa, nome) or EstadoTarefa(nome=nome)
+        estado.pedido_em = datetime.utcnow()
+        db.session.merge(estado)
+        db.session.commit()
+        if self.e_lider:
+            self.scheduler.modify_job(nome, next_run_time=datetime.now())
+
+    def _batimento(self):
+        with self.app.app_context():
+            try:
+                lider = adquirir_lease(LEASE_NOME, self.dono, LEASE_TTL)
+            except Exception as e:
+                db.session.rollback()
+                print(f"agendador: erro no lease: {e}")
+                lider = False
+            if lider and not self.e_lider:
+                print(f"agendador: {self.dono} é o líder")
+                for nome in self._tarefas:
+                    self.scheduler.modify_job(nome, next_run_time=self._proxima_execucao(nome))
+            elif self.e_lider and not lider:
+                print(f"agendador: {self.dono} perdeu a liderança")
+                for nome in self._tarefas:
+                    self.scheduler.pause_job(nome)
+            self.e_lider = lider
+            if lider:
+                self._atender_pedidos()
+
+    def _proxima_execucao(self, nome):
+        # Após restart/failover não repete uma execução recente feita pelo líder anterior
+        estado = db.session.get(EstadoTarefa, nome)
+        if estado and estado.ultimo_sucesso:
+            falta = estado.ultimo_sucesso + self._tarefas[nome][1] - datetime.utcnow()
+            return datetime.now() + max(falta, timedelta(0))
+        return datetime.now()
+
+    def _atender_pedidos(self):
+        for nome in self._tarefas:
+            estado = db.session.get(EstadoTarefa, nome)
+            if estado and estado.pedido_em and (not estado.ultima_execucao or estado.pedido_em > estado.ultima_execucao):
+                self.scheduler.modify_job(nome, next_run_time=datetime.now())
+
+    def _perdida(self, evento):
+        if evento.job_id in self._tarefas:
+            metricas.TAREFA_PERDIDAS.labels(evento.job_id).inc()
+
+    def _executar(self, nome):
+        if not self.e_lider:
+            return
+        func = self._tarefas[nome][0]
+        with self.app.app_context():
+            estado = db.session.get(EstadoTarefa, nome) or EstadoTarefa(nome=nome)
+            inicio, cronometro = datetime.utcnow(), time.perf_counter()
+            try:
+                estado.insercoes = func() or 0
+                estado.ultimo_sucesso = datetime.utcnow()
+                estado.ultimo_erro = None
+                metricas.TAREFA_EXECUCOES.labels(nome, "ok").inc()
+            except Exception as e:
+                db.session.rollback()
+                estado.ultimo_erro = str(e)[:2000]
+                metricas.TAREFA_EXECUCOES.labels(nome, "erro").inc()
+                print(f"tarefa {nome} erro: {e}")
+            metricas.TAREFA_SEGUNDOS.labels(nome).observe(time.perf_counter() - cronometro)
+            estado.ultima_execucao = inicio
+            db.session.merge(estado)
+            db.session.commit()
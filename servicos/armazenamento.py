@@ -0,0 +1,315 @@
+import hashlib
+import os
+import re
+import tempfile
+import zipfile
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import Response, abort, current_app, request, send_file
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from werkzeug.utils import secure_filename
+
+from modelos.modelos import db, Blob, Candidatura, Utilizador, Publicacao
+from servicos import metricas
+
+# ===== Armazenamento de uploads =====
+# Cada ficheiro é guardado pelo sha256 do conteúdo ("<hex>.<ext>") em subpastas ab/cd/, calculado
+# enquanto o upload é escrito no disco. Conteúdo igual = mesmo blob; a tabela blobs conta quantas
+# linhas (ficheiro_cv, cv_principal, logo_empresa, foto) apontam para cada um, e os blobs sem
+# referências são apagados pela tarefa recolher_orfaos(). Nomes antigos (ficheiros soltos em
+# uploads/) continuam a ser servidos até correr `flask migrar-uploads`.
+
+CHAVE_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,10}$")
+VARIANTE_RE = re.compile(r"^[0-9a-f]{64}\.w\d{2,4}\.[a-z0-9]{1,10}$")  # ver servicos/imagens.py
+# Únicas extensões servidas inline (logotipos, fotos, variantes); tudo o resto sai como anexo opaco
+TIPOS_IMAGEM = {"png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg", "webp": "image/webp", "gif": "image/gif"}
+BLOCO = 64 * 1024
+COLUNAS_BLOB = {Candidatura: ("ficheiro_cv",), Utilizador: ("cv_principal", "logo_empresa"), Publicacao: ("foto",)}
+
+
+def e_chave_imagem(chave) -> bool:
+    return bool(chave) and "." in chave and chave.rsplit(".", 1)[1].lower() in TIPOS_IMAGEM
+
+
+def e_chave(valor) -> bool:
+    return bool(valor) and bool(CHAVE_RE.match(valor))
+
+
+def _partes(chave):
+    return chave[:2], chave[2:4], chave
+
+
+def _com_hash(chave) -> bool:
+    return e_chave(chave) or bool(VARIANTE_RE.match(chave or ""))
+
+
+class BackendLocal:
+    """Disco local: uploads/ab/cd/<chave>."""
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+
+    def caminho_local(self, chave):
+        if _com_hash(chave):
+            return os.path.join(self.raiz, *_partes(chave))
+        return os.path.join(self.raiz, secure_filename(chave))  # upload antigo, sem hash
+
+    def guardar(self, chave, temporario):
+        destino = self.caminho_local(chave)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(temporario, destino)
+
+    def existe(self, chave):
+        return os.path.exists(self.caminho_local(chave))
+
+    def abrir(self, chave):
+        return open(self.caminho_local(chave), "rb")
+
+    def apagar(self, chave):
+        try:
+            os.remove(self.caminho_local(chave))
+        except FileNotFoundError:
+            pass
+
+
+class BackendS3:
+    """Bucket S3 ou compatível (MinIO, moto server...) via endpoint_url; precisa do boto3."""
+
+    def __init__(self, bucket, prefixo="", endpoint_url=None):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("UPLOAD_BACKEND=s3://... precisa do pacote boto3 (pip install boto3)")
+        self.s3 = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefixo = prefixo
+
+    def _objeto(self, chave):
+        return self.prefixo + ("/".join(_partes(chave)) if _com_hash(chave) else chave)
+
+    def caminho_local(self, chave):
+        return None
+
+    def guardar(self, chave, temporario):
+        self.s3.upload_file(temporario, self.bucket, self._objeto(chave))
+        os.remove(temporario)
+
+    def existe(self, chave):
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=self._objeto(chave))
+            return True
+        except Exception:
+            return False
+
+    def abrir(self, chave):
+        return self.s3.get_object(Bucket=self.bucket, Key=self._objeto(chave))["Body"]
+
+    def apagar(self, chave):
+        self.s3.delete_object(Bucket=self.bucket, Key=self._objeto(chave))
+
+
+def criar_backend(url, pasta_uploads, endpoint_url=None):
+    if not url or url == "local":
+        return BackendLocal(pasta_uploads)
+    if url.startswith("s3://"):
+        bucket, _, prefixo = url[5:].partition("/")
+        return BackendS3(bucket, prefixo.rstrip("/") + "/" if prefixo else "", endpoint_url)
+    raise ValueError(f"UPLOAD_BACKEND desconhecido: {url}")
+
+
+class Armazenamento:
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        pasta = app.config["UPLOAD_FOLDER"]
+        self.backend = criar_backend(app.config.get("UPLOAD_BACKEND"), pasta, app.config.get("S3_ENDPOINT_URL"))
+        self.pasta_tmp = os.path.join(pasta, "tmp")
+        os.makedirs(self.pasta_tmp, exist_ok=True)
+
+    def guardar_stream(self, stream, nome_original):
+        """Escreve para um temporário calculando o hash ao mesmo tempo; devolve a chave do blob."""
+        nome = secure_filename(nome_original or "")
+        ext = nome.rsplit(".", 1)[1].lower() if "." in nome else "bin"
+        if not re.match(r"^[a-z0-9]{1,10}$", ext):
+            ext = "bin"
+        h, tamanho = hashlib.sha256(), 0
+        fd, temporario = tempfile.mkstemp(dir=self.pasta_tmp)
+        try:
+            with os.fdopen(fd, "wb") as destino:
+                while bloco := stream.read(BLOCO):
+                    h.update(bloco)
+                    destino.write(bloco)
+                    tamanho += len(bloco)
+            chave = f"{h.hexdigest()}.{ext}"
+            novo = not self.backend.existe(chave)
+            if novo:
+                self.backend.guardar(chave, temporario)
+            else:
+                os.remove(temporario)  # já temos este conteúdo
+            metricas.UPLOAD_BYTES.labels("1" if novo else "0").inc(tamanho)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        # Linha com 0 referências; sobe quando a chave for gravada numa coluna (ver _contar_referencias)
+        _somar_referencias(db.session.connection(), {chave: 0}, tamanhos={chave: tamanho})
+        return chave
+
+    def guardar_upload(self, ficheiro):
+        return self.guardar_stream(ficheiro.stream, ficheiro.filename)
+
+    def abrir(self, chave):
+        return self.backend.abrir(chave)
+
+    def caminho_local(self, chave):
+        return self.backend.caminho_local(chave)
+
+    def enviar(self, chave, anexo=False, publico=True, nome_download=None):
+        """Resposta com o ficheiro: ETag forte, Range, e imutável quando a chave é o hash do conteúdo.
+
+        UPLOAD_SERVIDOR=nginx devolve só X-Accel-Redirect (o nginx envia os bytes e trata do Range);
+        =sendfile usa X-Sendfile (Apache/lighttpd) através do send_file do Flask.
+        """
+        if not chave or not self.backend.existe(chave):
+            abort(404)
+        caminho = self.backend.caminho_local(chave)
+        nome = nome_download or chave
+        # Inline só imagens da lista, com o tipo fixo da extensão; o resto (CVs...) é sempre anexo opaco,
+        # para um upload .html/.svg nunca ser interpretado pelo browser na origem do site
+        anexo = anexo or not e_chave_imagem(chave)
+        tipo = "application/octet-stream" if anexo else TIPOS_IMAGEM[chave.rsplit(".", 1)[1].lower()]
+        if caminho and current_app.config.get("UPLOAD_SERVIDOR") == "nginx":
+            resp = Response(mimetype=tipo)
+            relativo = os.path.relpath(caminho, self.backend.raiz).replace(os.sep, "/")
+            resp.headers["X-Accel-Redirect"] = current_app.config.get("UPLOAD_ACCEL_PREFIXO", "/_uploads/") + relativo
+            if anexo:
+                resp.headers["Content-Disposition"] = f'attachment; filename="{secure_filename(nome)}"'
+            resp.set_etag(chave)
+        elif caminho:
+            resp = send_file(caminho, mimetype=tipo, as_attachment=anexo, download_name=nome, etag=chave,
+                             conditional=True)
+        else:
+            resp = send_file(self.backend.abrir(chave), mimetype=tipo, as_attachment=anexo, download_name=nome,
+                             etag=chave)
+        resp.headers["X-Content-Type-Options"] = "nosniff"
+
+        if _com_hash(chave):
+            # O conteúdo de uma chave nunca muda: o browser/CDN pode guardá-lo para sempre
+            resp.cache_control.no_cache = None
+            resp.cache_control.public = publico
+            resp.cache_control.private = not publico
+            resp.cache_control.max_age = 31536000
+            resp.cache_control.immutable = True
+        else:
+            resp.cache_control.no_cache = True
+            resp.cache_control.private = not publico
+        return resp.make_conditional(request) if resp.headers.get("X-Accel-Redirect") else resp
+
+    def zip_stream(self, ficheiros):
+        """Gera os bytes de um ZIP com [(nome_no_zip, chave)], lido e escrito bloco a bloco.
+
+        O ZipFile escreve num destino sem seek (tamanhos/CRC vão em data descriptors depois de cada
+        ficheiro), por isso o arquivo nunca existe inteiro em memória nem no disco: só o bloco atual e
+        o diretório central (uma entrada pequena por ficheiro) no fim. Blobs que faltam no backend são
+        listados em EM_FALTA.txt em vez de interromperem um download já começado.
+        """
+        saida = _SaidaZip()
+        em_falta = []
+        with zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+            for nome, chave in ficheiros:
+                try:
+                    origem = self.backend.abrir(chave)
+                except Exception:
+                    em_falta.append(nome)
+                    continue
+                with origem, zf.open(nome, "w", force_zip64=True) as destino:
+                    while bloco := origem.read(BLOCO):
+                        destino.write(bloco)
+                        yield from saida.esvaziar()
+                yield from saida.esvaziar()
+            if em_falta:
+                zf.writestr("EM_FALTA.txt", "\n".join(em_falta) + "\n")
+        yield from saida.esvaziar()
+
+    def recolher_orfaos(self, idade=timedelta(hours=1)):
+        """Apaga blobs sem referências há mais de `idade` (a folga cobre uploads ainda por gravar)."""
+        limite = datetime.utcnow() - idade
+        chaves = [c for (c,) in db.session.query(Blob.chave)
+                  .filter(Blob.referencias <= 0, Blob.atualizado_em < limite).limit(1000)]
+        apagados = 0
+        for chave in chaves:
+            # Só apaga o ficheiro se a linha ainda estava a 0 (ninguém o voltou a usar entretanto)
+            n = (db.session.query(Blob)
+                 .filter(Blob.chave == chave, Blob.referencias <= 0, Blob.atualizado_em < limite)
+                 .delete(synchronize_session=False))
+            db.session.commit()
+            if n:
+                from servicos.imagens import variantes
+                for k in [chave, *variantes(chave)]:
+                    self.backend.apagar(k)
+                apagados += 1
+        return apagados
+
+
+class _SaidaZip:
+    """Destino só de escrita para o ZipFile: guarda os bytes até o gerador os entregar."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        if self.partes:
+            dados, self.partes = b"".join(self.partes), []
+            yield dados
+
+
+armazenamento = Armazenamento()
+
+
+def _somar_referencias(conexao, deltas, tamanhos=None):
+    if conexao.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    agora = datetime.utcnow()
+    linhas = [{"chave": c, "referencias": d, "tamanho": (tamanhos or {}).get(c, 0),
+               "criado_em": agora, "atualizado_em": agora} for c, d in deltas.items()]
+    stmt = insert(Blob)
+    conexao.execute(stmt.on_conflict_do_update(
+        index_elements=["chave"],
+        set_={"referencias": Blob.referencias + stmt.excluded.referencias, "atualizado_em": agora},
+    ), linhas)
+
+
+@event.listens_for(Session, "after_flush")
+def _contar_referencias(session, contexto):
+    # Mesma ideia de servicos/estatisticas.py: conta no flush, em qualquer rota ou cascata
+    d = Counter()
+    for objetos, sinal in ((session.new, 1), (session.deleted, -1)):
+        for obj in objetos:
+            for coluna in COLUNAS_BLOB.get(type(obj), ()):
+                h = inspect(obj).attrs[coluna].history
+                for valor in (h.added if sinal > 0 else [*h.unchanged, *h.deleted]):
+                    d[valor] += sinal
+    for obj in session.dirty:
+        for coluna in COLUNAS_BLOB.get(type(obj), ()):
+            h = inspect(obj).attrs[coluna].history
+            for valor in h.added:
+                d[valor] += 1
+            for valor in h.deleted:
+                d[valor] -= 1
+    d = {c: v for c, v in d.items() if v and e_chave(c)}
+    if d:
+        _somar_referencias(session.connection(), d)
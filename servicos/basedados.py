@@ -0,0 +1,96 @@
+import os
+
+from sqlalchemy import event, text
+
+# ===== Motor da base de dados =====
+# Dois perfis escolhidos pelo URI. SQLite (omissão, baseDados/adluc.db): WAL para os leitores não
+# bloquearem durante as escritas (importação RSS, agendador), busy_timeout em vez de "database is
+# locked" imediato, synchronous=NORMAL (seguro em WAL) e mmap/cache maiores, aplicados em cada ligação.
+# Postgres (DATABASE_URL=postgresql://...): pool por worker, pre-ping e timeouts por sessão.
+# verificar() lê os valores de volta da BD e é impresso no arranque.
+
+SQLITE_PRAGMAS = ("journal_mode", "busy_timeout", "synchronous", "mmap_size", "cache_size")
+SINCRONISMO = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}
+
+
+def configurar(app, uri_omissao):
+    """Preenche SQLALCHEMY_DATABASE_URI/ENGINE_OPTIONS a partir do ambiente; chamar antes do db.init_app."""
+    env = os.environ.get
+    uri = env("DATABASE_URL") or uri_omissao
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://"):]  # formato do Heroku, que o SQLAlchemy 2 recusa
+    c = app.config
+    c["SQLALCHEMY_DATABASE_URI"] = uri
+    if uri.startswith("sqlite"):
+        c.setdefault("SQLITE_BUSY_TIMEOUT_MS", int(env("SQLITE_BUSY_TIMEOUT_MS", 5000)))
+        c.setdefault("SQLITE_MMAP_MB", int(env("SQLITE_MMAP_MB", 256)))
+        c.setdefault("SQLITE_CACHE_MB", int(env("SQLITE_CACHE_MB", 64)))
+        c["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            # timeout do driver em segundos; o busy_timeout do PRAGMA fica com o mesmo valor
+            "connect_args": {"timeout": c["SQLITE_BUSY_TIMEOUT_MS"] / 1000},
+        }
+    else:
+        c.setdefault("DB_STATEMENT_TIMEOUT_MS", int(env("DB_STATEMENT_TIMEOUT_MS", 30000)))
+        c.setdefault("DB_POOL_SIZE", int(env("DB_POOL_SIZE", 5)))
+        c.setdefault("DB_MAX_OVERFLOW", int(env("DB_MAX_OVERFLOW", 5)))
+        c["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_size": c["DB_POOL_SIZE"],
+            "max_overflow": c["DB_MAX_OVERFLOW"],
+            "pool_timeout": 10,
+            "pool_pre_ping": True,  # ligações cortadas pelo servidor/proxy são trocadas antes de uso
+            "pool_recycle": 1800,
+            "connect_args": {
+                "connect_timeout": 10,
+                "application_name": "adluc",
+                "options": f"-c statement_timeout={c['DB_STATEMENT_TIMEOUT_MS']}"
+                           f" -c lock_timeout={min(c['DB_STATEMENT_TIMEOUT_MS'], 10000)}"
+                           " -c idle_in_transaction_session_timeout=60000",
+            },
+        }
+
+
+def instalar(engine, config):
+    """Regista os PRAGMAs do SQLite em cada nova ligação do pool (no Postgres vão nas connect_args)."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(ligacao_dbapi, registo):
+        cursor = ligacao_dbapi.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")  # persistente no ficheiro; numa BD :memory: fica "memory"
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={int(config['SQLITE_MMAP_MB']) * 1024 * 1024}")
+        cursor.execute(f"PRAGMA cache_size={-int(config['SQLITE_CACHE_MB']) * 1024}")  # negativo = KiB
+        cursor.close()
+
+
+def verificar(engine):
+    """Definições efetivas, lidas de uma ligação do pool: {nome: valor}."""
+    with engine.connect() as conexao:
+        if engine.dialect.name == "sqlite":
+            ativo = {p: conexao.exec_driver_sql(f"PRAGMA {p}").scalar() for p in SQLITE_PRAGMAS}
+            ativo["synchronous"] = SINCRONISMO.get(ativo["synchronous"], ativo["synchronous"])
+            ativo["sqlite"] = conexao.exec_driver_sql("select sqlite_version()").scalar()
+        else:
+            ativo = {p: conexao.execute(text(f"SHOW {p}")).scalar()
+                     for p in ("statement_timeout", "lock_timeout", "idle_in_transaction_session_timeout")}
+            ativo["servidor"] = conexao.execute(text("SHOW server_version")).scalar()
+        conexao.rollback()
+    pool = engine.pool
+    ativo["pool"] = f"{type(pool).__name__}({pool.size() if hasattr(pool, 'size') else '-'})"
+    return ativo
+
+
+def relatorio(engine, config):
+    """Linha para o log do arranque; avisa quando a BD não aceitou o que foi pedido."""
+    ativo = verificar(engine)
+    avisos = []
+    if engine.dialect.name == "sqlite":
+        if str(ativo["journal_mode"]).lower() != "wal":
+            avisos.append(f"journal_mode={ativo['journal_mode']} (sem WAL os leitores esperam pelas escritas)")
+        if ativo["busy_timeout"] != config["SQLITE_BUSY_TIMEOUT_MS"]:
+            avisos.append(f"busy_timeout={ativo['busy_timeout']}")
+    valores = " ".join(f"{k}={v}" for k, v in ativo.items())
+    linha = f"basedados: {engine.dialect.name} {engine.url.render_as_string(hide_password=True)} {valores}"
+    return linha + "".join(f"\nbasedados: AVISO {a}" for a in avisos)
@@ -0,0 +1,388 @@
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, event, func, insert, update
+
+from modelos.modelos import (db, Utilizador, Vaga, Candidatura, Favorito, Publicacao, Comentario,
+                             EmailPendente, Blob)
+from werkzeug.security import generate_password_hash
+
+# ===== Benchmarks =====
+# semear() enche a BD com dados sintéticos à escala de produção (escala=1: 50k estudantes, 200k vagas,
+# 2M candidaturas) por INSERTs em lote, sem passar pelo ORM; medir() faz pedidos às rotas com o test
+# client do Flask (num processo ou em vários workers ao mesmo tempo) e registam latências (p50/p95/p99), queries por pedido e memória (RSS).
+# O resultado é um JSON estável para guardar como baseline e comparar entre commits (comparar()).
+
+ESCALA_BASE = {
+    "estudantes": 50_000, "empresas": 2_000, "vagas": 200_000, "candidaturas": 2_000_000,
+    "favoritos": 500_000, "publicacoes": 2_000, "comentarios": 20_000, "emails": 20_000,
+}
+FRACAO_EXTERNAS = 0.3
+DOMINIO = "bench.adluc"
+SENHA = "bench"
+
+PALAVRAS = ("Técnico", "Assistente", "Engenheiro", "Analista", "Gestor", "Estagiário", "Consultor",
+            "Operador", "Programador", "Designer", "Comercial", "Enfermeiro", "Rececionista", "Contabilista")
+AREAS = ("de Vendas", "de Sistemas", "de Redes", "Júnior", "Sénior", "de Projeto", "de Logística",
+         "Financeiro", "de Marketing", "de Apoio ao Cliente", "Web", "de Produção", "de Qualidade")
+FRASES = ("Procuramos alguém motivado para integrar uma equipa dinâmica.",
+          "Oferecemos formação contínua e progressão na carreira.",
+          "Experiência com ferramentas digitais é valorizada.",
+          "Horário flexível e possibilidade de trabalho remoto parcial.",
+          "Contrato inicial de seis meses com possibilidade de renovação.",
+          "Bons conhecimentos de inglês falado e escrito.")
+NOMES = ("Ana", "João", "Maria", "Pedro", "Inês", "Tiago", "Beatriz", "Rui", "Sofia", "Miguel", "Marta", "Hugo")
+APELIDOS = ("Silva", "Santos", "Ferreira", "Pereira", "Oliveira", "Costa", "Rodrigues", "Martins", "Sousa")
+HORARIOS = ("Full-time", "Part-time", "Remoto")
+TIPOS = ("Emprego", "Estágio", "Bolsa")
+# PDF mínimo partilhado por todas as candidaturas (um só blob, com a contagem de referências certa)
+CV_PDF = b"%PDF-1.4\n1 0 obj<</Type/Catalog>>endobj\ntrailer<</Root 1 0 R>>\n%%EOF\n"
+
+
+def _escalar(escala):
+    return {k: max(int(v * escala), 1) for k, v in ESCALA_BASE.items()}
+
+
+def _proximo_id(modelo):
+    return (db.session.query(func.max(modelo.id)).scalar() or 0) + 1
+
+
+def _inserir(modelo, linhas, lote):
+    """Consome um gerador de dicionários em lotes de executemany; devolve o número de linhas."""
+    total, buffer = 0, []
+    for linha in linhas:
+        buffer.append(linha)
+        if len(buffer) >= lote:
+            db.session.execute(insert(modelo), buffer)
+            total += len(buffer)
+            buffer = []
+    if buffer:
+        db.session.execute(insert(modelo), buffer)
+        total += len(buffer)
+    db.session.commit()
+    print(f"seed: {modelo.__tablename__} +{total}")
+    return total
+
+
+def _enviesado(rnd, inicio, n):
+    # Poucos ids muito populares, cauda longa (como vagas/empresas/publicações reais)
+    return inicio + int(n * rnd.random() ** 2.5)
+
+
+def semear(escala=1.0, semente=42, lote=10_000, categorias=(), distritos=()):
+    """Acrescenta dados sintéticos (utilizadores @bench.adluc) e devolve {tabela: linhas}; chamar com app context."""
+    if Utilizador.query.filter(Utilizador.email.like(f"%@{DOMINIO}")).first():
+        raise RuntimeError(f"A BD já tem dados do seed ({DOMINIO}); usar uma BD nova (DATABASE_URL)")
+    n = _escalar(escala)
+    rnd = random.Random(semente)
+    categorias, distritos = categorias or ("Outros",), distritos or ("Lisboa",)
+    agora = datetime.utcnow().replace(microsecond=0)
+    senha_hash = generate_password_hash(SENHA)  # um só hash: o scrypt por utilizador levaria horas
+    contagens = {}
+
+    # Utilizadores: 1 admin, empresas, estudantes (ids contíguos a partir do máximo atual)
+    id_admin = _proximo_id(Utilizador)
+    id_empresa0, id_estudante0 = id_admin + 1, id_admin + 1 + n["empresas"]
+
+    def utilizadores():
+        yield {"id": id_admin, "nome": "Admin Bench", "email": f"admin@{DOMINIO}", "senha_hash": senha_hash,
+               "tipo": "admin"}
+        for i in range(n["empresas"]):
+            nome = f"{rnd.choice(APELIDOS)} & {rnd.choice(APELIDOS)} {rnd.choice(('Lda', 'SA', 'Unipessoal'))} {i}"
+            yield {"id": id_empresa0 + i, "nome": nome, "email": f"empresa{i}@{DOMINIO}", "senha_hash": senha_hash,
+                   "tipo": "empresa", "nif": f"5{rnd.randrange(10**7, 10**8)}", "nome_empresa": nome,
+                   "codigo_postal": f"{rnd.randrange(1000, 9999)}-{rnd.randrange(100, 999)}",
+                   "distrito": rnd.choice(distritos), "telefone": f"21{rnd.randrange(10**6, 10**7)}"}
+        for i in range(n["estudantes"]):
+            yield {"id": id_estudante0 + i, "nome": f"{rnd.choice(NOMES)} {rnd.choice(APELIDOS)}",
+                   "email": f"estudante{i}@{DOMINIO}", "senha_hash": senha_hash, "tipo": "estudante"}
+    contagens["utilizadores"] = _inserir(Utilizador, utilizadores(), lote)
+
+    # Vagas: as internas primeiro (ids contíguos, usados pelas candidaturas), depois as externas
+    id_vaga0 = _proximo_id(Vaga)
+    n_externas = int(n["vagas"] * FRACAO_EXTERNAS)
+    n_internas = n["vagas"] - n_externas
+
+    empresa_da_vaga = {}  # vagas internas -> empresa (candidaturas.empresa_id)
+
+    def vagas():
+        for i in range(n["vagas"]):
+            externa = i >= n_internas
+            if not externa:
+                empresa_da_vaga[id_vaga0 + i] = _enviesado(rnd, id_empresa0, n["empresas"])
+            yield {"id": id_vaga0 + i,
+                   "titulo": f"{rnd.choice(PALAVRAS)} {rnd.choice(AREAS)}",
+                   "categoria": rnd.choice(categorias),
+                   "descricao": " ".join(rnd.sample(FRASES, 3)),
+                   "cidade": rnd.choice(distritos), "horario": rnd.choice(HORARIOS), "tipo": rnd.choice(TIPOS),
+                   "externa": externa,
+                   "link_externo": f"https://exemplo.{DOMINIO}/vaga/{i}" if externa else None,
+                   "empresa_id": empresa_da_vaga.get(id_vaga0 + i)}
+    contagens["vagas"] = _inserir(Vaga, vagas(), lote)
+
+    # Candidaturas: pares (estudante, vaga interna) distintos, vagas populares com mais candidatos.
+    # Um CV por estudante (como o cv_principal): ficheiro_cv com a seletividade real para o planeador
+    from servicos.armazenamento import armazenamento
+    cvs = [armazenamento.guardar_stream(io.BytesIO(CV_PDF + f"% estudante {e}\n".encode()), "cv.pdf")
+           for e in range(n["estudantes"])]
+    db.session.commit()
+
+    def pares(total, n_vagas):
+        por_estudante = max(total // n["estudantes"], 1)
+        feitos = 0
+        for e in range(n["estudantes"]):
+            k = min(rnd.randint(0, 2 * por_estudante), n_vagas, total - feitos)
+            escolhidas = set()
+            while len(escolhidas) < k:
+                escolhidas.add(_enviesado(rnd, id_vaga0, n_vagas))
+            feitos += k
+            for v in escolhidas:
+                yield id_estudante0 + e, v
+            if feitos >= total:
+                return
+
+    id_cand0 = _proximo_id(Candidatura)
+    usos = Counter()
+
+    def candidaturas():
+        for i, (e, v) in enumerate(pares(n["candidaturas"], n_internas)):
+            cv = cvs[e - id_estudante0]
+            usos[cv] += 1
+            yield {"id": id_cand0 + i, "estudante_id": e, "vaga_id": v, "empresa_id": empresa_da_vaga[v],
+                   "ficheiro_cv": cv}
+    contagens["candidaturas"] = _inserir(Candidatura, candidaturas(), lote)
+    if usos:
+        db.session.execute(update(Blob.__table__).where(Blob.chave == bindparam("c"))
+                           .values(referencias=Blob.referencias + bindparam("n")),
+                           [{"c": c, "n": k} for c, k in usos.items()])
+    db.session.commit()
+
+    id_fav0 = _proximo_id(Favorito)
+    contagens["favoritos"] = _inserir(Favorito, (
+        {"id": id_fav0 + i, "estudante_id": e, "vaga_id": v}
+        for i, (e, v) in enumerate(pares(n["favoritos"], n["vagas"]))), lote)
+
+    id_pub0 = _proximo_id(Publicacao)
+    contagens["publicacoes"] = _inserir(Publicacao, (
+        {"id": id_pub0 + i, "titulo": f"{rnd.choice(PALAVRAS)}: {rnd.choice(FRASES)[:60]}", "autor_id": id_admin,
+         "data_hora": agora - timedelta(minutes=rnd.randrange(2 * 365 * 24 * 60)),
+         "conteudo": "\n\n".join(rnd.choice(FRASES) for _ in range(8)), "tipo": rnd.choice(("noticia", "dica"))}
+        for i in range(n["publicacoes"])), lote)
+
+    contagens["comentarios"] = _inserir(Comentario, (
+        {"conteudo": rnd.choice(FRASES), "data_hora": agora - timedelta(minutes=rnd.randrange(365 * 24 * 60)),
+         "autor_id": id_estudante0 + rnd.randrange(n["estudantes"]),
+         "publicacao_id": _enviesado(rnd, id_pub0, n["publicacoes"])}
+        for _ in range(n["comentarios"])), lote)
+
+    contagens["emails_pendentes"] = _inserir(EmailPendente, (
+        {"destinatarios": f"admin@{DOMINIO}", "assunto": "Novo comentário", "corpo": rnd.choice(FRASES),
+         "tipo": "comentario", "estado": "enviado", "tentativas": 0, "criado_em": agora, "proximo_envio": agora,
+         "enviado_em": agora}
+        for _ in range(n["emails"])), lote)
+
+    # Os INSERTs em lote passam ao lado do after_flush: acerta os totais de uma vez
+    from servicos import estatisticas
+    estatisticas.reconciliar()
+    db.session.execute(db.text("ANALYZE"))  # estatísticas do planeador para as tabelas novas
+    db.session.commit()
+    return contagens
+
+
+# ===== Medição =====
+# (nome, perfil, url): o perfil escolhe a sessão (None = anónimo); {estudante}, {empresa} e {publicacao}
+# são preenchidos por contexto_bench() com os ids mais carregados da BD.
+ROTAS = [
+    ("inicio", None, "/"),
+    ("vagas", None, "/vagas"),
+    ("vagas_categoria", None, "/vagas?categoria=Informática (Programação)"),
+    ("vagas_pesquisa", None, "/vagas?q=engenheiro"),
+    ("api_vagas", None, "/api/vagas"),
+    ("api_vagas_total", None, "/api/vagas?total=1&natureza=interna"),
+    ("api_facetas", None, "/api/vagas/facetas"),
+    ("publicacao", None, "/publicacao/{publicacao}"),
+    ("publicacao_sessao", "estudante", "/publicacao/{publicacao}"),
+    ("candidaturas", "estudante", "/candidaturas"),
+    ("favoritos", "estudante", "/favoritos"),
+    ("gerir_candidaturas", "empresa", "/gerir_candidaturas"),
+    ("minhas_vagas", "empresa", "/minhas_vagas"),
+    ("relatorios", "admin", "/admin/relatorios"),
+    ("admin_utilizadores", "admin", "/admin/utilizadores"),
+]
+
+# Orçamento de queries por rota (pedido com a cache já aquecida), verificado por `flask verificar-queries`
+MAX_QUERIES = {
+    "inicio": 0, "publicacao": 0,  # servidas da cache de páginas
+    "vagas": 1, "vagas_categoria": 1, "vagas_pesquisa": 1, "minhas_vagas": 1, "admin_utilizadores": 1,
+    "api_vagas": 2, "api_vagas_total": 3, "api_facetas": 1,
+    "publicacao_sessao": 2, "candidaturas": 1, "favoritos": 1, "gerir_candidaturas": 2,
+    "relatorios": 4,
+}
+
+
+def contexto_bench():
+    """Ids dos piores casos realistas: estudante/empresa com mais candidaturas, publicação com mais comentários."""
+    estudante = (db.session.query(Candidatura.estudante_id).group_by(Candidatura.estudante_id)
+                 .order_by(func.count().desc()).limit(1).scalar())
+    empresa = (db.session.query(Vaga.empresa_id).join(Candidatura, Candidatura.vaga_id == Vaga.id)
+               .group_by(Vaga.empresa_id).order_by(func.count().desc()).limit(1).scalar())
+    publicacao = (db.session.query(Comentario.publicacao_id).group_by(Comentario.publicacao_id)
+                  .order_by(func.count().desc()).limit(1).scalar())
+    admin = db.session.query(Utilizador.id).filter_by(tipo="admin").limit(1).scalar()
+    return {"estudante": estudante or 0, "empresa": empresa or 0, "admin": admin or 0,
+            "publicacao": publicacao or db.session.query(func.max(Publicacao.id)).scalar() or 0}
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:  # fora do Linux: o pico (ru_maxrss vem em KiB no Linux, bytes no macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**20
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(int(round(p / 100 * (len(ordenados) - 1))), len(ordenados) - 1)]
+
+
+def _resumo(tempos, queries, estados, rss):
+    return {
+        "pedidos": len(tempos),
+        "p50_ms": round(percentil(tempos, 50), 2), "p95_ms": round(percentil(tempos, 95), 2),
+        "p99_ms": round(percentil(tempos, 99), 2), "max_ms": round(max(tempos, default=0), 2),
+        "queries_media": round(sum(queries) / len(queries), 1) if queries else 0,
+        "queries_max": max(queries, default=0),
+        "estados": {str(k): estados.count(k) for k in sorted(set(estados))},
+        "rss_mb": round(rss, 1),
+    }
+
+
+def cliente_para(app, perfil, ctx):
+    cliente = app.test_client()
+    if perfil:
+        with cliente.session_transaction() as s:
+            s.update({"utilizador_id": ctx[perfil], "nome": "bench", "tipo": perfil})
+    return cliente
+
+
+def _correr(app, rotas, pedidos, aquecimento, ctx):
+    """{rota: ([ms], [queries], [estado])} neste processo."""
+    contador = [0]
+
+    def contar(*args):
+        contador[0] += 1
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", contar)
+    brutos = {}
+    try:
+        for nome, perfil, url in rotas:
+            cliente, url = cliente_para(app, perfil, ctx), url.format(**ctx)
+            for _ in range(aquecimento):
+                cliente.get(url)
+            tempos, queries, estados = [], [], []
+            for _ in range(pedidos):
+                contador[0] = 0
+                inicio = time.perf_counter()
+                resp = cliente.get(url)
+                resp.get_data()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+                queries.append(contador[0])
+                estados.append(resp.status_code)
+            brutos[nome] = (tempos, queries, estados, rss_mb())
+    finally:
+        with app.app_context():
+            event.remove(db.engine, "before_cursor_execute", contar)
+    return brutos
+
+
+_ARGUMENTOS = None  # herdados pelo fork: a app não passa pelo pickle do Pool
+
+
+def _trabalhador(_):
+    app, rotas, pedidos, aquecimento, ctx = _ARGUMENTOS
+    with app.app_context():
+        db.engine.dispose(close=False)  # ligações herdadas do pai não se partilham entre processos
+    return _correr(app, rotas, pedidos, aquecimento, ctx)
+
+
+def medir(app, rotas=None, pedidos=200, aquecimento=10, workers=1):
+    """Mede as rotas; com workers > 1 corre um processo por worker (fork, como o gunicorn) ao mesmo tempo."""
+    rotas = rotas or ROTAS
+    with app.app_context():
+        ctx = contexto_bench()
+        contagens = {m.__tablename__: db.session.query(func.count(m.id)).scalar()
+                     for m in (Utilizador, Vaga, Candidatura, Favorito, Publicacao, Comentario)}
+        dialeto = db.engine.dialect.name
+    inicio = time.perf_counter()
+    if workers <= 1:
+        resultados = [_correr(app, rotas, pedidos, aquecimento, ctx)]
+    else:
+        global _ARGUMENTOS
+        _ARGUMENTOS = (app, rotas, pedidos, aquecimento, ctx)
+        with app.app_context():
+            db.engine.dispose()
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            resultados = pool.map(_trabalhador, range(workers))
+    duracao = time.perf_counter() - inicio
+
+    rotas_json = {}
+    for nome, _, _ in rotas:
+        tempos, queries, estados, rss = [], [], [], 0
+        for r in resultados:
+            t, q, e, m = r[nome]
+            tempos += t
+            queries += q
+            estados += e
+            rss = max(rss, m)
+        rotas_json[nome] = _resumo(tempos, queries, estados, rss)
+    total = sum(r["pedidos"] for r in rotas_json.values())
+    return {
+        "commit": _commit_atual(),
+        "data": datetime.utcnow().replace(microsecond=0).isoformat(),
+        "bd": {"dialeto": dialeto, "linhas": contagens},
+        "workers": workers, "pedidos_por_rota": pedidos * workers,
+        "debito_rps": round(total / duracao, 1) if duracao else 0,
+        "rss_pico_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rotas": rotas_json,
+    }
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def gravar(resultado, caminho):
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write("\n")
+
+
+def comparar(antes, depois, campos=("p50_ms", "p95_ms", "p99_ms", "queries_media")):
+    """Linhas de texto com a variação por rota entre dois resultados (baseline vs atual)."""
+    linhas = [f"{'rota':22} " + " ".join(f"{c:>22}" for c in campos)]
+    for nome, atual in depois["rotas"].items():
+        base = antes.get("rotas", {}).get(nome)
+        celulas = []
+        for c in campos:
+            if not base:
+                celulas.append(f"{atual[c]:>22}")
+                continue
+            delta = (atual[c] - base[c]) / base[c] * 100 if base[c] else 0.0
+            celulas.append(f"{base[c]:>8} → {atual[c]:<8} {delta:+4.0f}%")
+        linhas.append(f"{nome:22} " + " ".join(celulas))
+    return linhas
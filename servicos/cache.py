@@ -0,0 +1,229 @@
+import pickle
+import threading
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from modelos.modelos import db, VersaoCache
+
+# ===== Cache em memória (por processo) =====
+
+class CacheTTL:
+    """Dicionário com prazo de validade por entrada; seguro entre threads."""
+
+    def __init__(self, ttl: float, maximo: int = 1000):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._dados = {}
+        self._lock = threading.Lock()
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return padrao
+            expira, valor = item
+            if expira < time.monotonic():
+                del self._dados[chave]
+                return padrao
+            return valor
+
+    def guardar(self, chave, valor, ttl=None):
+        with self._lock:
+            if len(self._dados) >= self.maximo:
+                # Descarta os mais antigos (ordem de inserção) em vez de crescer sem limite
+                for k in list(self._dados)[: self.maximo // 10 or 1]:
+                    del self._dados[k]
+            self._dados[chave] = (time.monotonic() + (ttl or self.ttl), valor)
+        return valor
+
+    def obter_ou_calcular(self, chave, calcular, ttl=None):
+        valor = self.obter(chave, _FALTA)
+        if valor is _FALTA:
+            valor = self.guardar(chave, calcular(), ttl)
+        return valor
+
+    def apagar(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+
+_FALTA = object()
+
+
+# ===== Cache partilhada (backend configurável) =====
+# CACHE_URL=memory:// (omissão) guarda tudo no processo; redis://host:6379/0 partilha entre
+# workers com qualquer servidor compatível com o protocolo Redis (redis, valkey, fakeredis nos testes).
+# Os valores têm de ser serializáveis com pickle (dicts/listas, não objetos do ORM).
+
+class BackendMemoria(CacheTTL):
+    """Backend do próprio processo; cada worker tem a sua cópia."""
+
+    def __init__(self, ttl: float, maximo: int = 1000):
+        super().__init__(ttl, maximo)
+        # Contadores (etiquetas, versões) à parte: se a limpeza por tamanho os levasse, voltavam a 0 e
+        # as próximas invalidações reutilizavam versões que ainda têm páginas antigas guardadas
+        self._contadores = {}
+
+    def incrementar(self, chave) -> int:
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + 1
+            return self._contadores[chave]
+
+    def contador(self, chave) -> int:
+        with self._lock:
+            return self._contadores.get(chave, 0)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+            self._contadores.clear()
+
+
+class BackendRedis:
+    """Backend partilhado; uma falha do servidor degrada para "sem cache" em vez de partir a página."""
+
+    def __init__(self, cliente, ttl: float = 300, prefixo: str = "adluc:"):
+        self.r = cliente
+        self.ttl = ttl
+        self.prefixo = prefixo
+
+    @classmethod
+    def de_url(cls, url: str, **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL com redis:// precisa do pacote redis (pip install redis)")
+        return cls(redis.Redis.from_url(url, socket_timeout=0.5), **kwargs)
+
+    def obter(self, chave, padrao=None):
+        try:
+            valor = self.r.get(self.prefixo + chave)
+            return padrao if valor is None else pickle.loads(valor)
+        except Exception as e:  # servidor em baixo ou entrada ilegível: conta como falha da cache
+            print(f"cache erro: {e}")
+            return padrao
+
+    def guardar(self, chave, valor, ttl=None):
+        try:
+            self.r.set(self.prefixo + chave, pickle.dumps(valor), ex=int(ttl or self.ttl))
+        except Exception as e:
+            print(f"cache erro: {e}")
+        return valor
+
+    def obter_ou_calcular(self, chave, calcular, ttl=None):
+        valor = self.obter(chave, _FALTA)
+        if valor is _FALTA:
+            valor = self.guardar(chave, calcular(), ttl)
+        return valor
+
+    def apagar(self, chave):
+        try:
+            self.r.delete(self.prefixo + chave)
+        except Exception as e:
+            print(f"cache erro: {e}")
+
+    def incrementar(self, chave) -> int:
+        try:
+            return self.r.incr(self.prefixo + chave)
+        except Exception as e:
+            print(f"cache erro: {e}")
+            return 0
+
+    def contador(self, chave) -> int:
+        """Valor de um contador de incrementar() (o INCR guarda um inteiro em texto, não pickle)."""
+        try:
+            return int(self.r.get(self.prefixo + chave) or 0)
+        except Exception as e:
+            print(f"cache erro: {e}")
+            return 0
+
+
+# Com memory:// as versões das etiquetas vêm da BD; cada processo relê-as no máximo a cada N segundos
+INTERVALO_ETIQUETAS = 2
+
+
+class Etiquetas:
+    """Invalidação por etiqueta: cada etiqueta é um contador e entra na chave.
+
+    Purgar uma etiqueta é só incrementá-la; as entradas antigas deixam de ser lidas e expiram pelo TTL.
+    Com redis:// os contadores ficam no backend, que já é partilhado. Com memory:// uma purga feita
+    noutro processo (outro worker, o agendador, um comando flask) tem de valer também aqui: os
+    contadores vivem em versoes_cache ("etiqueta:<nome>") e são relidos todos numa query, no máximo a
+    cada INTERVALO_ETIQUETAS segundos (o processo que purga vê a purga logo no pedido seguinte).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.na_bd = isinstance(backend, BackendMemoria)
+        self._versoes, self._lidas_em = {}, None
+
+    def _versoes_bd(self):
+        agora = time.monotonic()
+        if self._lidas_em is None or agora - self._lidas_em >= INTERVALO_ETIQUETAS:
+            # Intervalo da chave primária (";" vem logo a seguir a ":"), em vez de um LIKE sem índice
+            linhas = db.session.execute(select(VersaoCache.nome, VersaoCache.valor)
+                                        .where(VersaoCache.nome >= "etiqueta:", VersaoCache.nome < "etiqueta;"))
+            self._versoes, self._lidas_em = dict(linhas.all()), agora
+        return self._versoes
+
+    def chave(self, base: str, etiquetas) -> str:
+        if self.na_bd:
+            guardadas = self._versoes_bd()
+            versoes = ".".join(str(guardadas.get(f"etiqueta:{e}", 0)) for e in etiquetas)
+        else:
+            versoes = ".".join(str(self.backend.contador(f"etiqueta:{e}")) for e in etiquetas)
+        return f"{base}@{versoes}"
+
+    def invalidar(self, *etiquetas):
+        if not self.na_bd:
+            for e in etiquetas:
+                self.backend.incrementar(f"etiqueta:{e}")
+            return
+        # Transação própria: corre depois do commit do pedido (purgar_no_fim) ou fora de pedidos
+        with db.engine.begin() as conexao:
+            if conexao.dialect.name == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(VersaoCache)
+            conexao.execute(stmt.on_conflict_do_update(index_elements=["nome"],
+                                                       set_={"valor": VersaoCache.valor + 1}),
+                            [{"nome": f"etiqueta:{e}", "valor": 1} for e in sorted(set(etiquetas))])
+        self._lidas_em = None
+
+
+def criar_backend(url: str, ttl: float = 300):
+    if not url or url.startswith("memory://"):
+        return BackendMemoria(ttl=ttl, maximo=10000)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return BackendRedis.de_url(url, ttl=ttl)
+    raise ValueError(f"CACHE_URL desconhecido: {url}")
+
+
+# ===== Versões (invalidação entre processos) =====
+# As caches guardam o valor junto com a versão; quando alguém escreve, a versão sobe na mesma
+# transação e todos os workers deixam de usar o valor antigo.
+VERSAO_VAGAS = "vagas"
+VERSAO_EMPRESAS = "empresas"
+
+def versao(nome: str) -> int:
+    return db.session.execute(select(VersaoCache.valor).where(VersaoCache.nome == nome)).scalar() or 0
+
+
+def incrementar_versao(nome: str):
+    """Sobe a versão dentro da transação atual; quem chama faz o commit junto com a escrita."""
+    r = db.session.execute(update(VersaoCache).where(VersaoCache.nome == nome)
+                           .values(valor=VersaoCache.valor + 1)
+                           .execution_options(synchronize_session=False))
+    if not r.rowcount:
+        try:
+            with db.session.begin_nested():
+                db.session.add(VersaoCache(nome=nome, valor=1))
+        except IntegrityError:
+            incrementar_versao(nome)
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import delete, select
+
+from modelos.modelos import db, EmailPendente
+from servicos import metricas
+
+# ===== Caixa de saída de e-mail =====
+# Os pedidos só fazem enfileirar() (um INSERT na própria transação); a tarefa "enviar_emails" do
+# agendador envia os pendentes numa única ligação SMTP por lote e reagenda as falhas com backoff.
+# EMAIL_RESUMO_MINUTOS > 0 junta as notificações de comentários num resumo periódico por destinatário.
+# Os enviados ficam EMAIL_RETENCAO_DIAS para consulta e a mesma tarefa apaga-os depois, aos lotes.
+
+EMAIL_LOTE = 50
+EMAIL_MAX_TENTATIVAS = 8
+EMAIL_BACKOFF_MAX = timedelta(hours=6)
+EMAIL_LIMPEZA_LOTE = 5000
+
+
+def enfileirar(destinatarios, assunto, corpo, tipo="geral"):
+    """Grava o e-mail na caixa de saída; o commit é do chamador."""
+    resumo = current_app.config.get("EMAIL_RESUMO_MINUTOS", 0) if tipo == "comentario" else 0
+    agora = datetime.utcnow()
+    db.session.add(EmailPendente(destinatarios=",".join(destinatarios), assunto=assunto[:300], corpo=corpo,
+                                 tipo=tipo, criado_em=agora, proximo_envio=agora + timedelta(minutes=resumo)))
+
+
+def _falhou(emails, erro, agora):
+    metricas.EMAILS_ENVIADOS.labels("falha").inc(len(emails))
+    for e in emails:
+        e.tentativas += 1
+        e.ultimo_erro = str(erro)[:2000]
+        if e.tentativas >= EMAIL_MAX_TENTATIVAS:
+            e.estado = "falhado"
+        else:
+            e.proximo_envio = agora + min(timedelta(minutes=2 ** e.tentativas), EMAIL_BACKOFF_MAX)
+    print(f"email: falha ({len(emails)}): {erro}")
+
+
+def _mensagens(pendentes, resumo_minutos):
+    """[(Message, [EmailPendente])]: um e-mail por linha, ou um resumo por destinatários nos comentários."""
+    lotes, comentarios = [], {}
+    for e in pendentes:
+        if resumo_minutos and e.tipo == "comentario":
+            comentarios.setdefault(e.destinatarios, []).append(e)
+        else:
+            lotes.append((Message(subject=e.assunto, recipients=e.destinatarios.split(","), body=e.corpo), [e]))
+    for destinatarios, emails in comentarios.items():
+        if len(emails) == 1:
+            corpo, assunto = emails[0].corpo, emails[0].assunto
+        else:
+            assunto = f"Resumo: {len(emails)} novos comentários"
+            corpo = "\n\n".join(f"== {e.assunto} ==\n{e.corpo.strip()}" for e in emails)
+        lotes.append((Message(subject=assunto, recipients=destinatarios.split(","), body=corpo), emails))
+    return lotes
+
+
+def apagar_enviados(dias):
+    """Apaga até EMAIL_LIMPEZA_LOTE enviados há mais de `dias` (0 = guardar sempre); devolve quantos."""
+    if not dias:
+        return 0
+    limite = datetime.utcnow() - timedelta(days=dias)
+    # proximo_envio <= enviado_em num enviado: o filtro extra deixa o índice (estado, proximo_envio) limitar a leitura
+    antigos = (select(EmailPendente.id)
+               .where(EmailPendente.estado == "enviado", EmailPendente.proximo_envio < limite,
+                      EmailPendente.enviado_em < limite)
+               .limit(EMAIL_LIMPEZA_LOTE))
+    n = db.session.execute(delete(EmailPendente).where(EmailPendente.id.in_(antigos))
+                           .execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    return n
+
+
+def enviar_pendentes(mail, resumo_minutos=0, retencao_dias=0):
+    """Envia o que já está na hora e apaga os enviados antigos; devolve o número de mensagens enviadas."""
+    apagar_enviados(retencao_dias)
+    agora = datetime.utcnow()
+    pendentes = (EmailPendente.query
+                 .filter(EmailPendente.estado == "pendente", EmailPendente.proximo_envio <= agora)
+                 .order_by(EmailPendente.id).limit(EMAIL_LOTE).all())
+    if resumo_minutos and any(e.tipo == "comentario" for e in pendentes):
+        # Chegou a hora do resumo: leva também os comentários mais recentes do mesmo destinatário
+        vistos = {e.id for e in pendentes}
+        pendentes += [e for e in EmailPendente.query.filter_by(estado="pendente", tipo="comentario")
+                      .order_by(EmailPendente.id).limit(EMAIL_LOTE * 10) if e.id not in vistos]
+    lotes = _mensagens(pendentes, resumo_minutos)
+    if not lotes:
+        return 0
+
+    enviados, tratados = 0, 0
+    try:
+        with mail.connect() as ligacao:
+            for msg, emails in lotes:
+                tratados += 1
+                try:
+                    ligacao.send(msg)
+                except Exception as e:
+                    _falhou(emails, e, agora)
+                    continue
+                for e in emails:
+                    e.estado, e.enviado_em, e.ultimo_erro = "enviado", datetime.utcnow(), None
+                enviados += 1
+                metricas.EMAILS_ENVIADOS.labels("enviado").inc(len(emails))
+    except Exception as e:
+        # Ligação/login falhou (ou caiu a meio): o que ficou por tentar volta à fila com backoff
+        _falhou([e_ for _, emails in lotes[tratados:] for e_ in emails], e, agora)
+    db.session.commit()
+    return enviados
+
+
+def contar_por_estado():
+    return dict(db.session.query(EmailPendente.estado, db.func.count()).group_by(EmailPendente.estado).all())
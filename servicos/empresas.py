@@ -0,0 +1,159 @@
+import bisect
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from modelos.modelos import db, Utilizador
+from servicos.cache import versao, incrementar_versao, VERSAO_EMPRESAS
+
+# ===== Índice de nomes de empresas (autocomplete) =====
+# Vive em memória em cada processo. Escritas no próprio processo atualizam-no de forma incremental;
+# escritas noutros workers são detetadas pela versão "empresas" (verificada no máximo a cada
+# INTERVALO_VERIFICACAO segundos) e provocam uma reconstrução.
+
+INTERVALO_VERIFICACAO = 5
+
+
+def normalizar(txt: str) -> str:
+    # "Uniao Joáo" e "UNIÃO JOAO" => "uniao joao"
+    txt = unicodedata.normalize("NFKD", txt or "")
+    return " ".join("".join(c for c in txt if not unicodedata.combining(c)).casefold().split())
+
+
+def _trigramas(txt: str):
+    return {txt[i:i + 3] for i in range(len(txt) - 2)}
+
+
+class IndiceEmpresas:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._limpar()
+        self.versao = None
+        self._verificado_em = 0.0
+
+    def _limpar(self):
+        self._nomes = {}                        # id -> (nome, nome normalizado)
+        self._por_nome = []                     # [(normalizado, id)] ordenado: prefixo do nome
+        self._por_palavra = []                  # [(palavra, id)] ordenado: prefixo de cada palavra
+        self._trigramas = defaultdict(set)      # trigrama -> {ids}: substring
+
+    def reconstruir(self, pares, versao_atual=None):
+        with self._lock:
+            self._limpar()
+            for empresa_id, nome in pares:
+                self._adicionar(empresa_id, nome, ordenar=False)
+            self._por_nome.sort()
+            self._por_palavra.sort()
+            self.versao = versao_atual
+
+    def _adicionar(self, empresa_id, nome, ordenar=True):
+        norm = normalizar(nome)
+        if not norm:
+            return
+        inserir = bisect.insort if ordenar else list.append
+        self._nomes[empresa_id] = (nome.strip(), norm)
+        inserir(self._por_nome, (norm, empresa_id))
+        for palavra in set(norm.split()):
+            inserir(self._por_palavra, (palavra, empresa_id))
+        for t in _trigramas(norm):
+            self._trigramas[t].add(empresa_id)
+
+    def _remover(self, empresa_id):
+        antigo = self._nomes.pop(empresa_id, None)
+        if not antigo:
+            return
+        norm = antigo[1]
+        del self._por_nome[bisect.bisect_left(self._por_nome, (norm, empresa_id))]
+        for palavra in set(norm.split()):
+            del self._por_palavra[bisect.bisect_left(self._por_palavra, (palavra, empresa_id))]
+        for t in _trigramas(norm):
+            self._trigramas[t].discard(empresa_id)
+
+    def aplicar(self, empresa_id, nome, versao_nova):
+        """Atualiza uma empresa (nome None remove-a) depois de uma escrita feita por este processo."""
+        with self._lock:
+            if self.versao is None or versao_nova != self.versao + 1:
+                self.versao = None  # perdemos escritas de outros processos: reconstrói no próximo uso
+                return
+            self._remover(empresa_id)
+            if nome:
+                self._adicionar(empresa_id, nome)
+            self.versao = versao_nova
+
+    def procurar(self, termo: str, limite: int = 10):
+        """[(id, nome)] por ordem: prefixo do nome, prefixo de uma palavra, substring; depois alfabética."""
+        q = normalizar(termo)
+        with self._lock:
+            if not q:
+                return [(i, self._nomes[i][0]) for _, i in self._por_nome[:limite]]
+            resultado, vistos = [], set()
+
+            def juntar(ids):
+                for i in ids:
+                    if i not in vistos:
+                        vistos.add(i); resultado.append(i)
+                        if len(resultado) >= limite:
+                            return True
+                return False
+
+            if juntar(self._prefixo(self._por_nome, q)):
+                return self._nomes_de(resultado)
+            if juntar(self._prefixo(self._por_palavra, q)):
+                return self._nomes_de(resultado)
+            if len(q) >= 3:
+                # Último nível: pára assim que enche o limite (não ordena milhares de candidatos)
+                # Percorre só o trigrama mais raro; a verificação "q in nome" faz o resto
+                candidatos = min((self._trigramas.get(t, set()) for t in _trigramas(q)), key=len)
+                extra = []
+                for i in candidatos:
+                    if i not in vistos and q in self._nomes[i][1]:
+                        extra.append(i)
+                        if len(resultado) + len(extra) >= limite:
+                            break
+                juntar(sorted(extra, key=lambda i: self._nomes[i][1]))
+            return self._nomes_de(resultado)
+
+    @staticmethod
+    def _prefixo(lista, q):
+        i = bisect.bisect_left(lista, (q,))
+        while i < len(lista) and lista[i][0].startswith(q):
+            yield lista[i][1]
+            i += 1
+
+    def _nomes_de(self, ids):
+        return [(i, self._nomes[i][0]) for i in ids]
+
+    def nomes(self):
+        with self._lock:
+            return [self._nomes[i][0] for _, i in self._por_nome]
+
+
+indice_empresas = IndiceEmpresas()
+
+
+def _carregar():
+    return (db.session.query(Utilizador.id, Utilizador.nome_empresa)
+            .filter(Utilizador.tipo == "empresa", Utilizador.nome_empresa != None).all())
+
+
+def garantir_indice():
+    """Reconstrói o índice se estiver vazio ou se outro processo alterou empresas entretanto."""
+    agora = time.monotonic()
+    if indice_empresas.versao is not None and agora - indice_empresas._verificado_em < INTERVALO_VERIFICACAO:
+        return indice_empresas
+    atual = versao(VERSAO_EMPRESAS)
+    if indice_empresas.versao != atual:
+        indice_empresas.reconstruir(_carregar(), atual)
+    indice_empresas._verificado_em = agora
+    return indice_empresas
+
+
+def marcar_empresa_alterada():
+    # Antes do commit, na mesma transação da escrita
+    incrementar_versao(VERSAO_EMPRESAS)
+
+
+def empresa_alterada(empresa_id, nome_empresa):
+    """Depois do commit (registo, perfil, edição/remoção pelo admin); nome None tira a empresa do índice."""
+    indice_empresas.aplicar(empresa_id, nome_empresa, versao(VERSAO_EMPRESAS))
@@ -0,0 +1,157 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import String, case, cast, event, func, inspect, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from modelos.modelos import (db, Utilizador, Vaga, Candidatura, Favorito, Publicacao,
+                             EstatisticaTotal, EstatisticaDiaria)
+
+# ===== Estatísticas =====
+# Cada inserção/remoção feita pelo ORM soma +1/-1 em estatisticas_totais e na linha do dia em
+# estatisticas_diarias, na mesma transação; mudar o tipo (p.ex. vaga interna -> externa) tira 1 à
+# chave antiga e soma 1 à nova. O que passa ao lado do ORM (inserts em lote do RSS) chama registar();
+# a tarefa diária reconciliar() corrige a deriva que sobrar só nos totais.
+
+
+# Atributo de que depende a chave: um UPDATE que o muda move o objeto de uma chave para a outra
+CAMPOS_CHAVE = {Utilizador: "tipo", Vaga: "externa", Candidatura: "vaga_id", Publicacao: "tipo"}
+
+
+def _chaves(obj, valor):
+    if isinstance(obj, Utilizador):
+        return [("registos", valor)]
+    if isinstance(obj, Vaga):
+        return [("vagas", "externa" if valor else "interna")]
+    if isinstance(obj, Candidatura):
+        return [("candidaturas", ""), ("candidaturas_vaga", str(valor))]
+    if isinstance(obj, Favorito):
+        return [("favoritos", "")]
+    if isinstance(obj, Publicacao):
+        return [("publicacoes", valor or "noticia")]
+    return []
+
+
+def _deltas_objeto(obj, sinal, d):
+    campo = CAMPOS_CHAVE.get(type(obj))
+    for k in _chaves(obj, getattr(obj, campo) if campo else None):
+        d[k] += sinal
+
+
+def _deltas_alteracao(obj, d):
+    campo = CAMPOS_CHAVE.get(type(obj))
+    if campo is None:
+        return
+    historico = inspect(obj).attrs[campo].history
+    if historico.added and historico.deleted:
+        for k in _chaves(obj, historico.deleted[0]):
+            d[k] -= 1
+        for k in _chaves(obj, historico.added[0]):
+            d[k] += 1
+
+
+# active_history: numa atribuição a um objeto expirado (depois de um commit) o valor antigo é lido
+# antes de ser substituído, para o histórico ter sempre os dois lados
+for _modelo, _campo in CAMPOS_CHAVE.items():
+    event.listen(getattr(_modelo, _campo), "set", lambda *args: None, active_history=True)
+
+
+def _insert_somando(conexao, modelo):
+    # Upsert "valor = valor + excluded.valor" (SQLite e Postgres)
+    if conexao.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(modelo)
+    chaves = [c.name for c in modelo.__table__.primary_key]
+    return stmt.on_conflict_do_update(index_elements=chaves,
+                                      set_={"valor": modelo.valor + stmt.excluded.valor})
+
+
+def _aplicar(conexao, deltas, diaria=True):
+    linhas = [{"metrica": m, "chave": c, "valor": v} for (m, c), v in deltas.items() if v]
+    if not linhas:
+        return
+    conexao.execute(_insert_somando(conexao, EstatisticaTotal), linhas)
+    if diaria:
+        hoje = datetime.utcnow().date()
+        conexao.execute(_insert_somando(conexao, EstatisticaDiaria), [dict(l, dia=hoje) for l in linhas])
+
+
+@event.listens_for(Session, "after_flush")
+def _contar_alteracoes(session, contexto):
+    d = Counter()
+    for obj in session.new:
+        _deltas_objeto(obj, 1, d)
+    for obj in session.deleted:
+        _deltas_objeto(obj, -1, d)
+    for obj in session.dirty:
+        _deltas_alteracao(obj, d)
+    if d:
+        _aplicar(session.connection(), d)
+
+
+def registar(deltas):
+    """Para escritas em lote fora do ORM, p.ex. {("vagas", "externa"): 25}; entra na transação corrente."""
+    _aplicar(db.session.connection(), Counter(deltas))
+
+
+def snapshot():
+    """Todos os totais numa só query agrupada: {(metrica, chave): valor}."""
+    q = union_all(
+        select(literal("registos"), Utilizador.tipo, func.count()).group_by(Utilizador.tipo),
+        select(literal("vagas"), case((Vaga.externa, "externa"), else_="interna"), func.count())
+        .group_by(Vaga.externa),
+        select(literal("candidaturas"), literal(""), func.count()).select_from(Candidatura),
+        select(literal("candidaturas_vaga"), cast(Candidatura.vaga_id, String), func.count())
+        .group_by(Candidatura.vaga_id),
+        select(literal("favoritos"), literal(""), func.count()).select_from(Favorito),
+        select(literal("publicacoes"), func.coalesce(Publicacao.tipo, "noticia"), func.count())
+        .group_by(Publicacao.tipo),
+    )
+    return {(m, c): v for m, c, v in db.session.execute(q) if v}
+
+
+def reconciliar():
+    """Tarefa diária: compara os totais com snapshot() e corrige a diferença em estatisticas_totais.
+
+    A correção não entra em estatisticas_diarias: a deriva acumulada de vários dias (ou de antes da
+    tabela existir) não é atividade de hoje e estragaria a série. Devolve o número de linhas corrigidas.
+    """
+    atual = snapshot()
+    guardados = {(t.metrica, t.chave): t.valor for t in EstatisticaTotal.query}
+    diferencas = {k: atual.get(k, 0) - guardados.get(k, 0) for k in atual.keys() | guardados.keys()}
+    diferencas = {k: v for k, v in diferencas.items() if v}
+    _aplicar(db.session.connection(), diferencas, diaria=False)
+    db.session.query(EstatisticaTotal).filter(EstatisticaTotal.valor == 0).delete()
+    db.session.commit()
+    if guardados and diferencas:
+        print(f"estatísticas: {len(diferencas)} totais corrigidos pela reconciliação")
+    return len(diferencas)
+
+
+def totais():
+    """Totais fixos (sem as linhas por vaga): nº de linhas constante, seja qual for o tamanho das tabelas."""
+    linhas = EstatisticaTotal.query.filter(EstatisticaTotal.metrica != "candidaturas_vaga").all()
+    return Counter({(t.metrica, t.chave): t.valor for t in linhas})
+
+
+def top_vagas_candidaturas(limite=10):
+    linhas = (db.session.query(EstatisticaTotal.chave, EstatisticaTotal.valor)
+              .filter(EstatisticaTotal.metrica == "candidaturas_vaga", EstatisticaTotal.valor > 0)
+              .order_by(EstatisticaTotal.valor.desc()).limit(limite).all())
+    titulos = dict(db.session.query(Vaga.id, Vaga.titulo)
+                   .filter(Vaga.id.in_([int(l.chave) for l in linhas])).all())
+    return [(titulos.get(int(l.chave), f"Vaga #{l.chave}"), l.valor) for l in linhas]
+
+
+def serie_diaria(dias=30):
+    """{dia: Counter((metrica, chave) -> variação)} dos últimos `dias`, sem as linhas por vaga."""
+    desde = datetime.utcnow().date() - timedelta(days=dias - 1)
+    linhas = (EstatisticaDiaria.query
+              .filter(EstatisticaDiaria.dia >= desde, EstatisticaDiaria.metrica != "candidaturas_vaga")
+              .order_by(EstatisticaDiaria.dia.desc()).all())
+    serie = {}
+    for l in linhas:
+        serie.setdefault(l.dia, Counter())[(l.metrica, l.chave)] = l.valor
+    return serie
@@ -0,0 +1,146 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from modelos.modelos import Utilizador, Vaga, Candidatura, Favorito
+
+# ===== Exportação de dados (admin) =====
+# /admin/export/<entidade> devolve CSV ou NDJSON gerado enquanto é enviado: as linhas vêm de um cursor
+# do servidor (stream_results + yield_per) em lotes de LOTE e cada lote é escrito e entregue antes de
+# ler o seguinte, por isso a memória do worker não depende do número de linhas. Só colunas (Core), sem
+# objetos ORM nem identity map. Filtros por igualdade numa lista fechada por entidade e intervalo de
+# datas em criado_em (as linhas anteriores a essa coluna têm NULL e ficam fora de qualquer intervalo).
+
+LOTE = 1000
+FORMATOS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+_Estudante = Utilizador.__table__.alias("estudante")
+_Empresa = Utilizador.__table__.alias("empresa")
+
+
+def _booleano(valor):
+    if valor.lower() in ("1", "true", "sim"):
+        return True
+    if valor.lower() in ("0", "false", "nao", "não"):
+        return False
+    raise ValueError(valor)
+
+
+# entidade: (query sem filtros, coluna de datas, {parâmetro: (coluna, conversor)})
+ENTIDADES = {
+    "utilizadores": (
+        lambda: select(Utilizador.id, Utilizador.nome, Utilizador.email, Utilizador.tipo, Utilizador.nif,
+                       Utilizador.nome_empresa, Utilizador.codigo_postal, Utilizador.distrito,
+                       Utilizador.telefone, Utilizador.criado_em)  # nunca senha_hash
+        .order_by(Utilizador.id),
+        Utilizador.criado_em,
+        {"tipo": (Utilizador.tipo, str), "distrito": (Utilizador.distrito, str)},
+    ),
+    "vagas": (
+        lambda: select(Vaga.id, Vaga.titulo, Vaga.categoria, Vaga.cidade, Vaga.horario, Vaga.tipo, Vaga.externa,
+                       Vaga.link_externo, Vaga.empresa_id, _Empresa.c.nome_empresa.label("empresa"),
+                       Vaga.criado_em, Vaga.descricao)
+        .outerjoin(_Empresa, _Empresa.c.id == Vaga.empresa_id).order_by(Vaga.id),
+        Vaga.criado_em,
+        {"categoria": (Vaga.categoria, str), "cidade": (Vaga.cidade, str), "horario": (Vaga.horario, str),
+         "tipo": (Vaga.tipo, str), "externa": (Vaga.externa, _booleano),
+         "empresa_id": (Vaga.empresa_id, int)},
+    ),
+    "candidaturas": (
+        lambda: select(Candidatura.id, Candidatura.vaga_id, Vaga.titulo.label("vaga_titulo"), Vaga.empresa_id,
+                       Candidatura.estudante_id, _Estudante.c.nome.label("estudante_nome"),
+                       _Estudante.c.email.label("estudante_email"), Candidatura.ficheiro_cv, Candidatura.criado_em)
+        .join(Vaga, Vaga.id == Candidatura.vaga_id).join(_Estudante, _Estudante.c.id == Candidatura.estudante_id)
+        .order_by(Candidatura.id),
+        Candidatura.criado_em,
+        {"vaga_id": (Candidatura.vaga_id, int), "estudante_id": (Candidatura.estudante_id, int),
+         "empresa_id": (Vaga.empresa_id, int)},
+    ),
+    "favoritos": (
+        lambda: select(Favorito.id, Favorito.vaga_id, Vaga.titulo.label("vaga_titulo"), Favorito.estudante_id,
+                       Favorito.criado_em)
+        .join(Vaga, Vaga.id == Favorito.vaga_id).order_by(Favorito.id),
+        Favorito.criado_em,
+        {"vaga_id": (Favorito.vaga_id, int), "estudante_id": (Favorito.estudante_id, int)},
+    ),
+}
+
+
+def _data(valor, nome):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"{nome}: data inválida (AAAA-MM-DD)")
+
+
+def consulta(entidade, argumentos):
+    """select() filtrado a partir dos parâmetros do pedido; ValueError com a mensagem para o 400."""
+    if entidade not in ENTIDADES:
+        raise LookupError(entidade)
+    base, coluna_data, permitidos = ENTIDADES[entidade]
+    stmt = base()
+    for nome, valor in argumentos.items():
+        if nome in ("formato", "desde", "ate") or valor == "":
+            continue
+        if nome not in permitidos:
+            raise ValueError(f"filtro desconhecido para {entidade}: {nome} (aceites: {', '.join(permitidos)})")
+        coluna, converter = permitidos[nome]
+        try:
+            stmt = stmt.where(coluna == converter(valor))
+        except ValueError:
+            raise ValueError(f"{nome}: valor inválido")
+    if argumentos.get("desde"):
+        stmt = stmt.where(coluna_data >= _data(argumentos["desde"], "desde"))
+    if argumentos.get("ate"):  # inclusivo: até ao fim desse dia
+        stmt = stmt.where(coluna_data < _data(argumentos["ate"], "ate") + timedelta(days=1))
+    return stmt
+
+
+def _valor_json(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else str(valor)
+
+
+def _csv(resultado):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(resultado.keys())
+    yield 0, buffer.getvalue().encode()  # só o cabeçalho, se não houver linhas
+    buffer.seek(0)
+    buffer.truncate()
+    for lote in resultado.partitions():
+        escritor.writerows([v.isoformat() if isinstance(v, datetime) else v for v in linha] for linha in lote)
+        yield len(lote), buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _ndjson(resultado):
+    for lote in resultado.partitions():
+        linhas = (json.dumps(dict(linha._mapping), default=_valor_json, ensure_ascii=False) for linha in lote)
+        yield len(lote), "".join(f"{l}\n" for l in linhas).encode()
+
+
+def verificar(engine, stmt):
+    """Corre a query com LIMIT 0 antes da resposta: um erro de esquema (colunas por migrar) sai como
+    exceção aqui e não a meio de um download que já recebeu o 200."""
+    with engine.connect() as conexao:
+        conexao.execute(stmt.limit(0)).close()
+
+
+def gerar(engine, entidade, stmt, formato):
+    """Bytes do ficheiro, lote a lote, numa ligação própria aberta só enquanto o gerador corre."""
+    inicio, linhas = time.perf_counter(), 0
+    with engine.connect() as conexao:
+        if conexao.dialect.name == "postgresql":
+            # Um cliente lento deixa a transação parada entre FETCHs; o timeout da sessão (60s) cortá-la-ia
+            conexao.exec_driver_sql("SET LOCAL idle_in_transaction_session_timeout = 0")
+        resultado = conexao.execution_options(stream_results=True, yield_per=LOTE).execute(stmt)
+        for n, bloco in (_csv if formato == "csv" else _ndjson)(resultado):
+            linhas += n
+            yield bloco
+        conexao.rollback()
+    print(f"exportação: {entidade} ({formato}) {linhas} linhas em {time.perf_counter() - inicio:.1f}s")
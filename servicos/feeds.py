@@ -0,0 +1,294 @@
+import hashlib
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter, Retry
+import feedparser
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+
+from modelos.modelos import db, Vaga, FonteFeed
+from servicos.cache import incrementar_versao, VERSAO_VAGAS
+from servicos.estatisticas import registar as registar_estatisticas
+from servicos import metricas
+
+
+def strip_html(txt: str) -> str:
+    if not txt: return ""
+    txt = re.sub(r"<[^>]+>", " ", txt)
+    return re.sub(r"\s+", " ", txt).strip()
+
+# ===== FEEDS EXTERNOS =====
+# Fontes iniciais; depois de semeadas na tabela fontes_feed é a tabela que manda
+FEEDS_PADRAO = [
+    "http://www.expressoemprego.pt/rss/ultimas-ofertas",
+    "http://www.expressoemprego.pt/rss/informatica",
+    "http://www.expressoemprego.pt/rss/lisboa",
+    "https://www.huork.com/rss/all/",
+    "https://euraxess.ec.europa.eu/job-feed",
+    "https://www.fct.pt/media/noticias/feed/",
+    "https://www.fct.pt/media/noticias/feed/?type=calendar_event",
+    "https://www.fct.pt/media/noticias/feed/?type=science_in_focus",
+]
+
+# Fetch concorrente: o custo de um ciclo é ~ o feed mais lento e não a soma de todos
+FEEDS_MAX_WORKERS = 8
+FEED_TIMEOUT = (5, 10)      # (connect, read) por operação de socket
+FEED_PRAZO = 20             # segundos por feed, incluindo retries e download do corpo
+CICLO_ORCAMENTO = 45        # segundos para o ciclo inteiro de fetch
+FEED_MAX_BYTES = 5 * 1024 * 1024
+
+# Backoff por fonte: feeds que falham ou nunca mudam são consultados cada vez menos
+BACKOFF_MAX_ERROS = timedelta(hours=24)
+BACKOFF_MAX_SEM_ALTERACOES = timedelta(hours=6)
+
+_sessao = None
+_sessao_lock = threading.Lock()
+
+def _http_session():
+    # Uma única Session partilhada por todo o processo: reutiliza ligações e sessões TLS entre ciclos
+    global _sessao
+    with _sessao_lock:
+        if _sessao is None:
+            s = requests.Session()
+            s.headers.update({"User-Agent": "Mozilla/5.0 AdLucBot/1.0"})
+            retries = Retry(total=2, backoff_factor=0.5, status_forcelist=[429,500,502,503,504])
+            adapter = HTTPAdapter(max_retries=retries, pool_connections=FEEDS_MAX_WORKERS,
+                                  pool_maxsize=FEEDS_MAX_WORKERS)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _sessao = s
+    return _sessao
+
+def _parse_feed(url: str, etag=None, last_modified=None, hash_anterior=None):
+    """GET condicional de um feed. Devolve dict com status, entries e os validadores novos.
+
+    status 304 (ou corpo igual ao anterior) significa "não mudou" e não há parsing.
+    status None significa erro de rede/prazo.
+    """
+    resultado = {"status": None, "entries": [], "etag": etag,
+                 "last_modified": last_modified, "hash": hash_anterior}
+    headers = {}
+    if etag: headers["If-None-Match"] = etag
+    if last_modified: headers["If-Modified-Since"] = last_modified
+    inicio = time.monotonic()
+    prazo = inicio + FEED_PRAZO
+    tamanho = 0
+    try:
+        with _http_session().get(url, timeout=FEED_TIMEOUT, stream=True, headers=headers) as resp:
+            resultado["status"] = resp.status_code
+            if resp.status_code == 304:
+                resultado["etag"] = resp.headers.get("ETag") or etag
+                return resultado
+            if resp.status_code != 200:
+                print(f"feed HTTP {resp.status_code}: {url}")
+                return resultado
+            resultado["etag"] = resp.headers.get("ETag")
+            resultado["last_modified"] = resp.headers.get("Last-Modified")
+            partes, tamanho = [], 0
+            for parte in resp.iter_content(64 * 1024):
+                partes.append(parte); tamanho += len(parte)
+                if time.monotonic() > prazo or tamanho > FEED_MAX_BYTES:
+                    print(f"feed abortado (prazo/tamanho): {url}")
+                    resultado["status"] = None
+                    return resultado
+        conteudo = b"".join(partes)
+        if not conteudo:
+            print(f"feed vazio: {url}")
+            return resultado
+        # Servidores sem ETag/Last-Modified: o hash do corpo evita re-parsing de conteúdo igual
+        resultado["hash"] = hashlib.sha256(conteudo).hexdigest()
+        if resultado["hash"] == hash_anterior:
+            resultado["status"] = 304
+            return resultado
+        parsed = feedparser.parse(conteudo)
+        resultado["entries"] = getattr(parsed, "entries", []) or []
+        return resultado
+    except Exception as e:
+        print(f"feed erro {url}: {e}")
+        resultado["status"] = None
+        return resultado
+    finally:
+        metricas.FEED_SEGUNDOS.labels(url).observe(time.monotonic() - inicio)
+        metricas.FEED_RESPOSTAS.labels(url, str(resultado["status"] or "erro")).inc()
+        metricas.FEED_BYTES.labels(url).inc(tamanho)
+
+def buscar_feeds(pedidos):
+    """Busca os feeds em paralelo. `pedidos` é {url: kwargs de _parse_feed}; devolve {url: resultado}.
+
+    Os que excedem o orçamento do ciclo ficam com status None.
+    """
+    resultados = {url: {"status": None, "entries": []} for url in pedidos}
+    if not pedidos:
+        return resultados
+    executor = ThreadPoolExecutor(max_workers=min(FEEDS_MAX_WORKERS, len(pedidos)), thread_name_prefix="feeds")
+    futuros = {executor.submit(_parse_feed, url, **kwargs): url for url, kwargs in pedidos.items()}
+    feitos, pendentes = wait(futuros, timeout=CICLO_ORCAMENTO)
+    for f in feitos:
+        resultados[futuros[f]] = f.result()
+    for f in pendentes:
+        print(f"feed fora do orçamento do ciclo: {futuros[f]}")
+    # Não fica à espera dos atrasados; terminam sozinhos pelo timeout do socket
+    executor.shutdown(wait=False, cancel_futures=True)
+    return resultados
+
+def _inferir_defaults_por_url(url: str):
+    u = url.lower()
+    if "expressoemprego" in u or "huork" in u: return "Emprego (RSS)", "emprego"
+    if "euraxess" in u: return "Investigação (RSS)", "emprego"
+    if "fct.pt" in u: return "Bolsas/Notícias (RSS)", "bolsa"
+    return "Emprego/Notícias (RSS)", "emprego"
+
+SEMENTE_EXTERNAS = [
+    {"titulo":"Estágio Júnior em Dados — Externo",
+     "descricao":"Programa de estágio remoto 6 meses.",
+     "link":"https://exemplo-empregos.pt/estagio-dados","categoria":"Emprego (RSS)","tipo":"emprego"}
+]
+
+def garantir_fontes():
+    if FonteFeed.query.first():
+        return
+    for url in FEEDS_PADRAO:
+        categoria, tipo = _inferir_defaults_por_url(url)
+        db.session.add(FonteFeed(url=url, categoria=categoria, tipo=tipo))
+    db.session.commit()
+
+def _atualizar_estado_fonte(fonte, res, agora):
+    fonte.ultima_recolha = agora
+    fonte.ultimo_status = res["status"]
+    base = timedelta(minutes=fonte.intervalo_min or 30)
+    if res["status"] is None or res["status"] >= 400:
+        fonte.erros_seguidos = (fonte.erros_seguidos or 0) + 1
+        espera = min(base * 2 ** min(fonte.erros_seguidos, 8), BACKOFF_MAX_ERROS)
+    elif res["status"] == 304:
+        fonte.erros_seguidos = 0
+        fonte.sem_alteracoes = (fonte.sem_alteracoes or 0) + 1
+        espera = min(base * 2 ** min(fonte.sem_alteracoes - 1, 8), BACKOFF_MAX_SEM_ALTERACOES)
+    else:
+        fonte.erros_seguidos = 0
+        fonte.sem_alteracoes = 0
+        fonte.ultimo_total = len(res["entries"])
+        espera = base
+    if res["status"] in (200, 304):
+        fonte.etag = (res.get("etag") or "")[:500] or None
+        fonte.last_modified = (res.get("last_modified") or "")[:100] or None
+        fonte.hash_conteudo = res.get("hash")
+    fonte.proxima_recolha = agora + espera
+
+LOTE_LINKS = 500  # tamanho dos IN (...) para não passar o limite de parâmetros do SQLite
+
+def _candidato(e, categoria, tipo):
+    titulo = strip_html(e.get("title") or "")
+    descricao = strip_html(e.get("summary") or e.get("description") or titulo)
+    link = (e.get("link") or "").strip()
+    if not link or not titulo or len(link) > 500:
+        return None
+
+    # Tentar buscar imagem
+    imagem = None
+    if "media_content" in e and e.media_content:
+        imagem = e.media_content[0].get("url")
+    elif "enclosures" in e and e.enclosures:
+        imagem = e.enclosures[0].get("href")
+
+    return dict(
+        titulo=titulo[:200],
+        descricao=(descricao or titulo)[:2000],
+        categoria=categoria,
+        tipo=tipo,
+        externa=True,
+        link_externo=link,
+        imagem_externa=(imagem or None) and imagem[:500],  # guarda se houver
+    )
+
+def _existentes(links):
+    """{link: (id, titulo, descricao)} numa query por lote, em vez de uma por entrada."""
+    links, existentes = list(links), {}
+    for i in range(0, len(links), LOTE_LINKS):
+        linhas = (db.session.query(Vaga.id, Vaga.link_externo, Vaga.titulo, Vaga.descricao)
+                  .filter(Vaga.link_externo.in_(links[i:i + LOTE_LINKS])).all())
+        existentes.update({l.link_externo: (l.id, l.titulo, l.descricao) for l in linhas})
+    return existentes
+
+def gravar_vagas_externas(candidatos, atualizar=True, origem=None):
+    """Upsert em lote: insere os links novos e (opcionalmente) atualiza título/descrição alterados.
+
+    `candidatos` é {link_externo: dict de colunas}; `origem` ({link: url do feed}) só serve as métricas.
+    Devolve (inseridas, atualizadas).
+    """
+    if not candidatos:
+        return 0, 0
+    for tentativa in range(2):
+        existentes = _existentes(candidatos)
+        novas = [c for link, c in candidatos.items() if link not in existentes]
+        alteradas = []
+        if atualizar:
+            for link, (vaga_id, titulo, descricao) in existentes.items():
+                c = candidatos[link]
+                if (c["titulo"], c["descricao"]) != (titulo, descricao):
+                    alteradas.append({"id": vaga_id, "titulo": c["titulo"], "descricao": c["descricao"]})
+        try:
+            if novas:
+                db.session.execute(insert(Vaga), novas)
+                registar_estatisticas({("vagas", "externa"): len(novas)})
+            if alteradas:
+                db.session.execute(update(Vaga), alteradas)
+            if novas or alteradas:
+                incrementar_versao(VERSAO_VAGAS)
+            db.session.commit()
+            por_fonte = Counter((origem or {}).get(c["link_externo"]) for c in novas)
+            for fonte, n in por_fonte.items():
+                if fonte:
+                    metricas.FEED_INSERCOES.labels(fonte).inc(n)
+            return len(novas), len(alteradas)
+        except IntegrityError:
+            # Outro processo inseriu os mesmos links entretanto: volta a calcular o que falta
+            db.session.rollback()
+            if tentativa:
+                raise
+    return 0, 0
+
+def importar_vagas_externas(atualizar=True):
+    total_entradas, nao_modificados = 0, 0
+    candidatos, origem = {}, {}
+    garantir_fontes()
+    agora = datetime.utcnow()
+    limite = agora + timedelta(minutes=1)  # folga para o desvio entre execuções do scheduler
+    fontes = (FonteFeed.query.filter(FonteFeed.ativo == True)
+              .filter((FonteFeed.proxima_recolha == None) | (FonteFeed.proxima_recolha <= limite)).all())
+    # Fase de rede (threads, sem BD) e depois fase de escrita na thread que tem o app context
+    por_feed = buscar_feeds({f.url: {"etag": f.etag, "last_modified": f.last_modified,
+                                     "hash_anterior": f.hash_conteudo} for f in fontes})
+    for fonte in fontes:
+        res = por_feed[fonte.url]
+        _atualizar_estado_fonte(fonte, res, agora)
+        if res["status"] == 304:
+            nao_modificados += 1
+        categoria_def, tipo_def = _inferir_defaults_por_url(fonte.url)
+        categoria_def, tipo_def = fonte.categoria or categoria_def, fonte.tipo or tipo_def
+        entries = res["entries"]; total_entradas += len(entries)
+        metricas.FEED_ENTRADAS.labels(fonte.url).inc(len(entries))
+        for e in entries:
+            c = _candidato(e, categoria_def, tipo_def)
+            if c:
+                candidatos.setdefault(c["link_externo"], c)  # o primeiro feed a trazer o link ganha
+                origem.setdefault(c["link_externo"], fonte.url)
+    db.session.commit()  # estado das fontes fica gravado mesmo que a escrita das vagas falhe
+
+    if total_entradas == 0 and nao_modificados == 0 and fontes:
+        for it in SEMENTE_EXTERNAS:
+            candidatos.setdefault(it["link"], dict(
+                titulo=it["titulo"][:200], descricao=it["descricao"][:2000],
+                categoria=it["categoria"], tipo=it["tipo"],
+                externa=True, link_externo=it["link"],
+                imagem_externa=None
+            ))
+    insercoes, _ = gravar_vagas_externas(candidatos, atualizar=atualizar, origem=origem)
+    return insercoes
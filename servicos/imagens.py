@@ -0,0 +1,106 @@
+import io
+import os
+import tempfile
+
+from servicos.armazenamento import TIPOS_IMAGEM, armazenamento, e_chave
+
+# ===== Variantes de imagem =====
+# Logotipos e fotos de publicações ganham versões redimensionadas (WebP e JPEG, sem EXIF) ao lado
+# do original: "<sha256>.w320.webp". São geradas no upload e, para imagens antigas, no primeiro pedido.
+# Sem o Pillow instalado tudo continua a funcionar com o original.
+
+LARGURAS = (160, 320, 640, 1280)
+FORMATOS = {"webp": "WEBP", "jpg": "JPEG"}
+QUALIDADE = 80
+# Formato detetado no conteúdo -> extensão com que o upload é guardado
+FORMATOS_ACEITES = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp", "GIF": "gif"}
+ASSINATURAS = {b"\x89PNG\r\n\x1a\n": "PNG", b"\xff\xd8\xff": "JPEG", b"GIF87a": "GIF", b"GIF89a": "GIF"}
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+def disponivel() -> bool:
+    return Image is not None
+
+
+def extensao_imagem(ficheiro):
+    """Extensão ("png", "jpg", ...) se o upload for mesmo PNG/JPEG/WebP/GIF, senão None.
+
+    Exige as duas coisas: extensão da lista no nome e conteúdo que o Pillow reconhece nesse formato
+    (sem Pillow, os primeiros bytes). SVG e HTML nunca passam. Deixa o stream no início.
+    """
+    nome = (ficheiro.filename or "").lower()
+    if "." not in nome or nome.rsplit(".", 1)[1] not in TIPOS_IMAGEM:
+        return None
+    stream = ficheiro.stream
+    try:
+        if disponivel():
+            with Image.open(stream) as imagem:
+                formato = imagem.format
+                imagem.verify()
+        else:
+            cabeca = stream.read(12)
+            formato = "WEBP" if cabeca[:4] == b"RIFF" and cabeca[8:12] == b"WEBP" else next(
+                (f for a, f in ASSINATURAS.items() if cabeca.startswith(a)), None)
+    except Exception:
+        formato = None
+    finally:
+        stream.seek(0)
+    return FORMATOS_ACEITES.get(formato)
+
+
+def chave_variante(chave, largura, formato):
+    return f"{chave.split('.', 1)[0]}.w{largura}.{formato}"
+
+
+def variantes(chave):
+    return [chave_variante(chave, l, f) for l in LARGURAS for f in FORMATOS]
+
+
+def _abrir_imagem(chave):
+    with armazenamento.abrir(chave) as f:
+        imagem = Image.open(io.BytesIO(f.read()))
+        imagem.load()
+    return ImageOps.exif_transpose(imagem)  # aplica a rotação antes de deitar o EXIF fora
+
+
+def _gravar(imagem, chave, formato):
+    fd, temporario = tempfile.mkstemp(dir=armazenamento.pasta_tmp)
+    with os.fdopen(fd, "wb") as destino:
+        if formato == "jpg" and imagem.mode != "RGB":
+            fundo = Image.new("RGB", imagem.size, (255, 255, 255))  # logos com transparência
+            fundo.paste(imagem, mask=imagem.getchannel("A") if "A" in imagem.getbands() else None)
+            imagem = fundo
+        # Sem exif=/icc_profile=: o Pillow não copia metadados para o ficheiro novo
+        imagem.save(destino, FORMATOS[formato], quality=QUALIDADE, optimize=formato == "jpg")
+    armazenamento.backend.guardar(chave, temporario)
+
+
+def gerar_variantes(chave):
+    """Gera todas as variantes de uma imagem; devolve False se não for imagem (ou sem Pillow)."""
+    if not disponivel() or not e_chave(chave):
+        return False
+    try:
+        original = _abrir_imagem(chave)
+    except Exception as e:
+        print(f"imagens: {chave} não é uma imagem válida: {e}")
+        return False
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA" if "transparency" in original.info else "RGB")
+    for largura in LARGURAS:
+        imagem = original.copy()
+        imagem.thumbnail((largura, largura * 4))  # nunca aumenta
+        for formato in FORMATOS:
+            _gravar(imagem, chave_variante(chave, largura, formato), formato)
+    return True
+
+
+def obter_variante(chave, largura, formato):
+    """Chave da variante (gerando-a se ainda não existir) ou None se só houver o original."""
+    variante = chave_variante(chave, largura, formato)
+    if armazenamento.backend.existe(variante) or (gerar_variantes(chave) and armazenamento.backend.existe(variante)):
+        return variante
+    return None
@@ -0,0 +1,117 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+from modelos.modelos import db
+
+# ===== Instrumentação SQL por pedido =====
+# Opt-in (PERFIL_SQL=1): conta e cronometra as queries de cada pedido através dos eventos do engine,
+# avisa quando a mesma forma de query se repete (lazy-load por linha, o típico N+1) e regista as
+# queries lentas. Cada resposta leva Server-Timing com db (execução no driver, sem o fetch), tpl
+# (render_template) e total, visível no separador Network/Timing do browser.
+# contar_queries()/verificar_max_queries() limitam o número de queries de uma rota, com ou sem PERFIL_SQL.
+
+_IN_LISTA = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|%s)\s*,)+\s*(?:\?|%\(\w+\)s|%s)\s*\)")
+_ESPACOS = re.compile(r"\s+")
+
+
+def forma(instrucao):
+    """SQL sem espaços repetidos e com listas IN (?, ?, ...) colapsadas: a mesma query com outros valores."""
+    return _IN_LISTA.sub("(…)", _ESPACOS.sub(" ", instrucao).strip())
+
+
+class InstrumentacaoSQL:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get("PERFIL_SQL"):
+            return
+        self.lenta_ms = app.config.get("SQL_LENTA_MS", 100)
+        self.limiar_n1 = app.config.get("SQL_N1_LIMIAR", 5)
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._antes_query)
+            event.listen(db.engine, "after_cursor_execute", self._depois_query)
+        before_render_template.connect(self._antes_template, app)
+        template_rendered.connect(self._depois_template, app)
+        app.before_request(self._inicio)
+        app.after_request(self._fim)
+
+    # --- pedido ---
+    def _inicio(self):
+        g.perfil_sql = {"inicio": time.perf_counter(), "n": 0, "db": 0.0, "tpl": 0.0, "formas": Counter(),
+                        "templates": []}
+
+    def _fim(self, resp):
+        p = g.pop("perfil_sql", None)
+        if p is None:
+            return resp
+        total = (time.perf_counter() - p["inicio"]) * 1000
+        resp.headers.add("Server-Timing", f'db;dur={p["db"]:.1f};desc="{p["n"]} queries"')
+        resp.headers.add("Server-Timing", f'tpl;dur={p["tpl"]:.1f}')
+        resp.headers.add("Server-Timing", f"total;dur={total:.1f}")
+        for instrucao, vezes in p["formas"].most_common():
+            if vezes < self.limiar_n1:
+                break
+            print(f"sql: possível N+1 em {request.method} {request.path}: {vezes}x {instrucao[:300]}")
+        return resp
+
+    # --- engine ---
+    def _antes_query(self, conn, cursor, instrucao, parametros, contexto, executemany):
+        conn.info.setdefault("perfil_inicio", []).append(time.perf_counter())
+
+    def _depois_query(self, conn, cursor, instrucao, parametros, contexto, executemany):
+        ms = (time.perf_counter() - conn.info["perfil_inicio"].pop()) * 1000
+        onde = "fora de pedido"
+        if has_request_context() and "perfil_sql" in g:
+            p = g.perfil_sql
+            p["n"] += 1
+            p["db"] += ms
+            p["formas"][forma(instrucao)] += 1
+            onde = f"{request.method} {request.path}"
+        if ms >= self.lenta_ms:
+            print(f"sql: lenta {ms:.0f}ms {onde}: {forma(instrucao)[:500]} {str(parametros)[:200]}")
+
+    # --- templates (o tempo de queries lançadas pelo template conta nos dois) ---
+    def _antes_template(self, app, template, context, **extra):
+        if "perfil_sql" in g:
+            g.perfil_sql["templates"].append(time.perf_counter())
+
+    def _depois_template(self, app, template, context, **extra):
+        if "perfil_sql" in g and g.perfil_sql["templates"]:
+            inicio = g.perfil_sql["templates"].pop()
+            if not g.perfil_sql["templates"]:  # só o render de topo, sem contar duas vezes os aninhados
+                g.perfil_sql["tpl"] += (time.perf_counter() - inicio) * 1000
+
+
+@contextmanager
+def contar_queries(engine=None):
+    """Recolhe as instruções SQL executadas dentro do bloco (precisa de app context se engine=None)."""
+    engine = engine or db.engine
+    instrucoes = []
+
+    def antes(conn, cursor, instrucao, *args):
+        instrucoes.append(instrucao)
+    event.listen(engine, "before_cursor_execute", antes)
+    try:
+        yield instrucoes
+    finally:
+        event.remove(engine, "before_cursor_execute", antes)
+
+
+def verificar_max_queries(cliente, url, maximo):
+    """GET url com o test client; AssertionError (com as formas mais repetidas) se passar de `maximo` queries."""
+    with cliente.application.app_context():
+        engine = db.engine
+    with contar_queries(engine) as instrucoes:
+        resp = cliente.get(url)
+    if len(instrucoes) > maximo:
+        repetidas = Counter(forma(i) for i in instrucoes).most_common(3)
+        raise AssertionError(f"{url}: {len(instrucoes)} queries (máximo {maximo})\n"
+                             + "\n".join(f"  {n}x {i[:200]}" for i, n in repetidas))
+    return resp
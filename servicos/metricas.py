@@ -0,0 +1,125 @@
+import hmac
+import ipaddress
+import os
+from datetime import datetime
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+
+# ===== Métricas Prometheus =====
+# Contadores/histogramas atualizados onde as coisas acontecem (pedidos, feeds, tarefas, uploads, e-mail)
+# e expostos em /metrics. Com vários workers gunicorn, PROMETHEUS_MULTIPROC_DIR aponta para uma pasta
+# partilhada onde cada processo escreve os seus valores; o /metrics de qualquer worker agrega-os todos
+# (ver gunicorn.conf.py, que limpa a pasta no arranque e marca os workers que morrem).
+# O que vive na BD (último sucesso das tarefas, fila de e-mail, bytes guardados) é lido no scrape.
+
+MULTIPROCESSO = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+BUCKETS_PEDIDO = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+PEDIDO_SEGUNDOS = Histogram("adluc_pedido_segundos", "Duração dos pedidos HTTP", ["endpoint", "metodo"],
+                            buckets=BUCKETS_PEDIDO)
+PEDIDOS = Counter("adluc_pedidos", "Pedidos HTTP por código de estado", ["endpoint", "metodo", "estado"])
+POOL = Gauge("adluc_bd_pool_ligacoes", "Ligações do pool SQLAlchemy (soma dos processos vivos)", ["estado"],
+             multiprocess_mode="livesum")
+
+FEED_SEGUNDOS = Histogram("adluc_feed_recolha_segundos", "Duração do GET de cada feed", ["fonte"],
+                          buckets=(.1, .25, .5, 1, 2.5, 5, 10, 20, 30))
+FEED_RESPOSTAS = Counter("adluc_feed_respostas", "Recolhas por resultado (200, 304, erro, ...)", ["fonte", "estado"])
+FEED_BYTES = Counter("adluc_feed_bytes", "Bytes descarregados", ["fonte"])
+FEED_ENTRADAS = Counter("adluc_feed_entradas", "Entradas lidas do feed", ["fonte"])
+FEED_INSERCOES = Counter("adluc_feed_insercoes", "Vagas novas inseridas a partir do feed", ["fonte"])
+
+TAREFA_SEGUNDOS = Histogram("adluc_tarefa_segundos", "Duração de cada execução de tarefa do agendador", ["tarefa"],
+                            buckets=(.1, .5, 1, 5, 10, 30, 60, 120, 300, 600))
+TAREFA_EXECUCOES = Counter("adluc_tarefa_execucoes", "Execuções por resultado (ok, erro)", ["tarefa", "resultado"])
+TAREFA_PERDIDAS = Counter("adluc_tarefa_perdidas", "Execuções que o APScheduler saltou (atraso ou ainda a correr)",
+                          ["tarefa"])
+
+UPLOAD_BYTES = Counter("adluc_upload_bytes", "Bytes recebidos em uploads (novo=0: conteúdo já existente)", ["novo"])
+EMAILS_ENVIADOS = Counter("adluc_emails", "E-mails da caixa de saída enviados/falhados (num resumo conta cada um)",
+                          ["resultado"])
+
+
+def registar_pedido(endpoint, metodo, estado, segundos):
+    endpoint = endpoint or "sem_rota"  # 404: não multiplica as séries pelo URL pedido
+    PEDIDO_SEGUNDOS.labels(endpoint, metodo).observe(segundos)
+    PEDIDOS.labels(endpoint, metodo, str(estado)).inc()
+
+
+def atualizar_pool(engine, a_devolver=0):
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return  # StaticPool/NullPool (SQLite em memória, testes)
+    POOL.labels("em_uso").set(pool.checkedout() - a_devolver)
+    POOL.labels("livres").set(pool.checkedin() + a_devolver)
+    POOL.labels("overflow").set(max(pool.overflow(), 0))
+    POOL.labels("capacidade").set(pool.size())
+
+
+def instalar_pool(engine):
+    """Gauges do pool atualizados a cada checkout/checkin (no checkin a ligação ainda não voltou ao pool)."""
+    event.listen(engine, "checkout", lambda *args: atualizar_pool(engine))
+    event.listen(engine, "checkin", lambda *args: atualizar_pool(engine, a_devolver=1))
+
+
+def acesso_permitido(autorizacao, ip, token, redes):
+    """Token Bearer certo, ou IP dentro de `redes` ("127.0.0.1,10.0.0.0/8").
+
+    Atrás de um proxy o remote_addr é o do proxy: aí usar o token ou bloquear /metrics no próprio proxy.
+    """
+    if token and hmac.compare_digest(autorizacao.encode(), f"Bearer {token}".encode()):
+        return True
+    try:
+        endereco = ipaddress.ip_address(ip or "")
+    except ValueError:
+        return False
+    return any(endereco in ipaddress.ip_network(r.strip(), strict=False) for r in redes.split(",") if r.strip())
+
+
+class ColetorBD:
+    """Valores lidos da BD no momento do scrape (iguais em todos os processos, por isso fora da pasta)."""
+
+    def __init__(self, intervalos):
+        self.intervalos = intervalos  # {tarefa: timedelta}, para saber se está atrasada
+
+    def collect(self):
+        from modelos.modelos import db, EstadoTarefa, EmailPendente, Blob
+        agora = datetime.utcnow()
+        sucesso = GaugeMetricFamily("adluc_tarefa_ultimo_sucesso_timestamp_segundos",
+                                    "Fim da última execução bem-sucedida (epoch)", labels=["tarefa"])
+        atrasada = GaugeMetricFamily("adluc_tarefa_atrasada",
+                                     "1 se a tarefa não tem sucesso há mais de 2 intervalos", labels=["tarefa"])
+        estados = {e.nome: e for e in EstadoTarefa.query}
+        for nome, intervalo in self.intervalos.items():
+            ultimo = estados[nome].ultimo_sucesso if nome in estados else None
+            if ultimo:
+                sucesso.add_metric([nome], (ultimo - datetime(1970, 1, 1)).total_seconds())
+            atrasada.add_metric([nome], float(ultimo is None or agora - ultimo > 2 * intervalo))
+        yield sucesso
+        yield atrasada
+
+        fila = GaugeMetricFamily("adluc_email_fila", "E-mails na caixa de saída por estado", labels=["estado"])
+        por_estado = dict(db.session.query(EmailPendente.estado, db.func.count()).group_by(EmailPendente.estado).all())
+        for estado in ("pendente", "enviado", "falhado"):
+            fila.add_metric([estado], por_estado.get(estado, 0))
+        yield fila
+
+        n, total = db.session.query(db.func.count(), db.func.coalesce(db.func.sum(Blob.tamanho), 0)) \
+            .filter(Blob.referencias > 0).one()
+        yield GaugeMetricFamily("adluc_uploads_guardados_bytes", "Bytes em blobs com referências", value=total)
+        yield GaugeMetricFamily("adluc_uploads_guardados", "Blobs com referências", value=n)
+        db.session.rollback()
+
+
+def exposicao(intervalos):
+    """(corpo, content-type) do /metrics: métricas dos processos + as da BD."""
+    if MULTIPROCESSO:
+        processos = CollectorRegistry()
+        multiprocess.MultiProcessCollector(processos)
+    else:
+        processos = REGISTRY
+    bd = CollectorRegistry(auto_describe=False)
+    bd.register(ColetorBD(intervalos))
+    return generate_latest(processos) + generate_latest(bd), CONTENT_TYPE_LATEST
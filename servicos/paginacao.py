@@ -0,0 +1,84 @@
+import base64
+import json
+
+from sqlalchemy import and_, or_
+
+from modelos.modelos import Vaga
+
+# ===== Paginação por cursor (keyset) =====
+# Em vez de OFFSET (cada página mais funda custa mais), a página seguinte começa depois da última
+# vaga vista: WHERE id < :ultimo ORDER BY id DESC. Com pesquisa de texto a chave é (rank, id).
+
+
+def codificar_cursor(vaga_id: int, rank=None, direcao: str = "n") -> str:
+    dados = {"id": vaga_id, "d": direcao}
+    if rank is not None:
+        dados["r"] = float(rank)
+    return base64.urlsafe_b64encode(json.dumps(dados, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def descodificar_cursor(cursor: str):
+    """Devolve {"id", "r", "d"} ou None se o cursor for inválido (volta-se à primeira página)."""
+    if not cursor:
+        return None
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        cur = {"id": int(dados["id"]), "r": dados.get("r"), "d": dados.get("d", "n")}
+        if cur["r"] is not None:
+            cur["r"] = float(cur["r"])
+        return cur if cur["d"] in ("n", "p") else None
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def consulta_keyset(query, rank, cur, limite: int, chave=Vaga.id):
+    """A query de uma página: filtro do cursor já descodificado, ORDER BY e LIMIT limite + 1.
+
+    Separada de pagina_keyset para servicos/planos.py poder fazer EXPLAIN da mesma query.
+    """
+    para_tras = bool(cur) and cur["d"] == "p"
+    if rank is not None:
+        query = query.add_columns(rank.label("rank"))
+    if cur:
+        if rank is None:
+            query = query.filter(chave > cur["id"] if para_tras else chave < cur["id"])
+        elif para_tras:
+            query = query.filter(or_(rank < cur["r"], and_(rank == cur["r"], chave > cur["id"])))
+        else:
+            query = query.filter(or_(rank > cur["r"], and_(rank == cur["r"], chave < cur["id"])))
+
+    if para_tras:
+        ordem = ([rank.desc()] if rank is not None else []) + [chave.asc()]
+    else:
+        ordem = ([rank.asc()] if rank is not None else []) + [chave.desc()]
+    return query.order_by(*ordem).limit(limite + 1)
+
+
+def pagina_keyset(query, rank, cursor: str, limite: int, chave=Vaga.id):
+    """Devolve (vagas, cursor_seguinte, cursor_anterior) para uma query de vagas ainda sem ORDER BY.
+
+    Ordem: relevância (rank crescente) e depois id decrescente; sem rank, só id decrescente.
+    A query pode ser de objetos Vaga ou de colunas (com Vaga.id entre elas); `chave` pagina
+    outra entidade pelo seu id (ex.: Candidatura.id).
+    """
+    entidade = len(query.column_descriptions) == 1
+    cur = descodificar_cursor(cursor)
+    if cur and (cur["r"] is None) != (rank is None):
+        cur = None  # cursor de outra pesquisa
+    para_tras = bool(cur) and cur["d"] == "p"
+    linhas = consulta_keyset(query, rank, cur, limite, chave).all()
+
+    tem_mais = len(linhas) > limite
+    linhas = linhas[:limite]
+    if para_tras:
+        linhas.reverse()
+    if rank is not None:
+        vagas, ranks = [l[0] if entidade else l for l in linhas], [l.rank for l in linhas]
+    else:
+        vagas, ranks = linhas, [None] * len(linhas)
+
+    tem_seguinte = True if para_tras else tem_mais
+    tem_anterior = tem_mais if para_tras else cur is not None
+    seguinte = codificar_cursor(vagas[-1].id, ranks[-1], "n") if vagas and tem_seguinte else None
+    anterior = codificar_cursor(vagas[0].id, ranks[0], "p") if vagas and tem_anterior else None
+    return vagas, seguinte, anterior
@@ -0,0 +1,60 @@
+import re
+
+from sqlalchemy import func, inspect, literal_column, select, table, column, text
+
+from modelos.modelos import db, Vaga
+
+# ===== Pesquisa de texto em vagas =====
+# SQLite: tabela FTS5 vagas_fts; Postgres: coluna tsvector vagas.pesquisa com índice GIN.
+# Ambas criadas pela migração c7e5f13a9d44; sem ela a pesquisa cai no ILIKE antigo.
+
+_PALAVRA = re.compile(r"\w+", re.UNICODE)
+_disponivel = {}
+
+
+def fts_disponivel() -> bool:
+    engine = db.engine
+    chave = str(engine.url)
+    if chave not in _disponivel:
+        insp = inspect(engine)
+        if engine.dialect.name == "sqlite":
+            _disponivel[chave] = "vagas_fts" in insp.get_table_names()
+        elif engine.dialect.name == "postgresql":
+            _disponivel[chave] = "pesquisa" in {c["name"] for c in insp.get_columns("vagas")}
+        else:
+            _disponivel[chave] = False
+    return _disponivel[chave]
+
+
+def termos(q: str):
+    # Só palavras: a sintaxe de FTS5/tsquery nunca vem do utilizador
+    return _PALAVRA.findall(q or "")[:10]
+
+
+def filtrar_por_texto(query, q: str):
+    """Aplica a pesquisa de texto à query de vagas.
+
+    Devolve (query, rank): `rank` é a expressão de relevância (menor = melhor) para ordenar
+    ou para paginar, ou None quando não há termos ou índice (fallback ILIKE).
+    """
+    palavras = termos(q)
+    if not palavras:
+        return query, None
+    if not fts_disponivel():
+        q = q.strip()
+        return query.filter(Vaga.titulo.ilike(f"%{q}%") | Vaga.descricao.ilike(f"%{q}%")), None
+
+    if db.engine.dialect.name == "sqlite":
+        # Cada palavra como prefixo ("engenh"*); espaço = AND. bm25 pesa mais o título.
+        expr = " ".join(f'"{p}"*' for p in palavras)
+        fts = table("vagas_fts", column("rowid"))
+        sub = (select(fts.c.rowid.label("vaga_id"),
+                      literal_column("bm25(vagas_fts, 10.0, 1.0)").label("rank"))
+               .where(text("vagas_fts MATCH :fts_expr").bindparams(fts_expr=expr))
+               .subquery("fts"))
+        return query.join(sub, sub.c.vaga_id == Vaga.id), sub.c.rank
+
+    expr = " & ".join(f"{p}:*" for p in palavras)
+    tsquery = func.to_tsquery(literal_column("'pt_unaccent'"), expr)
+    vetor = literal_column("vagas.pesquisa")
+    return query.filter(vetor.op("@@")(tsquery)), -func.ts_rank(vetor, tsquery)
@@ -0,0 +1,125 @@
+import re
+
+from sqlalchemy import select, union_all
+
+from modelos.modelos import db, Utilizador, Vaga, Candidatura, Favorito, Publicacao, Comentario
+
+# ===== Verificação dos planos de execução =====
+# As queries quentes das rotas (mesma forma, valores de exemplo) passam por EXPLAIN; falha se alguma
+# lê uma tabela inteira ou, quando `sem_ordenacao`, se precisa de ordenar em vez de seguir um índice.
+# Corre com `flask verificar-planos` (código de saída 1 em caso de falha), de preferência numa BD
+# com dados reais: com tabelas quase vazias o planeador pode preferir ler tudo.
+
+# (nome, query, sem_ordenacao); as queries de /api/vagas, facetas e gerir_candidaturas vêm de consultas_rotas()
+CONSULTAS_QUENTES = [
+    ("inicio: últimas vagas internas",
+     lambda: select(Vaga).where(Vaga.externa == False).order_by(Vaga.id.desc()).limit(3), True),
+    ("inicio: últimas vagas externas",
+     lambda: select(Vaga).where(Vaga.externa == True).order_by(Vaga.id.desc()).limit(3), True),
+    ("minhas_vagas",
+     lambda: select(Vaga).where(Vaga.empresa_id == 1).order_by(Vaga.id.desc()), True),
+    ("candidaturas do estudante",
+     lambda: select(Candidatura).where(Candidatura.estudante_id == 1), False),
+    ("candidatura repetida",
+     lambda: select(Candidatura.id).where(Candidatura.estudante_id == 1, Candidatura.vaga_id == 1).limit(1), False),
+    ("favoritos do estudante",
+     lambda: select(Favorito.vaga_id).where(Favorito.estudante_id == 1), False),
+    ("cascata: candidaturas/favoritos da vaga",
+     lambda: union_all(select(Favorito.id).where(Favorito.vaga_id == 1),
+                       select(Candidatura.id).where(Candidatura.vaga_id == 1)), False),
+    ("publicações por tipo",
+     lambda: select(Publicacao).where(Publicacao.tipo == "noticia")
+     .order_by(Publicacao.data_hora.desc()).limit(3), True),
+    ("rodapé: publicações recentes",
+     lambda: select(Publicacao.id, Publicacao.titulo).order_by(Publicacao.data_hora.desc()).limit(3), True),
+    ("comentários da publicação",
+     lambda: select(Comentario).where(Comentario.publicacao_id == 1), False),
+    ("índice de empresas",
+     lambda: select(Utilizador.id, Utilizador.nome_empresa).where(Utilizador.tipo == "empresa"), False),
+    ("acesso a ficheiros",
+     lambda: union_all(select(Candidatura.id).where(Candidatura.ficheiro_cv == "x"),
+                       select(Publicacao.id).where(Publicacao.foto == "x"),
+                       select(Utilizador.id).where(Utilizador.logo_empresa == "x")), False),
+]
+
+# Segunda página de uma listagem por cursor: WHERE id < 1000 ORDER BY id DESC
+CURSOR = {"id": 1000, "r": None, "d": "n"}
+
+
+def consultas_rotas():
+    """Queries montadas pelas mesmas funções que as rotas usam (app.py), com valores de exemplo.
+
+    Assim uma alteração a filtrar_vagas, às facetas ou a gerir_candidaturas é verificada tal como corre.
+    """
+    import app as rotas
+    from servicos.paginacao import consulta_keyset
+
+    def filtros(**valores):
+        return dict({k: "" for k in rotas.FILTROS_VAGAS}, **valores)
+
+    def api_vagas(**valores):
+        query, rank = rotas.query_api_vagas(filtros(**valores))
+        return consulta_keyset(query, rank, CURSOR, 50)
+
+    def caixa(vaga_id=None):
+        return consulta_keyset(rotas.query_caixa_candidaturas(1, vaga_id), None, CURSOR,
+                               rotas.CANDIDATURAS_POR_PAGINA, chave=Candidatura.id)
+
+    consultas = [
+        ("api_vagas: keyset", api_vagas, True),
+        ("api_vagas: cidade (ILIKE) + keyset", lambda: api_vagas(cidade="lisboa"), True),
+        ("api_vagas: empresa (ILIKE) + keyset", lambda: api_vagas(empresa="lda"), True),
+        ("api_vagas: categoria + keyset", lambda: api_vagas(categoria="Tecnologia"), True),
+        ("api_vagas: horário + keyset", lambda: api_vagas(horario="Full-time"), True),
+        ("api_vagas: tipo + keyset", lambda: api_vagas(tipo="estagio"), True),
+        ("api_vagas: natureza + keyset", lambda: api_vagas(natureza="interna"), True),
+        ("gerir_candidaturas: vagas com nº de candidaturas", lambda: rotas.query_vagas_com_candidaturas(1), True),
+        ("gerir_candidaturas: caixa + keyset", caixa, True),
+        ("gerir_candidaturas: por vaga + keyset", lambda: caixa(1), True),
+    ]
+    for nome, query in rotas.queries_facetas(filtros(categoria="Tecnologia")):
+        consultas.append((f"facetas: {nome}", lambda query=query: query, False))
+    return consultas
+
+
+# Tabelas pequenas por natureza: podem ser lidas inteiras
+TABELAS_PEQUENAS = {"versoes_cache", "estado_tarefas", "lideranca", "fontes_feed", "estatisticas_totais"}
+
+
+def explicar(conexao, stmt):
+    """Linhas do plano (EXPLAIN QUERY PLAN no SQLite, EXPLAIN no Postgres); aceita select() ou Query."""
+    compilado = getattr(stmt, "statement", stmt).compile(dialect=conexao.dialect)
+    if compilado.positional:
+        params = tuple(compilado.params[k] for k in compilado.positiontup)
+    else:
+        params = compilado.params
+    if conexao.dialect.name == "sqlite":
+        return [linha[-1] for linha in conexao.exec_driver_sql(f"EXPLAIN QUERY PLAN {compilado}", params)]
+    return [linha[0] for linha in conexao.exec_driver_sql(f"EXPLAIN {compilado}", params)]
+
+
+def problemas(plano, sem_ordenacao):
+    encontrados = []
+    for linha in plano:
+        # SQLite: "SCAN vagas" (sem USING INDEX); Postgres: "Seq Scan on vagas"
+        m = re.search(r"^\s*SCAN (\w+)(?!.*USING)", linha) or re.search(r"Seq Scan on (\w+)", linha)
+        if m and m.group(1) not in TABELAS_PEQUENAS:
+            encontrados.append(f"tabela inteira: {m.group(1)}")
+        if sem_ordenacao and ("USE TEMP B-TREE FOR ORDER BY" in linha or re.search(r"^\s*(->\s*)?Sort\b", linha)):
+            encontrados.append("ordenação sem índice")
+    return encontrados
+
+
+def verificar():
+    """[(nome, [problemas], plano)] para CONSULTAS_QUENTES e consultas_rotas(); chamar com app context."""
+    resultados = []
+    with db.engine.connect() as conexao:
+        if conexao.dialect.name == "postgresql":
+            # Em tabelas pequenas o Postgres prefere Seq Scan mesmo com índice; assim só o usa se não houver
+            conexao.exec_driver_sql("SET enable_seqscan = off")
+            conexao.exec_driver_sql("SET enable_sort = off")
+        for nome, consulta, sem_ordenacao in CONSULTAS_QUENTES + consultas_rotas():
+            plano = explicar(conexao, consulta())
+            resultados.append((nome, problemas(plano, sem_ordenacao), plano))
+        conexao.rollback()
+    return resultados
@@ -0,0 +1,30 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Antes de qualquer import de app: BD e uploads próprios da sessão de testes, sem agendador
+PASTA = tempfile.mkdtemp(prefix="adluc-testes-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{PASTA}/testes.db")
+os.environ.setdefault("UPLOAD_FOLDER", os.path.join(PASTA, "uploads"))
+os.environ["AGENDADOR_NA_WEB"] = "0"
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app, db
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def cliente_admin(app):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao["tipo"] = "admin"
+    return cliente
@@ -0,0 +1,95 @@
+import pickle
+
+from servicos.cache import BackendMemoria, BackendRedis, Etiquetas
+
+
+class RedisFalso:
+    """O suficiente do cliente redis: valores em bytes, INCR guarda o inteiro em texto."""
+
+    def __init__(self):
+        self.dados = {}
+
+    def get(self, chave):
+        return self.dados.get(chave)
+
+    def set(self, chave, valor, ex=None):
+        self.dados[chave] = valor
+
+    def delete(self, chave):
+        self.dados.pop(chave, None)
+
+    def incr(self, chave):
+        self.dados[chave] = str(int(self.dados.get(chave, b"0")) + 1).encode()
+        return int(self.dados[chave])
+
+
+def test_invalidar_e_depois_chave():
+    etiquetas = Etiquetas(BackendRedis(RedisFalso()))
+    assert etiquetas.chave("pagina:/", ["vagas", "publicacoes"]) == "pagina:/@0.0"
+    etiquetas.invalidar("vagas")
+    etiquetas.invalidar("vagas", "publicacoes")
+    assert etiquetas.chave("pagina:/", ["vagas", "publicacoes"]) == "pagina:/@2.1"
+
+
+def test_entrada_ilegivel_conta_como_falha():
+    cliente = RedisFalso()
+    backend = BackendRedis(cliente)
+    cliente.dados["adluc:x"] = b"lixo"
+    assert backend.obter("x", "omissao") == "omissao"
+    backend.guardar("x", {"a": 1})
+    assert pickle.loads(cliente.dados["adluc:x"]) == {"a": 1}
+    assert backend.obter("x") == {"a": 1}
+
+
+def test_contadores_sobrevivem_a_limpeza_por_tamanho():
+    backend = BackendMemoria(ttl=60, maximo=10)
+    backend.incrementar("etiqueta:vagas")
+    for i in range(50):
+        backend.guardar(f"lixo:{i}", i)
+    assert backend.contador("etiqueta:vagas") == 1
+
+
+def test_purga_noutro_processo_com_memoria(app):
+    """memory://: cada processo tem o seu backend, mas as versões das etiquetas vêm de versoes_cache."""
+    with app.app_context():
+        web, agendador = Etiquetas(BackendMemoria(ttl=60)), Etiquetas(BackendMemoria(ttl=60))
+        antes = web.chave("pagina:/", ["inicio", "vagas"])
+        agendador.invalidar("inicio", "vagas")
+        web._lidas_em = None  # como se tivessem passado INTERVALO_ETIQUETAS segundos
+        depois = web.chave("pagina:/", ["inicio", "vagas"])
+        assert depois != antes
+        assert agendador.chave("pagina:/", ["inicio", "vagas"]) == depois
+
+
+def test_favoritos_vistos_por_outro_worker(app):
+    """Dois processos com memory:// (caches separadas): o favorito feito num vale logo no outro."""
+    import app as rotas
+    from app import db
+    from modelos.modelos import Favorito, Utilizador, Vaga
+    from servicos.cache import BackendMemoria
+    with app.app_context():
+        estudante = Utilizador(nome="Estudante", email="favs@adluc.pt", senha_hash="x", tipo="estudante")
+        vagas = [Vaga(titulo="Vaga", descricao="Favorita"), Vaga(titulo="Vaga", descricao="Por fora")]
+        db.session.add_all([estudante, *vagas])
+        db.session.commit()
+        uid, vaga_id, por_fora = estudante.id, vagas[0].id, vagas[1].id
+    original, outro_worker = rotas.cache, BackendMemoria(ttl=300)
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao.update(tipo="estudante", utilizador_id=uid, nome="Estudante")
+    try:
+        rotas.cache = outro_worker
+        assert cliente.get("/api/favoritos").get_json()["ids"] == []
+        with app.app_context():  # escrita sem subir a versão: este "worker" continua a servir a cache
+            db.session.add(Favorito(estudante_id=uid, vaga_id=por_fora))
+            db.session.commit()
+        assert cliente.get("/api/favoritos").get_json()["ids"] == []
+        rotas.cache = original
+        assert cliente.post(f"/favoritar/{vaga_id}", headers={"Accept": "application/json"}).status_code == 200
+        rotas.cache = outro_worker
+        assert sorted(cliente.get("/api/favoritos").get_json()["ids"]) == sorted([vaga_id, por_fora])
+    finally:
+        rotas.cache = original
+        with app.app_context():
+            Favorito.query.filter_by(estudante_id=uid).delete()
+            db.session.commit()
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import inspect, text
+
+from modelos.modelos import Utilizador, Vaga
+
+TABELAS = ("utilizadores", "vagas", "candidaturas", "favoritos")
+
+
+@pytest.fixture(scope="module")
+def sem_criado_em(app):
+    """BD como antes da migração a6c3e8d15b27: sem criado_em nas quatro tabelas (reposto no fim)."""
+    from app import db
+    with app.app_context():
+        empresa = Utilizador(nome="Empresa", email="antiga@adluc.pt", senha_hash="x", tipo="empresa",
+                             nome_empresa="Antiga Lda")
+        db.session.add(empresa)
+        db.session.flush()
+        db.session.add(Vaga(titulo="Vaga antiga", descricao="Antes da migração", cidade="Lisboa", empresa_id=empresa.id))
+        db.session.commit()
+        with db.engine.begin() as conexao:
+            for tabela in TABELAS:
+                conexao.execute(text(f"ALTER TABLE {tabela} DROP COLUMN criado_em"))
+    yield
+    with app.app_context():
+        with db.engine.begin() as conexao:
+            for tabela in TABELAS:
+                if "criado_em" not in {c["name"] for c in inspect(conexao).get_columns(tabela)}:
+                    conexao.execute(text(f"ALTER TABLE {tabela} ADD COLUMN criado_em DATETIME"))
+
+
+def test_total_de_vagas_sem_criado_em(app, sem_criado_em):
+    resposta = app.test_client().get("/api/vagas?total=1&cidade=lisboa")
+    assert resposta.status_code == 200
+    assert resposta.get_json()["total"] >= 1
+
+
+def test_exportacao_sem_criado_em_falha_antes_do_200(cliente_admin, sem_criado_em):
+    resposta = cliente_admin.get("/admin/export/vagas")
+    assert resposta.status_code == 503
+    assert "flask db upgrade" in resposta.get_data(as_text=True)
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from modelos.modelos import EstatisticaDiaria, Utilizador, Vaga
+
+
+def _total(metrica, chave):
+    from servicos import estatisticas
+    return estatisticas.totais()[(metrica, chave)]
+
+
+def _hoje(metrica, chave):
+    linha = EstatisticaDiaria.query.filter_by(dia=datetime.utcnow().date(), metrica=metrica, chave=chave).first()
+    return linha.valor if linha else 0
+
+
+def test_mudar_tipo_move_a_contagem(app):
+    from app import db
+    with app.app_context():
+        empresa = Utilizador(nome="Empresa", email="tipos@adluc.pt", senha_hash="x", tipo="empresa")
+        db.session.add(empresa)
+        db.session.flush()
+        vaga = Vaga(titulo="Vaga", descricao="Interna", empresa_id=empresa.id)
+        db.session.add(vaga)
+        db.session.commit()
+        internas, externas = _total("vagas", "interna"), _total("vagas", "externa")
+        hoje_externas = _hoje("vagas", "externa")
+
+        vaga.externa = True  # objeto expirado pelo commit: o valor antigo tem de ser lido na mesma
+        db.session.commit()
+        assert (_total("vagas", "interna"), _total("vagas", "externa")) == (internas - 1, externas + 1)
+        assert _hoje("vagas", "externa") == hoje_externas + 1
+
+        empresas = _total("registos", "empresa")
+        empresa.tipo = "estudante"
+        db.session.commit()
+        assert _total("registos", "empresa") == empresas - 1
+
+
+def test_reconciliar_nao_mexe_na_serie_diaria(app):
+    from app import db
+    from servicos import estatisticas
+    with app.app_context():
+        estatisticas.reconciliar()
+        internas = _total("vagas", "interna")
+        serie = (_hoje("vagas", "interna"), _hoje("vagas", "externa"))
+        db.session.execute(db.text("UPDATE estatisticas_totais SET valor = valor + 7 "
+                                   "WHERE metrica = 'vagas' AND chave = 'interna'"))
+        db.session.commit()
+        assert estatisticas.reconciliar() == 1
+        assert _total("vagas", "interna") == internas
+        assert (_hoje("vagas", "interna"), _hoje("vagas", "externa")) == serie
@@ -0,0 +1,10 @@
+from servicos import planos
+
+
+def test_queries_quentes_usam_indices(app):
+    # Dados do seed (à escala de testes) e ANALYZE: o planeador escolhe como escolheria em produção
+    resultado = app.test_cli_runner().invoke(args=["seed-bench", "--escala", "0.01"])
+    assert resultado.exit_code == 0, resultado.output
+    with app.app_context():
+        falhas = {nome: (problemas, plano) for nome, problemas, plano in planos.verificar() if problemas}
+    assert falhas == {}
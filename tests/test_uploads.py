@@ -0,0 +1,40 @@
+import io
+import os
+
+from PIL import Image
+
+from modelos.modelos import Utilizador
+from servicos.cache import VERSAO_EMPRESAS, VERSAO_VAGAS, versao
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "purple").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_migrar_uploads_sobe_versoes_e_media_sem_404_em_cache(app):
+    from app import db
+    nome = "logo_antigo.png"
+    with open(os.path.join(app.config["UPLOAD_FOLDER"], nome), "wb") as f:
+        f.write(_png())
+    with app.app_context():
+        empresa = Utilizador(nome="Antiga", email="logo@adluc.pt", senha_hash="x", tipo="empresa", logo_empresa=nome)
+        db.session.add(empresa)
+        db.session.commit()
+        empresa_id, antes = empresa.id, (versao(VERSAO_VAGAS), versao(VERSAO_EMPRESAS))
+
+    from servicos.armazenamento import armazenamento
+    with app.app_context():
+        chave = armazenamento.guardar_stream(io.BytesIO(_png()), "logo.png")
+        db.session.commit()
+    cliente = app.test_client()
+    assert cliente.get(f"/media/{chave}").status_code == 404  # ainda não é logo de ninguém
+
+    resultado = app.test_cli_runner().invoke(args=["migrar-uploads"])
+    assert resultado.exit_code == 0, resultado.output
+    with app.app_context():
+        assert db.session.get(Utilizador, empresa_id).logo_empresa == chave  # mesmo conteúdo, mesma chave
+        assert (versao(VERSAO_VAGAS), versao(VERSAO_EMPRESAS)) == (antes[0] + 1, antes[1] + 1)
+    resposta = cliente.get(f"/media/{chave}")
+    assert resposta.status_code == 200 and resposta.mimetype == "image/png"